@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Documenter Analysis Cache
+Persistent per-file analysis results for incremental re-runs.
+
+Results are stored in SQLite keyed by (project root, analysis, relative path)
+and are only reused while the file's mtime_ns and size are unchanged, so a
+repeat scan of an unmodified repository re-reads nothing. Every (root,
+analysis) pair records when it was last used; pairs unused for longer than
+the age limit, and the least recently used ones past the row limit, are
+dropped whenever a session closes, so deleted or moved projects don't keep
+their rows forever. Standard library only.
+
+Environment:
+    DOCUMENTER_CACHE_DIR       directory holding analysis.db (default ~/.cache/documenter)
+    DOCUMENTER_CACHE           set to 0/false/off to disable the cache
+    DOCUMENTER_CACHE_MAX_ROWS  cached file results kept in total (default 200000)
+    DOCUMENTER_CACHE_MAX_AGE   seconds an unused root/analysis pair is kept (default 30 days)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()  # Returned by CacheSession.get() when no valid entry exists
+
+# Files modified this recently may change again within the same mtime tick
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+DEFAULT_MAX_ROWS = 200_000
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # Seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_results (
+    root TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (root, analysis, path)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    root TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (root, analysis)
+);
+"""
+
+def default_cache_dir() -> Path:
+    configured = os.environ.get("DOCUMENTER_CACHE_DIR")
+    if configured:
+        return Path(configured).expanduser()
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "documenter"
+
+class CacheSession:
+    """
+    Cached results of one analysis over one project root.
+
+    Rows for the whole root are loaded once. When the session closes, new
+    results are written, rows for files that were not seen again are pruned
+    and the pair is marked as used.
+    """
+
+    def __init__(self, cache: Optional["AnalysisCache"], root: str, analysis: str):
+        self._cache = cache
+        self.root = root
+        self.analysis = analysis
+        self._rows: Dict[str, Tuple[int, int, str]] = {}
+        self._pending: Dict[str, Tuple[int, int, str]] = {}
+        self._seen: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        if cache is not None:
+            self._rows = cache._load(root, analysis)
+
+    def get(self, entry, default: Any = MISSING) -> Any:
+        """Return the stored result for a FileEntry if its mtime and size still match"""
+        key = entry.rel_posix
+        self._seen.add(key)
+        row = self._rows.get(key)
+        if row is not None:
+            try:
+                if row[0] == entry.mtime_ns and row[1] == entry.size:
+                    self.hits += 1
+                    return json.loads(row[2])
+            except (OSError, ValueError):
+                pass
+        self.misses += 1
+        return default
+
+    def put(self, entry, result: Any):
+        """Record a JSON-serialisable result for a FileEntry"""
+        try:
+            mtime_ns, size = entry.mtime_ns, entry.size
+        except OSError:
+            return
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            return  # Too fresh to trust the mtime as a change marker
+        key = entry.rel_posix
+        self._seen.add(key)
+        self._pending[key] = (mtime_ns, size, json.dumps(result, separators=(',', ':')))
+
+    def close(self):
+        if self._cache is not None:
+            stale = [path for path in self._rows if path not in self._seen]
+            self._cache._save(self.root, self.analysis, self._pending, stale)
+            self._cache = None
+
+    def __enter__(self) -> "CacheSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._cache = None  # Don't prune on a partial run
+
+class AnalysisCache:
+    """SQLite-backed store shared by every analysis tool"""
+
+    def __init__(self, db_path=None, enabled: bool = True, max_rows: int = DEFAULT_MAX_ROWS,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / "analysis.db"
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.db_path), timeout=10)
+        if not self._initialized:
+            with self._lock:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(_SCHEMA)
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    def session(self, root, analysis: str) -> CacheSession:
+        """Open a session for one analysis over one project root"""
+        if not self.enabled:
+            return CacheSession(None, os.fspath(root), analysis)
+        return CacheSession(self, os.fspath(root), analysis)
+
+    def _load(self, root: str, analysis: str) -> Dict[str, Tuple[int, int, str]]:
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute(
+                    "SELECT path, mtime_ns, size, result FROM file_results WHERE root = ? AND analysis = ?",
+                    (root, analysis)
+                ).fetchall()
+            finally:
+                connection.close()
+            return {path: (mtime_ns, size, result) for path, mtime_ns, size, result in rows}
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Analysis cache unavailable ({self.db_path}): {e}")
+            return {}
+
+    def _save(self, root: str, analysis: str, pending: Dict[str, Tuple[int, int, str]], stale):
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO file_results (root, analysis, path, mtime_ns, size, result) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(root, analysis, path, m, s, r) for path, (m, s, r) in pending.items()]
+                    )
+                    connection.executemany(
+                        "DELETE FROM file_results WHERE root = ? AND analysis = ? AND path = ?",
+                        [(root, analysis, path) for path in stale]
+                    )
+                    (row_count,) = connection.execute(
+                        "SELECT COUNT(*) FROM file_results WHERE root = ? AND analysis = ?", (root, analysis)
+                    ).fetchone()
+                    connection.execute(
+                        "INSERT OR REPLACE INTO analyses (root, analysis, row_count, last_used) VALUES (?, ?, ?, ?)",
+                        (root, analysis, row_count, time.time())
+                    )
+                    self._prune(connection)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not update analysis cache ({self.db_path}): {e}")
+
+    def _prune(self, connection: sqlite3.Connection):
+        """Drop pairs past the age limit, then the least recently used ones past the row limit"""
+        cutoff = time.time() - self.max_age
+        kept_rows = 0
+        evicted = []
+        pairs = connection.execute(
+            "SELECT root, analysis, row_count, last_used FROM analyses ORDER BY last_used DESC"
+        ).fetchall()
+        for index, (root, analysis, row_count, last_used) in enumerate(pairs):
+            # The most recently used pair (the one just saved) is always kept
+            if index and (last_used < cutoff or kept_rows + row_count > self.max_rows):
+                evicted.append((root, analysis))
+            else:
+                kept_rows += row_count
+        if evicted:
+            connection.executemany("DELETE FROM file_results WHERE root = ? AND analysis = ?", evicted)
+            connection.executemany("DELETE FROM analyses WHERE root = ? AND analysis = ?", evicted)
+            logger.info(f"Analysis cache: evicted {len(evicted)} unused root/analysis pairs")
+
+_default_cache: Optional[AnalysisCache] = None
+_default_lock = threading.Lock()
+
+def get_analysis_cache() -> AnalysisCache:
+    """Process-wide cache configured from the environment"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            enabled = os.environ.get("DOCUMENTER_CACHE", "1").lower() not in ("0", "false", "off", "no")
+            _default_cache = AnalysisCache(
+                enabled=enabled,
+                max_rows=int(os.environ.get("DOCUMENTER_CACHE_MAX_ROWS", DEFAULT_MAX_ROWS)),
+                max_age=float(os.environ.get("DOCUMENTER_CACHE_MAX_AGE", DEFAULT_MAX_AGE))
+            )
+        return _default_cache
@@ -15,17 +15,30 @@ Security: Read-only, user-controlled, transparent
 import os
 import sys
 import json
+import codecs
 import hashlib
 import mimetypes
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 import tempfile
 import argparse
 import logging
 
+from ignore_rules import IgnoreMatcher  # Inlined by server.py into the companion it serves
+
 # Version and metadata
 COMPANION_VERSION = "1.0.0"
+STREAM_FORMAT = "documenter-ndjson/1"  # One JSON record per line; summary and integrity last
+MANIFEST_VERSION = 1  # Local record of the last upload, used by --delta
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB limit per file
+TEXT_SNIFF_BYTES = 512  # A NUL byte here marks a file without a known text extension as binary
+IMPORTANT_FILE_CHARS = 5000  # Characters of each important file included in the package
+# Byte order marks, longest first (the UTF-32 LE mark starts with the UTF-16 LE one)
+TEXT_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')
+)
 SUPPORTED_TEXT_EXTENSIONS = {
     '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.scss', '.sass',
     '.json', '.xml', '.yaml', '.yml', '.md', '.txt', '.env', '.gitignore',
@@ -34,6 +47,43 @@ SUPPORTED_TEXT_EXTENSIONS = {
     '.dart', '.vue', '.svelte', '.config', '.conf', '.ini', '.toml'
 }
 
+@lru_cache(maxsize=None)
+def _mime_is_text(suffix: str) -> bool:
+    mime_type, _ = mimetypes.guess_type('file' + suffix)
+    return bool(mime_type and mime_type.startswith('text/'))
+
+def is_text_name(name: str) -> bool:
+    """Text classification from a file name alone, memoised per extension"""
+    suffix = os.path.splitext(name)[1]
+    if suffix.lower() in SUPPORTED_TEXT_EXTENSIONS:
+        return True
+    if not suffix:
+        return False
+    if suffix in mimetypes.encodings_map or suffix in mimetypes.suffix_map:
+        # e.g. notes.txt.gz: the type depends on the inner extension too
+        mime_type, _ = mimetypes.guess_type(name)
+        return bool(mime_type and mime_type.startswith('text/'))
+    return _mime_is_text(suffix)
+
+def detect_encoding(sample: bytes, complete: bool = True) -> str:
+    """
+    Encoding from a byte order mark, else UTF-8 if the sample decodes, else
+    Latin-1. complete=False allows the sample to end mid-character.
+    """
+    for bom, encoding in TEXT_BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def decode_text(data: bytes, final: bool = True) -> str:
+    """Decode with the detected encoding; final=False tolerates a cut-off trailing character"""
+    decoder = codecs.getincrementaldecoder(detect_encoding(data, final))(errors='replace')
+    return decoder.decode(data, final=final)
+
 class CompanionLogger:
     """Simple logging for companion operations"""
     def __init__(self, verbose: bool = False):
@@ -49,6 +99,32 @@ class CompanionLogger:
     def error(self, message: str):
         print(f"[ERROR] {message}")
 
+class FileInventory:
+    """
+    Names and suffixes seen by one structure walk, so indicator checks are
+    dictionary lookups instead of extra stats or recursive globs
+    """
+    
+    def __init__(self):
+        self.root_names = set()  # Files and directories directly under the project root
+        self.suffix_counts: Dict[str, int] = {}  # Lowercased file suffix -> files anywhere in the tree
+    
+    def add_file(self, rel_path: Path):
+        if len(rel_path.parts) == 1:
+            self.root_names.add(rel_path.name)
+        suffix = rel_path.suffix.lower()
+        self.suffix_counts[suffix] = self.suffix_counts.get(suffix, 0) + 1
+    
+    def add_directory(self, rel_path: Path):
+        if len(rel_path.parts) == 1:
+            self.root_names.add(rel_path.name)
+    
+    def count(self, pattern: str) -> int:
+        """Files matching a root-level name or a '*.ext' pattern (searched tree-wide)"""
+        if pattern.startswith('*'):
+            return self.suffix_counts.get(pattern[1:].lower(), 0)
+        return 1 if pattern in self.root_names else 0
+
 class ProjectAnalyzer:
     """Core project analysis functionality"""
     
@@ -60,34 +136,34 @@ class ProjectAnalyzer:
             'venv', 'env', '.env', 'build', 'dist', 'target',
             '.next', '.nuxt', 'coverage', '.coverage', 'logs'
         }
+        self.inventory: Optional[FileInventory] = None  # Filled by the last complete structure walk
         self.excluded_files = {
             '.DS_Store', 'Thumbs.db', '*.log', '*.tmp', '*.cache'
         }
+        self._ignore_matcher: Optional[IgnoreMatcher] = None
         
     def is_text_file(self, file_path: Path) -> bool:
-        """Check if file is likely a text file"""
-        if file_path.suffix.lower() in SUPPORTED_TEXT_EXTENSIONS:
-            return True
-            
-        # Check MIME type for files without clear extensions
-        mime_type, _ = mimetypes.guess_type(str(file_path))
-        if mime_type and mime_type.startswith('text/'):
-            return True
-            
-        return False
+        """Check if file is likely a text file (by name only; no filesystem access)"""
+        return is_text_name(file_path.name)
+    
+    @property
+    def ignore_matcher(self) -> IgnoreMatcher:
+        """Built-in exclusions plus the project's ignore files, compiled on first use"""
+        if self._ignore_matcher is None:
+            # Excluded directory names also exclude files of that name (e.g. a .env file)
+            builtin = sorted(self.excluded_dirs) + sorted(self.excluded_files)
+            self._ignore_matcher = IgnoreMatcher(self.project_path, builtin)
+        return self._ignore_matcher
     
-    def should_exclude_path(self, path: Path) -> bool:
+    def should_exclude_path(self, path: Path, is_dir: bool = False) -> bool:
         """Check if path should be excluded from analysis"""
-        # Check if any parent directory is excluded
-        for part in path.parts:
-            if part in self.excluded_dirs:
-                return True
-                
-        # Check specific file exclusions
-        if path.name in self.excluded_files:
-            return True
-            
-        return False
+        try:
+            rel_path = path.relative_to(self.project_path)
+        except ValueError:
+            return False
+        if not rel_path.parts:
+            return False
+        return self.ignore_matcher.excluded(rel_path.as_posix(), is_dir)
     
     def get_file_info(self, file_path: Path) -> Dict[str, Any]:
         """Get basic file information"""
@@ -107,86 +183,130 @@ class ProjectAnalyzer:
     def read_text_file(self, file_path: Path, max_size: int = MAX_FILE_SIZE) -> Optional[str]:
         """Safely read text file content"""
         try:
-            if file_path.stat().st_size > max_size:
-                self.logger.warning(f"File {file_path} too large ({file_path.stat().st_size} bytes)")
-                return None
-                
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    return content
-                except UnicodeDecodeError:
-                    continue
-                    
-            self.logger.warning(f"Could not decode file {file_path}")
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > max_size:
+                    self.logger.warning(f"File {file_path} too large ({size} bytes)")
+                    return None
+                return decode_text(f.read())
+        except Exception as e:
+            self.logger.warning(f"Could not read file {file_path}: {e}")
             return None
-            
+    
+    def read_text_prefix(self, file_path: Path, max_chars: int,
+                         sniff: bool = False) -> Optional[Tuple[str, int, bool]]:
+        """
+        (first max_chars characters, size in bytes, truncated) read with a
+        single bounded read, however large the file is. With sniff, returns
+        None for content that looks binary.
+        """
+        read_size = max_chars * 4 + 4  # Worst case: 4 bytes per character plus a BOM
+        try:
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                data = f.read(read_size)
         except Exception as e:
             self.logger.warning(f"Could not read file {file_path}: {e}")
             return None
+        if sniff and b'\0' in data[:TEXT_SNIFF_BYTES] and not data.startswith(tuple(bom for bom, _ in TEXT_BOMS)):
+            return None
+        at_end = len(data) < read_size or len(data) >= size
+        text = decode_text(data, final=at_end)
+        return text[:max_chars], size, len(text) > max_chars or not at_end
     
-    def analyze_project_structure(self) -> Dict[str, Any]:
-        """Analyze complete project structure"""
+    def iter_project_structure(self) -> Iterator[Dict[str, Any]]:
+        """
+        Walk the project and yield 'directory' and 'file' records as they are
+        found, followed by one 'structure_summary' record with the totals
+        """
         self.logger.info(f"Analyzing project structure: {self.project_path}")
         
-        structure = {
+        summary = {
+            'type': 'structure_summary',
             'project_path': str(self.project_path),
             'project_name': self.project_path.name,
             'total_files': 0,
             'total_size': 0,
-            'directories': [],
-            'files': [],
             'file_types': {},
             'errors': []
         }
+        directory_count = 0
+        inventory = FileInventory()
         
+        matcher = self.ignore_matcher
         try:
             for root, dirs, files in os.walk(self.project_path):
                 root_path = Path(root)
+                rel_path = str(root_path.relative_to(self.project_path))
+                rel_dir = '' if rel_path == '.' else Path(rel_path).as_posix()
+                prefix = f"{rel_dir}/" if rel_dir else ''
+                matcher.enter(rel_dir, files)
                 
-                # Skip excluded directories
-                if self.should_exclude_path(root_path):
-                    continue
-                    
-                # Filter out excluded subdirectories
-                dirs[:] = [d for d in dirs if not self.should_exclude_path(root_path / d)]
+                # Prune ignored subdirectories so they are never walked
+                dirs[:] = [d for d in dirs if not matcher.ignored(prefix + d, True)]
                 
                 # Add directory info
-                rel_path = str(root_path.relative_to(self.project_path))
                 if rel_path != '.':
-                    structure['directories'].append(rel_path)
+                    directory_count += 1
+                    inventory.add_directory(Path(rel_path))
+                    yield {'type': 'directory', 'path': rel_path}
                 
                 # Process files
                 for file_name in files:
-                    file_path = root_path / file_name
-                    
-                    if self.should_exclude_path(file_path):
+                    if matcher.ignored(prefix + file_name, False):
                         continue
                     
+                    file_path = root_path / file_name
                     file_info = self.get_file_info(file_path)
                     if file_info:
-                        structure['files'].append(file_info)
-                        structure['total_files'] += 1
-                        structure['total_size'] += file_info['size']
+                        inventory.add_file(Path(file_info['path']))
+                        summary['total_files'] += 1
+                        summary['total_size'] += file_info['size']
                         
                         # Count file types
                         ext = file_info['extension']
-                        structure['file_types'][ext] = structure['file_types'].get(ext, 0) + 1
+                        summary['file_types'][ext] = summary['file_types'].get(ext, 0) + 1
+                        yield {'type': 'file', **file_info}
                         
         except Exception as e:
             error_msg = f"Error analyzing structure: {e}"
             self.logger.error(error_msg)
-            structure['errors'].append(error_msg)
+            summary['errors'].append(error_msg)
+        
+        self.logger.info(f"Found {summary['total_files']} files in {directory_count} directories")
+        self.inventory = inventory
+        yield summary
+    
+    def analyze_project_structure(self) -> Dict[str, Any]:
+        """Analyze complete project structure"""
+        directories, files = [], []
+        for record in self.iter_project_structure():
+            record_type = record.pop('type')
+            if record_type == 'directory':
+                directories.append(record['path'])
+            elif record_type == 'file':
+                files.append(record)
+            else:
+                summary = record
         
-        self.logger.info(f"Found {structure['total_files']} files in {len(structure['directories'])} directories")
-        return structure
+        return {
+            'project_path': summary['project_path'],
+            'project_name': summary['project_name'],
+            'total_files': summary['total_files'],
+            'total_size': summary['total_size'],
+            'directories': directories,
+            'files': files,
+            'file_types': summary['file_types'],
+            'errors': summary['errors']
+        }
     
     def detect_project_type(self) -> Dict[str, Any]:
-        """Detect project type based on files and structure"""
+        """Detect project type from the structure walk's file inventory"""
         self.logger.info("Detecting project type...")
+        if self.inventory is None:
+            for _ in self.iter_project_structure():
+                pass
+        inventory = self.inventory
         
         indicators = {
             'package.json': 'nodejs',
@@ -216,23 +336,17 @@ class ProjectAnalyzer:
         confidence_scores = {}
         
         for file_pattern, project_type in indicators.items():
-            if '*' in file_pattern:
-                # Handle wildcard patterns
-                pattern = file_pattern.replace('*', '')
-                matches = list(self.project_path.glob(f"**/*{pattern}"))
-            else:
-                # Direct file check
-                matches = [self.project_path / file_pattern] if (self.project_path / file_pattern).exists() else []
-            
+            # Wildcards count matching files anywhere outside excluded directories
+            matches = inventory.count(file_pattern)
             if matches:
-                detected_types[project_type] = detected_types.get(project_type, 0) + len(matches)
-                confidence_scores[project_type] = confidence_scores.get(project_type, 0) + len(matches)
+                detected_types[project_type] = detected_types.get(project_type, 0) + matches
+                confidence_scores[project_type] = confidence_scores.get(project_type, 0) + matches
         
         # Additional heuristics
-        if (self.project_path / 'src').exists() and (self.project_path / 'public').exists():
+        if inventory.count('src') and inventory.count('public'):
             confidence_scores['react'] = confidence_scores.get('react', 0) + 2
             
-        if (self.project_path / 'pages').exists():
+        if inventory.count('pages'):
             confidence_scores['nextjs'] = confidence_scores.get('nextjs', 0) + 3
         
         # Find best match
@@ -280,20 +394,97 @@ class ProjectAnalyzer:
                 if self.should_exclude_path(file_path) or not file_path.is_file():
                     continue
                 
-                if self.is_text_file(file_path):
-                    content = self.read_text_file(file_path)
-                    if content:
-                        important_files.append({
-                            'path': str(file_path.relative_to(self.project_path)),
-                            'content': content[:5000],  # Limit content size
-                            'size': len(content),
-                            'truncated': len(content) > 5000
-                        })
-                        file_count += 1
+                # Names without a known text extension (Dockerfile, LICENSE) are sniffed
+                prefix = self.read_text_prefix(file_path, IMPORTANT_FILE_CHARS, sniff=not self.is_text_file(file_path))
+                if prefix and prefix[0]:
+                    content, size, truncated = prefix
+                    important_files.append({
+                        'path': str(file_path.relative_to(self.project_path)),
+                        'content': content,
+                        'size': size,  # Bytes on disk
+                        'truncated': truncated
+                    })
+                    file_count += 1
         
         self.logger.info(f"Read {len(important_files)} important files")
         return important_files
 
+class IntegrityHasher:
+    """
+    Per-section SHA-256 digests over canonical per-record JSON.
+    
+    Each record is hashed on its own as it is produced, so nothing is
+    serialised as a whole. A section digest hashes the sorted, length-prefixed
+    list of its record digests, which makes it independent of record order: a
+    model patched from a delta upload verifies against the companion's full
+    walk. The server uses the same class to verify uploads and to tell which
+    sections changed.
+    """
+    
+    SECTIONS = ('header', 'directories', 'files', 'summary', 'project_type', 'important_files')
+    HEADER_FIELDS = ('companion_version', 'analysis_timestamp', 'user_preferences')
+    
+    def __init__(self):
+        self._digests: Dict[str, List[bytes]] = {section: [] for section in self.SECTIONS}
+        self._section_cache: Dict[str, str] = {}
+    
+    @staticmethod
+    def record_digest(record: Any) -> bytes:
+        canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).digest()
+    
+    def update(self, section: str, record: Any):
+        """Add one record (a file, directory path, important file, ...) to a section"""
+        self._digests[section].append(self.record_digest(record))
+        self._section_cache.pop(section, None)
+    
+    def update_header(self, package: Dict[str, Any]):
+        self.update('header', {field: package.get(field) for field in self.HEADER_FIELDS})
+    
+    def _section_digest(self, section: str) -> str:
+        digest = self._section_cache.get(section)
+        if digest is None:
+            digests = sorted(self._digests[section])
+            combined = hashlib.sha256(len(digests).to_bytes(8, 'big'))
+            for record in digests:
+                combined.update(len(record).to_bytes(2, 'big'))
+                combined.update(record)
+            digest = self._section_cache[section] = combined.hexdigest()
+        return digest
+    
+    def section_hashes(self) -> Dict[str, str]:
+        return {section: self._section_digest(section) for section in self.SECTIONS}
+    
+    def root_hash(self) -> str:
+        return self._combine(self.SECTIONS)
+    
+    def content_hash(self) -> str:
+        """Root hash without the header: identifies the analysed project state itself"""
+        return self._combine(self.SECTIONS[1:])
+    
+    def _combine(self, sections) -> str:
+        combined = hashlib.sha256()
+        for section in sections:
+            combined.update(f"{section}:{self._section_digest(section)}\n".encode('utf-8'))
+        return combined.hexdigest()
+    
+    @classmethod
+    def for_package(cls, package: Dict[str, Any]) -> 'IntegrityHasher':
+        """Hash an assembled JSON package record by record"""
+        hasher = cls()
+        hasher.update_header(package)
+        project_data = package.get('project_data', {})
+        structure = project_data.get('structure', {})
+        for directory in structure.get('directories', []):
+            hasher.update('directories', directory)
+        for file_info in structure.get('files', []):
+            hasher.update('files', file_info)
+        hasher.update('summary', {k: v for k, v in structure.items() if k not in ('directories', 'files')})
+        hasher.update('project_type', project_data.get('project_type', {}))
+        for file_info in project_data.get('important_files', []):
+            hasher.update('important_files', file_info)
+        return hasher
+
 class SecureCommunicator:
     """Handle secure communication with cloud server"""
     
@@ -319,11 +510,191 @@ class SecureCommunicator:
             'integrity_hash': None
         }
         
-        # Calculate integrity hash
-        package_str = json.dumps(package, sort_keys=True, default=str)
-        package['integrity_hash'] = hashlib.sha256(package_str.encode()).hexdigest()[:16]
+        # Calculate integrity hash section by section
+        hasher = IntegrityHasher.for_package(package)
+        package['integrity_hash'] = hasher.root_hash()
+        package['section_hashes'] = hasher.section_hashes()
         
         return package
+    
+    def stream_analysis_package(self, analyzer: 'ProjectAnalyzer', user_preferences: Dict[str, Any] = None) -> Iterator[str]:
+        """
+        Yield the analysis as NDJSON lines without holding the file list in memory.
+        
+        Order: header, directory/file records, project_type, important_file
+        records, structure_summary, then an integrity record carrying the same
+        root and section hashes as the JSON package.
+        """
+        user_preferences = user_preferences or {}
+        hasher = IntegrityHasher()
+        
+        def emit(record: Dict[str, Any]) -> str:
+            return json.dumps(record, default=str) + '\n'
+        
+        header = {
+            'type': 'header',
+            'format': STREAM_FORMAT,
+            'companion_version': COMPANION_VERSION,
+            'analysis_timestamp': __import__('time').time(),
+            'user_preferences': user_preferences
+        }
+        hasher.update_header(header)
+        yield emit(header)
+        
+        summary = None
+        for record in analyzer.iter_project_structure():
+            record_type = record.pop('type')
+            if record_type == 'structure_summary':
+                summary = record  # Totals go last so readers can stop early on a truncated stream
+            elif record_type == 'directory':
+                hasher.update('directories', record['path'])
+                yield emit({'type': record_type, **record})
+            else:
+                hasher.update('files', record)
+                yield emit({'type': record_type, **record})
+        
+        project_type = analyzer.detect_project_type()
+        hasher.update('project_type', project_type)
+        yield emit({'type': 'project_type', **project_type})
+        
+        for file_info in analyzer.get_important_files():
+            if user_preferences.get('exclude_content', False):
+                file_info['content'] = '[CONTENT EXCLUDED BY USER PREFERENCE]'
+            hasher.update('important_files', file_info)
+            yield emit({'type': 'important_file', **file_info})
+        
+        hasher.update('summary', summary)
+        yield emit({'type': 'structure_summary', **summary})
+        yield emit({
+            'type': 'integrity',
+            'integrity_hash': hasher.root_hash(),
+            'section_hashes': hasher.section_hashes()
+        })
+    
+    @staticmethod
+    def default_manifest_path(project_path: Path) -> Path:
+        """Per-project manifest under the user cache directory"""
+        cache_home = os.environ.get('XDG_CACHE_HOME')
+        base = Path(cache_home) if cache_home else Path.home() / '.cache'
+        key = hashlib.sha256(str(project_path).encode('utf-8')).hexdigest()[:16]
+        return base / 'documenter' / 'companion' / f'{key}.json'
+    
+    def load_manifest(self, manifest_path: Path, project_path: Path) -> Optional[Dict[str, Any]]:
+        """Manifest of the last upload for this project, or None if there is no usable one"""
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+            return None
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('project_path') != str(project_path):
+            return None
+        return manifest
+    
+    def save_manifest(self, manifest_path: Path, manifest: Dict[str, Any]):
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = manifest_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(temp_path, manifest_path)
+    
+    def create_delta_package(self, analyzer: 'ProjectAnalyzer', previous: Optional[Dict[str, Any]],
+                             user_preferences: Dict[str, Any] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Walk the project and compare it with the previous manifest.
+        
+        Returns (package, manifest). With a previous manifest the package holds
+        only added, changed and removed records under 'delta', plus the
+        manifest hash the server's cached model must match; without one it is
+        a full package. Integrity hashes always describe the complete state.
+        """
+        user_preferences = user_preferences or {}
+        previous_files = previous['files'] if previous else {}
+        previous_important = previous['important_files'] if previous else {}
+        previous_dirs = set(previous['directories']) if previous else set()
+        
+        package = {
+            'companion_version': COMPANION_VERSION,
+            'analysis_timestamp': __import__('time').time(),
+            'user_preferences': user_preferences
+        }
+        hasher = IntegrityHasher()
+        hasher.update_header(package)
+        
+        directories: List[str] = []
+        files_state: Dict[str, list] = {}
+        changed_files: List[Dict[str, Any]] = []
+        summary = None
+        for record in analyzer.iter_project_structure():
+            record_type = record.pop('type')
+            if record_type == 'directory':
+                hasher.update('directories', record['path'])
+                directories.append(record['path'])
+            elif record_type == 'file':
+                hasher.update('files', record)
+                # path -> [mtime, size, record hash]
+                fingerprint = IntegrityHasher.record_digest(record).hex()[:16]
+                files_state[record['path']] = [record['modified'], record['size'], fingerprint]
+                previous_entry = previous_files.get(record['path'])
+                if not previous_entry or previous_entry[2] != fingerprint:
+                    changed_files.append(record)
+            else:
+                summary = record
+        hasher.update('summary', summary)
+        
+        project_type = analyzer.detect_project_type()
+        hasher.update('project_type', project_type)
+        
+        important_state: Dict[str, str] = {}
+        changed_important: List[Dict[str, Any]] = []
+        for file_info in analyzer.get_important_files():
+            if user_preferences.get('exclude_content', False):
+                file_info['content'] = '[CONTENT EXCLUDED BY USER PREFERENCE]'
+            hasher.update('important_files', file_info)
+            content_hash = IntegrityHasher.record_digest(file_info).hex()[:16]
+            important_state[file_info['path']] = content_hash
+            if previous_important.get(file_info['path']) != content_hash:
+                changed_important.append(file_info)
+        
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'project_path': str(analyzer.project_path),
+            'manifest_hash': hasher.content_hash(),
+            'directories': directories,
+            'files': files_state,
+            'important_files': important_state
+        }
+        
+        if previous:
+            package['project_data'] = {'structure': summary, 'project_type': project_type}
+            package['delta'] = {
+                'base_manifest_hash': previous['manifest_hash'],
+                'manifest_hash': manifest['manifest_hash'],
+                'directories': {
+                    'added': [d for d in directories if d not in previous_dirs],
+                    'removed': sorted(previous_dirs.difference(directories))
+                },
+                'files': {
+                    'changed': changed_files,
+                    'removed': [path for path in previous_files if path not in files_state]
+                },
+                'important_files': {
+                    'changed': changed_important,
+                    'removed': [path for path in previous_important if path not in important_state]
+                }
+            }
+        else:
+            package['project_data'] = {
+                'structure': {**summary, 'directories': directories, 'files': changed_files},
+                'project_type': project_type,
+                'important_files': changed_important
+            }
+        
+        package['integrity_hash'] = hasher.root_hash()
+        package['section_hashes'] = hasher.section_hashes()
+        return package, manifest
 
 def main():
     """Main companion execution"""
@@ -332,10 +703,20 @@ def main():
     parser.add_argument('--output', '-o', help='Output file for analysis results')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     parser.add_argument('--exclude-content', action='store_true', help='Exclude file contents (privacy mode)')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='Output format: one JSON document, or streamed NDJSON records for large projects')
+    parser.add_argument('--delta', action='store_true',
+                        help='Send only changes since the last --delta run (JSON output)')
+    parser.add_argument('--full', action='store_true',
+                        help='With --delta: ignore the previous manifest and send everything')
+    parser.add_argument('--manifest', help='Manifest file used by --delta (default: per-project file in the user cache)')
     parser.add_argument('--version', action='store_true', help='Show version')
     
     args = parser.parse_args()
     
+    if args.delta and args.format != 'json':
+        parser.error("--delta requires --format json")
+    
     if args.version:
         print(f"Documenter MCP Companion v{COMPANION_VERSION}")
         return
@@ -346,6 +727,44 @@ def main():
     try:
         # Initialize analyzer
         analyzer = ProjectAnalyzer(args.project_path, logger)
+        communicator = SecureCommunicator(logger)
+        user_preferences = {
+            'exclude_content': args.exclude_content
+        }
+        
+        if args.delta:
+            manifest_path = Path(args.manifest) if args.manifest else communicator.default_manifest_path(analyzer.project_path)
+            previous = None if args.full else communicator.load_manifest(manifest_path, analyzer.project_path)
+            logger.info(f"Starting {'delta' if previous else 'full'} project analysis...")
+            package, manifest = communicator.create_delta_package(analyzer, previous, user_preferences)
+            
+            output = json.dumps(package, indent=2, default=str)
+            if args.output:
+                with open(args.output, 'w') as f:
+                    f.write(output)
+                logger.info(f"Analysis saved to {args.output}")
+            else:
+                print(output)
+            
+            communicator.save_manifest(manifest_path, manifest)
+            logger.info(f"Manifest updated: {manifest_path}")
+            logger.info("Analysis completed successfully")
+            return
+        
+        if args.format == 'ndjson':
+            # Stream records as they are produced
+            logger.info("Starting streamed project analysis...")
+            out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+            try:
+                for line in communicator.stream_analysis_package(analyzer, user_preferences):
+                    out.write(line)
+            finally:
+                if args.output:
+                    out.close()
+            if args.output:
+                logger.info(f"Analysis streamed to {args.output}")
+            logger.info("Analysis completed successfully")
+            return
         
         # Perform analysis
         logger.info("Starting project analysis...")
@@ -356,11 +775,6 @@ def main():
         }
         
         # Create secure package
-        communicator = SecureCommunicator(logger)
-        user_preferences = {
-            'exclude_content': args.exclude_content
-        }
-        
         package = communicator.create_analysis_package(project_data, user_preferences)
         
         # Output results
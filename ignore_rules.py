@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Documenter Ignore Rules
+gitignore-style exclusion matching shared by the server-side scanner
+(project_scanner.py) and the local companion.
+
+companion.py imports this module when run from a checkout; server.py inlines
+it into the companion it serves, so the downloaded script still runs on its
+own. Keep it standard library only, with no other project imports.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+IGNORE_FILES = ('.gitignore', '.documenterignore')  # Read in every walked directory, later files win
+_IGNORE_FLAGS = re.IGNORECASE if os.name == 'nt' else 0
+
+def ignore_pattern_regex(pattern: str) -> str:
+    """
+    Regex for one gitignore pattern (without '!' or a trailing '/') over a
+    '/'-separated path relative to the ignore file's directory
+    """
+    anchored = '/' in pattern  # Otherwise the pattern matches a name at any depth
+    if pattern.startswith('/'):
+        pattern = pattern[1:]
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/') and (i + 2 == n or pattern[i + 2] == '/'):
+                if i + 2 == n:
+                    out.append('.*')  # 'dir/**': everything inside
+                    i += 2
+                else:
+                    out.append('(?:.*/)?')  # '**/': any number of directories
+                    i += 3
+                continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            j = pattern.find(']', j)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j].replace('\\', '\\\\')
+                if body[0] in '!^':
+                    body = '^/' + body[1:]
+                out.append(f'[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    body = ''.join(out)
+    return body if anchored else '(?:.*/)?' + body
+
+class IgnoreRules:
+    """
+    Patterns from one directory's ignore files, compiled into a single regex
+    per entry kind. Alternatives are tried last rule first, so the match says
+    which rule wins and whether it is a negation.
+    """
+    
+    def __init__(self, lines: Iterable[str]):
+        rules = []  # (regex, negated, directories only)
+        for line in lines:
+            line = line.rstrip('\r\n')
+            while line.endswith(' ') and not line.endswith('\\ '):
+                line = line[:-1]
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if line:
+                rules.append((ignore_pattern_regex(line), negated, dir_only))
+        self._file_rules = self._combine([rule for rule in rules if not rule[2]])
+        self._dir_rules = self._combine(rules)
+    
+    @staticmethod
+    def _combine(rules: List[Tuple[str, bool, bool]]):
+        if not rules:
+            return None, ()
+        ordered = rules[::-1]
+        regex = re.compile('|'.join(f'({pattern})' for pattern, _, _ in ordered), _IGNORE_FLAGS)
+        return regex, tuple(negated for _, negated, _ in ordered)
+    
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True (ignored), False (re-included by '!') or None (no rule matches)"""
+        regex, negations = self._dir_rules if is_dir else self._file_rules
+        if regex is None:
+            return None
+        match = regex.fullmatch(rel_path)
+        if match is None:
+            return None
+        return not negations[match.lastindex - 1]
+
+class IgnoreMatcher:
+    """
+    Built-in exclusions plus .gitignore/.documenterignore files. Rules are
+    loaded once per directory and chained, so deeper ignore files override
+    the ones above them; built-in exclusions always apply.
+    """
+    
+    def __init__(self, root: Path, builtin_patterns: Iterable[str], ignore_files: Iterable[str] = IGNORE_FILES):
+        self.root = root
+        self.builtin = IgnoreRules(builtin_patterns)
+        self.ignore_files = tuple(ignore_files)
+        self._chains: Dict[str, Tuple[Tuple[str, IgnoreRules], ...]] = {}
+    
+    def _chain(self, rel_dir: str, names: Optional[Iterable[str]] = None) -> Tuple[Tuple[str, IgnoreRules], ...]:
+        """(base directory, rules) pairs that apply inside rel_dir, outermost first"""
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            chain = self._chain(rel_dir.rpartition('/')[0]) if rel_dir else ()
+            present = self.ignore_files if names is None else [f for f in self.ignore_files if f in names]
+            lines = []
+            for file_name in present:
+                try:
+                    with open(self.root / rel_dir / file_name, 'r', encoding='utf-8', errors='replace') as f:
+                        lines.extend(f)
+                except OSError:
+                    pass
+            if lines:
+                chain = chain + ((rel_dir, IgnoreRules(lines)),)
+            self._chains[rel_dir] = chain
+        return chain
+    
+    def enter(self, rel_dir: str, names: Iterable[str]):
+        """Load a directory's ignore files using a listing the caller already has"""
+        self._chain(rel_dir, set(names))
+    
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Test one '/'-separated path whose parent directories are not ignored"""
+        if self.builtin.match(rel_path, is_dir):
+            return True
+        for base, rules in reversed(self._chain(rel_path.rpartition('/')[0])):
+            result = rules.match(rel_path[len(base) + 1:] if base else rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
+    
+    def excluded(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Like ignored(), but also checks every parent directory"""
+        parts = rel_path.split('/')
+        for depth in range(1, len(parts)):
+            if self.ignored('/'.join(parts[:depth]), True):
+                return True
+        return self.ignored(rel_path, is_dir)
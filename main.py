@@ -1,13 +1,18 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+import anyio
 import os
 import json
 import re
 import sys
 import platform
 import subprocess
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
+from analysis_cache import get_analysis_cache
+from project_scanner import CLIENT_EXECUTION_MODES, ProjectSnapshot, ProjectTypeDetector, ScanProgress, analyze_files, find_annotations, find_files, line_counts, normalize_tags
+
 # Initialize MCP server with clear description
 mcp = FastMCP(
     "Universal Project Documenter",
@@ -207,6 +212,35 @@ PROJECT_CONFIGS = {
     }
 }
 
+# Indicator/keyword index over PROJECT_CONFIGS, built once
+PROJECT_DETECTOR = ProjectTypeDetector(PROJECT_CONFIGS)
+
+async def _run_with_progress(ctx: Optional[Context], steps: int, fn, *args, **kwargs) -> str:
+    """
+    Run a blocking tool body in a worker thread. When the client sent a
+    progressToken, the body gets a ScanProgress whose phases and file counts
+    go out through ctx.report_progress and whose finished sections go out as
+    log messages, so partial results arrive before the whole scan is done.
+    """
+    meta = ctx.request_context.meta if ctx is not None else None
+    if meta is None or meta.progressToken is None:
+        return await anyio.to_thread.run_sync(partial(fn, *args, **kwargs))
+    
+    def report(progress: float, total: float, message: str):
+        anyio.from_thread.run(partial(ctx.report_progress, progress, total, message))
+    
+    def publish(title: str, text: str):
+        anyio.from_thread.run(partial(ctx.log, "info", f"{title}\n\n{text}", logger_name="documenter"))
+    
+    progress = ScanProgress(report, steps, publish)
+    
+    def run() -> str:
+        result = fn(*args, progress=progress, **kwargs)
+        progress.finish()
+        return result
+    
+    return await anyio.to_thread.run_sync(run)
+
 def _get_enhanced_project_detection() -> Tuple[str, str]:
     """Enhanced project detection using multiple strategies"""
     try:
@@ -277,17 +311,7 @@ def _get_enhanced_project_detection() -> Tuple[str, str]:
         if not detected_path:
             current_dir = Path.cwd().resolve()
             for parent in [current_dir] + list(current_dir.parents)[:3]:
-                indicators_found = 0
-                for project_type, config in PROJECT_CONFIGS.items():
-                    if project_type == "generic":
-                        continue
-                    
-                    for indicator in config["indicators"]:
-                        if "*" in indicator:
-                            if list(parent.glob(indicator)):
-                                indicators_found += 1
-                        elif (parent / indicator).exists():
-                            indicators_found += 1
+                indicators_found = PROJECT_DETECTOR.indicator_hits(ProjectSnapshot(parent))
                 
                 if indicators_found >= 2:  # Need at least 2 indicators for confidence
                     parent_str = str(parent).lower()
@@ -320,6 +344,10 @@ def detect_project_type(base_path: str = ".") -> str:
     Automatically detect the type of project with enhanced accuracy
     Supports 25+ project types including React, Next.js, Angular, Vue, Python, .NET, Java, etc.
     """
+    return _detect_project_type(base_path)
+
+def _detect_project_type(base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
+    """Project type detection; reuses the caller's snapshot when one is given"""
     try:
         # Use enhanced path detection if no specific path provided
         if base_path == ".":
@@ -327,75 +355,15 @@ def detect_project_type(base_path: str = ".") -> str:
         else:
             detection_method = "specified path"
         
-        base_path_obj = Path(base_path).resolve()
-        detected_types = []
+        snapshot = snapshot or ProjectSnapshot(base_path)
+        base_path_obj = snapshot.base_path
         
         if not base_path_obj.exists():
             return f"❌ Path does not exist: {base_path_obj}"
         
-        for project_type, config in PROJECT_CONFIGS.items():
-            if project_type == "generic":
-                continue
-                
-            score = 0
-            found_indicators = []
-            
-            # Check for indicator files with enhanced matching
-            for indicator in config["indicators"]:
-                if "*" in indicator:  # Handle wildcards
-                    matches = list(base_path_obj.glob(indicator))
-                    if matches:
-                        found_indicators.append(f"{indicator} ({len(matches)} files)")
-                        score += 2
-                elif (base_path_obj / indicator).exists():
-                    found_indicators.append(indicator)
-                    score += 2
-            
-            # Check file contents for specific keywords with enhanced logic
-            for file_to_check, content_keys in config["check_content"].items():
-                file_path = base_path_obj / file_to_check
-                if file_path.exists() and file_path.is_file():
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read().lower()
-                            
-                        if isinstance(content_keys, list):
-                            matched_keys = [key for key in content_keys if key.lower() in content]
-                            if matched_keys:
-                                score += len(matched_keys) * 2  # More matches = higher score
-                                found_indicators.append(f"{file_to_check} (contains {', '.join(matched_keys)})")
-                        elif isinstance(content_keys, str) and content_keys.lower() in content:
-                            score += 3
-                            found_indicators.append(f"{file_to_check} (contains '{content_keys}')")
-                    except Exception:
-                        pass  # Skip files that can't be read
-            
-            # Check for important directories
-            dir_score = 0
-            found_dirs = []
-            for important_dir in config["important_dirs"]:
-                if (base_path_obj / important_dir).exists():
-                    found_dirs.append(important_dir)
-                    dir_score += 1
-            
-            if dir_score > 0:
-                score += min(dir_score, 4)  # Cap directory score at 4
-            
-            # Apply confidence boost
-            score += config.get("confidence_boost", 0)
-            
-            # Only consider if we found some indicators
-            if score > 0:
-                detected_types.append({
-                    'type': project_type,
-                    'score': score,
-                    'indicators': found_indicators,
-                    'directories': found_dirs,
-                    'confidence': _calculate_confidence(score, len(found_indicators), len(found_dirs))
-                })
-        
-        # Sort by score (highest first)
-        detected_types.sort(key=lambda x: x['score'], reverse=True)
+        detected_types = PROJECT_DETECTOR.detect(snapshot)
+        for detected in detected_types:
+            detected['confidence'] = _calculate_confidence(detected['score'], len(detected['indicators']), len(detected['directories']))
         
         if not detected_types:
             return f"Detected project type: GENERIC\nPath analyzed: {base_path}\nDetection method: {detection_method}\nNo specific framework detected"
@@ -538,11 +506,16 @@ def analyze_project_structure(base_path: str = ".") -> str:
     """
     Analyze and document the complete project structure with intelligent categorization
     """
+    return _analyze_project_structure(base_path)
+
+def _analyze_project_structure(base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
+    """Structure analysis; reuses the caller's snapshot when one is given"""
     try:
-        base_path = Path(base_path).resolve()
+        snapshot = snapshot or ProjectSnapshot(base_path)
+        base_path = snapshot.base_path
         
         # Detect project type first
-        project_info = detect_project_type(str(base_path))
+        project_info = _detect_project_type(str(base_path), snapshot)
         
         structure = []
         structure.append("# 📊 Project Structure Analysis")
@@ -557,15 +530,9 @@ def analyze_project_structure(base_path: str = ".") -> str:
             if current_depth >= max_depth:
                 return
                 
-            items = []
             try:
                 # Get directories and files, skip hidden and build folders
-                for item in path.iterdir():
-                    if item.name.startswith('.') or item.name in ['node_modules', '__pycache__', '.next', 'out', 'dist', 'build']:
-                        continue
-                    items.append(item)
-                
-                items.sort(key=lambda x: (x.is_file(), x.name.lower()))
+                items = snapshot.list_dir(path, ['node_modules', '__pycache__', '.next', 'out', 'dist', 'build'])
                 
                 for i, item in enumerate(items):
                     is_last = i == len(items) - 1
@@ -574,7 +541,7 @@ def analyze_project_structure(base_path: str = ".") -> str:
                     
                     if item.is_dir() and current_depth < max_depth - 1:
                         next_prefix = prefix + ("    " if is_last else "│   ")
-                        generate_tree(item, next_prefix, max_depth, current_depth + 1)
+                        generate_tree(Path(item.path), next_prefix, max_depth, current_depth + 1)
             except PermissionError:
                 structure.append(f"{prefix}    [Permission Denied]")
         
@@ -1132,11 +1099,16 @@ def generate_project_readme(base_path: str = ".") -> str:
     """
     Generate a comprehensive README.md for any project based on its structure and files
     """
+    return _generate_project_readme(base_path)
+
+def _generate_project_readme(base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
+    """README generation; reuses the caller's snapshot when one is given"""
     try:
-        base_path = Path(base_path).resolve()
+        snapshot = snapshot or ProjectSnapshot(base_path)
+        base_path = snapshot.base_path
         
         # Detect project type and get package info
-        project_type = detect_project_type(str(base_path))
+        project_type = _detect_project_type(str(base_path), snapshot)
         
         readme = []
         
@@ -1144,13 +1116,12 @@ def generate_project_readme(base_path: str = ".") -> str:
         project_name = base_path.name
         description = "A software project"
         
-        package_json_path = base_path / "package.json"
-        if package_json_path.exists():
+        has_package_json = snapshot.exists("package.json")
+        if has_package_json:
             try:
-                with open(package_json_path, 'r', encoding='utf-8') as f:
-                    package_data = json.load(f)
-                    project_name = package_data.get('name', project_name)
-                    description = package_data.get('description', description)
+                package_data = json.loads(snapshot.read_text("package.json"))
+                project_name = package_data.get('name', project_name)
+                description = package_data.get('description', description)
             except:
                 pass
         
@@ -1168,7 +1139,7 @@ def generate_project_readme(base_path: str = ".") -> str:
         # Installation and setup
         readme.append("## 📦 Installation")
         readme.append("")
-        if package_json_path.exists():
+        if has_package_json:
             readme.append("```bash")
             readme.append("# Clone the repository")
             readme.append(f"git clone <repository-url>")
@@ -1186,19 +1157,18 @@ def generate_project_readme(base_path: str = ".") -> str:
         readme.append("")
         
         # Available scripts
-        if package_json_path.exists():
+        if has_package_json:
             try:
-                with open(package_json_path, 'r', encoding='utf-8') as f:
-                    package_data = json.load(f)
-                    if 'scripts' in package_data:
-                        readme.append("## 🔧 Available Scripts")
+                package_data = json.loads(snapshot.read_text("package.json"))
+                if 'scripts' in package_data:
+                    readme.append("## 🔧 Available Scripts")
+                    readme.append("")
+                    for script, command in package_data['scripts'].items():
+                        readme.append(f"```bash")
+                        readme.append(f"npm run {script}")
+                        readme.append(f"```")
+                        readme.append(f"{command}")
                         readme.append("")
-                        for script, command in package_data['scripts'].items():
-                            readme.append(f"```bash")
-                            readme.append(f"npm run {script}")
-                            readme.append(f"```")
-                            readme.append(f"{command}")
-                            readme.append("")
             except:
                 pass
         
@@ -1211,14 +1181,8 @@ def generate_project_readme(base_path: str = ".") -> str:
             if current_depth >= max_depth:
                 return
                 
-            items = []
             try:
-                for item in path.iterdir():
-                    if item.name.startswith('.') or item.name in ['node_modules', '__pycache__', '.next', 'out']:
-                        continue
-                    items.append(item)
-                
-                items.sort(key=lambda x: (x.is_file(), x.name.lower()))
+                items = snapshot.list_dir(path, ['node_modules', '__pycache__', '.next', 'out'])
                 
                 for i, item in enumerate(items[:8]):  # Limit items shown
                     is_last = i == len(items) - 1
@@ -1227,7 +1191,7 @@ def generate_project_readme(base_path: str = ".") -> str:
                     
                     if item.is_dir() and current_depth < max_depth - 1:
                         next_prefix = prefix + ("    " if is_last else "│   ")
-                        add_structure(item, next_prefix, max_depth, current_depth + 1)
+                        add_structure(Path(item.path), next_prefix, max_depth, current_depth + 1)
             except:
                 pass
         
@@ -1301,25 +1265,8 @@ def find_files_by_pattern(pattern: str, base_path: str = ".") -> str:
     try:
         base_path = Path(base_path).resolve()
         
-        # Use glob to find matching files
-        matching_files = list(base_path.glob(pattern))
-        
-        # Filter out hidden files and common build directories
-        filtered_files = []
-        for file_path in matching_files:
-            relative_path = file_path.relative_to(base_path)
-            path_parts = relative_path.parts
-            
-            # Skip hidden files and directories
-            if any(part.startswith('.') for part in path_parts):
-                continue
-            
-            # Skip common build/dependency directories
-            skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-            if any(part in skip_dirs for part in path_parts):
-                continue
-            
-            filtered_files.append(file_path)
+        # Walk once, pruning hidden and build/dependency directories before descending
+        filtered_files = list(find_files(base_path, pattern))
         
         if not filtered_files:
             return f"No files found matching pattern: {pattern}"
@@ -1335,11 +1282,11 @@ def find_files_by_pattern(pattern: str, base_path: str = ".") -> str:
         
         # Group by extension
         by_extension = {}
-        for file_path in filtered_files:
-            ext = file_path.suffix or 'no-extension'
+        for file_entry in filtered_files:
+            ext = file_entry.suffix or 'no-extension'
             if ext not in by_extension:
                 by_extension[ext] = []
-            by_extension[ext].append(file_path.relative_to(base_path))
+            by_extension[ext].append(file_entry.rel_path)
         
         for ext, files in sorted(by_extension.items()):
             results.append(f"## {ext} files ({len(files)})")
@@ -1352,12 +1299,25 @@ def find_files_by_pattern(pattern: str, base_path: str = ".") -> str:
         return f"Error finding files: {e}"
 
 @mcp.tool()
-def analyze_code_metrics(base_path: str = ".") -> str:
+async def analyze_code_metrics(base_path: str = ".", execution: str = "", workers: int = 0,
+                               ctx: Context = None) -> str:
     """
     Analyze code metrics like file count, lines of code, and technology distribution
+    
+    execution: 'serial' or 'thread' (default: DOCUMENTER_EXECUTION, which may also enable 'process')
+    workers: pool size for thread execution (default and maximum: DOCUMENTER_WORKERS)
     """
+    return await _run_with_progress(ctx, 1, _analyze_code_metrics, base_path, execution=execution, workers=workers)
+
+def _analyze_code_metrics(base_path: str, snapshot: Optional[ProjectSnapshot] = None,
+                          execution: Optional[str] = None, workers: Optional[int] = None,
+                          progress: Optional[ScanProgress] = None) -> str:
+    """Code metrics report; reuses the caller's snapshot when one is given"""
+    if execution and execution not in CLIENT_EXECUTION_MODES:
+        return f"Error analyzing code metrics: execution must be one of: {', '.join(CLIENT_EXECUTION_MODES)}"
     try:
-        base_path = Path(base_path).resolve()
+        snapshot = snapshot or ProjectSnapshot(base_path)
+        progress = progress or ScanProgress()
         
         # File extensions to analyze
         code_extensions = {
@@ -1397,52 +1357,44 @@ def analyze_code_metrics(base_path: str = ".") -> str:
             'file_sizes': [],
         }
         
-        # Analyze all files
-        for file_path in base_path.rglob('*'):
-            if not file_path.is_file():
+        # Analyze all files (hidden and build directories are pruned by the walker)
+        # Per-file [lines, chars, blank, comment, code] are reused from earlier runs while mtime and size match
+        progress.phase("Counting lines")
+        files = snapshot.files
+        with get_analysis_cache().session(snapshot.base_path, 'line_counts:v3') as cache:
+            file_counts = analyze_files(snapshot, files, line_counts, cache=cache,
+                                        execution=execution, workers=workers, progress=progress)
+        
+        for file_entry, counts in zip(files, file_counts):
+            metrics['total_files'] += 1
+            if counts is None:
+                # Skip binary files
                 continue
             
-            # Skip hidden files and common build directories
-            relative_path = file_path.relative_to(base_path)
-            path_parts = relative_path.parts
+            ext = file_entry.suffix.lower()
+            language = code_extensions.get(ext, 'Other')
+            lines, size, blank, comment, code = counts
             
-            if any(part.startswith('.') for part in path_parts):
-                continue
+            metrics['total_lines'] += lines
+            metrics['file_sizes'].append(size)
             
-            skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-            if any(part in skip_dirs for part in path_parts):
-                continue
+            if language not in metrics['by_language']:
+                metrics['by_language'][language] = {'files': 0, 'lines': 0, 'blank': 0, 'comment': 0, 'code': 0}
             
-            metrics['total_files'] += 1
+            stats = metrics['by_language'][language]
+            stats['files'] += 1
+            stats['lines'] += lines
+            stats['blank'] += blank
+            stats['comment'] += comment
+            stats['code'] += code
             
-            ext = file_path.suffix.lower()
-            language = code_extensions.get(ext, 'Other')
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    lines = content.count('\n') + 1
-                    size = len(content)
-                    
-                    metrics['total_lines'] += lines
-                    metrics['file_sizes'].append(size)
-                    
-                    if language not in metrics['by_language']:
-                        metrics['by_language'][language] = {'files': 0, 'lines': 0}
-                    
-                    metrics['by_language'][language]['files'] += 1
-                    metrics['by_language'][language]['lines'] += lines
-                    
-                    # Track largest files
-                    metrics['largest_files'].append({
-                        'path': relative_path,
-                        'lines': lines,
-                        'size': size,
-                        'language': language
-                    })
-            except:
-                # Skip binary files or files with encoding issues
-                pass
+            # Track largest files
+            metrics['largest_files'].append({
+                'path': file_entry.rel_path,
+                'lines': lines,
+                'size': size,
+                'language': language
+            })
         
         # Sort largest files
         metrics['largest_files'].sort(key=lambda x: x['lines'], reverse=True)
@@ -1467,6 +1419,11 @@ def analyze_code_metrics(base_path: str = ".") -> str:
                 percentage = (stats['lines'] / total_lines * 100) if total_lines > 0 else 0
                 results.append(f"- **{language}**: {stats['files']} files, {stats['lines']:,} lines ({percentage:.1f}%)")
             results.append("")
+            
+            results.append("## 🧾 Line Breakdown")
+            for language, stats in sorted_languages:
+                results.append(f"- **{language}**: {stats['code']:,} code, {stats['comment']:,} comment, {stats['blank']:,} blank")
+            results.append("")
         
         # Largest files
         if metrics['largest_files']:
@@ -1480,59 +1437,53 @@ def analyze_code_metrics(base_path: str = ".") -> str:
         return f"Error analyzing code metrics: {e}"
 
 @mcp.tool()
-def scan_for_todos_and_fixmes(base_path: str = ".") -> str:
+async def scan_for_todos_and_fixmes(base_path: str = ".", tags: Optional[List[str]] = None,
+                                    execution: str = "", workers: int = 0, ctx: Context = None) -> str:
     """
     Scan project for TODO, FIXME, HACK, and other code comments that need attention
+    
+    tags: annotation tags to look for (default: TODO, FIXME, HACK, NOTE, WARNING)
+    execution: 'serial' or 'thread' (default: DOCUMENTER_EXECUTION, which may also enable 'process')
+    workers: pool size for thread execution (default and maximum: DOCUMENTER_WORKERS)
     """
+    return await _run_with_progress(ctx, 1, _scan_for_todos_and_fixmes, base_path, tags=tags,
+                                    execution=execution, workers=workers)
+
+def _scan_for_todos_and_fixmes(base_path: str, snapshot: Optional[ProjectSnapshot] = None,
+                               tags: Optional[List[str]] = None, execution: Optional[str] = None,
+                               workers: Optional[int] = None, progress: Optional[ScanProgress] = None) -> str:
+    """Annotation report; reuses the caller's snapshot when one is given"""
+    if execution and execution not in CLIENT_EXECUTION_MODES:
+        return f"Error scanning for annotations: execution must be one of: {', '.join(CLIENT_EXECUTION_MODES)}"
     try:
-        base_path = Path(base_path).resolve()
+        snapshot = snapshot or ProjectSnapshot(base_path)
+        progress = progress or ScanProgress()
         
-        # Patterns to search for
-        patterns = {
-            'TODO': r'(?i)(?://|#|\*|<!--)?\s*TODO\s*:?\s*(.*)',
-            'FIXME': r'(?i)(?://|#|\*|<!--)?\s*FIXME\s*:?\s*(.*)',
-            'HACK': r'(?i)(?://|#|\*|<!--)?\s*HACK\s*:?\s*(.*)',
-            'NOTE': r'(?i)(?://|#|\*|<!--)?\s*NOTE\s*:?\s*(.*)',
-            'WARNING': r'(?i)(?://|#|\*|<!--)?\s*WARNING\s*:?\s*(.*)',
-        }
+        # Annotation tags to search for (matched case-insensitively)
+        tags = normalize_tags(tags, ('TODO', 'FIXME', 'HACK', 'NOTE', 'WARNING'))
         
-        findings = {pattern: [] for pattern in patterns.keys()}
+        findings = {tag: [] for tag in tags}
         
         # Code file extensions to search
         code_extensions = {'.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.kt', '.go', '.rs', '.php', '.rb', '.cs', '.cpp', '.c', '.swift', '.dart'}
         
-        for file_path in base_path.rglob('*'):
-            if not file_path.is_file() or file_path.suffix not in code_extensions:
-                continue
-            
-            # Skip hidden files and build directories
-            relative_path = file_path.relative_to(base_path)
-            path_parts = relative_path.parts
-            
-            if any(part.startswith('.') for part in path_parts):
-                continue
-            
-            skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-            if any(part in skip_dirs for part in path_parts):
-                continue
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    
-                for line_num, line in enumerate(lines, 1):
-                    for pattern_name, pattern in patterns.items():
-                        match = re.search(pattern, line)
-                        if match:
-                            comment = match.group(1).strip() if match.group(1) else line.strip()
-                            findings[pattern_name].append({
-                                'file': relative_path,
-                                'line': line_num,
-                                'comment': comment
-                            })
-            except:
-                # Skip files with encoding issues
-                pass
+        # Per-file [tag, line, comment] hits are reused from earlier runs while mtime and size match
+        progress.phase("Scanning annotations")
+        code_files = [f for f in snapshot.files if f.suffix in code_extensions]
+        # Sorted, so every ordering of the same tags shares one cache entry
+        scan_tags = tuple(sorted(tags))
+        with get_analysis_cache().session(snapshot.base_path, f"annotations:v2:{','.join(scan_tags)}") as cache:
+            file_hits = analyze_files(snapshot, code_files, find_annotations, scan_tags, cache=cache,
+                                      execution=execution, workers=workers, progress=progress)
+        
+        for file_entry, hits in zip(code_files, file_hits):
+            # None means the file could not be decoded
+            for pattern_name, line_num, comment in hits or []:
+                findings[pattern_name].append({
+                    'file': file_entry.rel_path,
+                    'line': line_num,
+                    'comment': comment
+                })
         
         # Generate report
         results = []
@@ -1740,11 +1691,16 @@ def auto_detect_user_project(hint_path: str = "") -> str:
         return f"Error detecting user project: {e}"
 
 @mcp.tool()
-def document_project_comprehensive(project_path: str = "") -> str:
+async def document_project_comprehensive(project_path: str = "", ctx: Context = None) -> str:
     """
     Complete project documentation workflow with enhanced detection and analysis
     Automatically detects any project type and generates comprehensive documentation
     """
+    return await _run_with_progress(ctx, 6, _document_project_comprehensive, project_path)
+
+def _document_project_comprehensive(project_path: str, progress: Optional[ScanProgress] = None) -> str:
+    """Comprehensive documentation report; each finished step is published to progress"""
+    progress = progress or ScanProgress()
     try:
         # Step 1: Enhanced project path detection
         if not project_path:
@@ -1767,8 +1723,11 @@ def document_project_comprehensive(project_path: str = "") -> str:
         if not base_path.exists():
             return f"❌ Project path does not exist: {base_path}\nDetection method: {detection_method}"
         
+        # One traversal and one read per file, shared by every step below
+        snapshot = ProjectSnapshot(base_path)
+        
         # Validate this is a real project directory
-        project_files = list(base_path.iterdir()) if base_path.is_dir() else []
+        project_files = snapshot.list_dir(base_path, skip_hidden=False) if base_path.is_dir() else []
         project_indicators = [
             'package.json', 'pyproject.toml', 'requirements.txt', 'pom.xml',
             'Cargo.toml', 'go.mod', 'composer.json', '.git', '.gitignore',
@@ -1776,7 +1735,7 @@ def document_project_comprehensive(project_path: str = "") -> str:
         ]
         
         has_indicators = any(
-            (base_path / indicator).exists() for indicator in project_indicators
+            snapshot.exists(indicator) for indicator in project_indicators
         )
         
         if not has_indicators and len(project_files) < 3:
@@ -1786,27 +1745,37 @@ def document_project_comprehensive(project_path: str = "") -> str:
             results.append("")
         
         # Step 2: Enhanced project type detection
+        progress.phase("Detecting project type")
+        step_start = len(results)
         results.append("## 🔍 Step 1: Enhanced Project Type Detection")
         results.append("-" * 50)
         try:
-            project_type_result = detect_project_type(str(base_path))
+            project_type_result = _detect_project_type(str(base_path), snapshot)
             results.append(project_type_result)
         except Exception as e:
             results.append(f"❌ Error in project type detection: {e}")
             results.append("📝 Continuing with generic analysis...")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 3: Comprehensive project structure analysis
+        progress.phase("Analyzing structure")
+        step_start = len(results)
         results.append("## 📊 Step 2: Project Structure Analysis")
         results.append("-" * 50)
         try:
-            structure_result = analyze_project_structure(str(base_path))
+            structure_result = _analyze_project_structure(str(base_path), snapshot)
             results.append(structure_result)
         except Exception as e:
             results.append(f"❌ Error in structure analysis: {e}")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 4: Multi-format configuration analysis
+        progress.phase("Analyzing configuration")
+        step_start = len(results)
         results.append("## ⚙️ Step 3: Configuration Files Analysis")
         results.append("-" * 50)
         
@@ -1830,18 +1799,18 @@ def document_project_comprehensive(project_path: str = "") -> str:
             category_files = []
             for config_file in config_files:
                 if "*" in config_file:
-                    matches = list(base_path.glob(config_file))
+                    matches = snapshot.match_root(config_file)
                     if matches:
-                        category_files.extend([m.name for m in matches])
+                        category_files.extend(matches)
                 else:
-                    if (base_path / config_file).exists():
+                    if snapshot.exists(config_file):
                         category_files.append(config_file)
             
             if category_files:
                 results.append(f"### {category}")
                 for config_file in category_files:
                     config_path = base_path / config_file
-                    if config_path.exists():
+                    if snapshot.exists(config_file):
                         found_configs.append(config_file)
                         try:
                             if config_file == "package.json":
@@ -1863,31 +1832,42 @@ def document_project_comprehensive(project_path: str = "") -> str:
             results.append("This might be a generic project or use custom configuration")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 5: Code metrics and technology analysis
+        step_start = len(results)
         results.append("## 📈 Step 4: Code Metrics & Technology Analysis")
         results.append("-" * 50)
         try:
-            metrics_result = analyze_code_metrics(str(base_path))
+            metrics_result = _analyze_code_metrics(str(base_path), snapshot, progress=progress)
             results.append(metrics_result)
         except Exception as e:
             results.append(f"❌ Error analyzing code metrics: {e}")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 6: Development workflow analysis
+        progress.phase("Analyzing workflow")
+        step_start = len(results)
         results.append("## 🛠️ Step 5: Development Workflow Analysis")
         results.append("-" * 50)
         try:
-            workflow_info = _analyze_development_workflow(base_path)
+            workflow_info = _analyze_development_workflow(snapshot)
             results.append(workflow_info)
         except Exception as e:
             results.append(f"❌ Error analyzing workflow: {e}")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 7: README generation
+        progress.phase("Generating README")
+        step_start = len(results)
         results.append("## 📝 Step 6: Comprehensive README Generation")
         results.append("-" * 50)
         try:
-            readme_result = generate_project_readme(str(base_path))
+            readme_result = _generate_project_readme(str(base_path), snapshot)
             
             # Save the README file
             readme_path = base_path / "README_GENERATED.md"
@@ -1904,6 +1884,8 @@ def document_project_comprehensive(project_path: str = "") -> str:
             results.append(f"❌ Error generating README: {e}")
         results.append("")
         
+        progress.section(results[step_start][3:], '\n'.join(results[step_start + 2:]))
+        
         # Step 8: Summary and recommendations
         results.append("## ✅ Documentation Summary")
         results.append("-" * 50)
@@ -1916,7 +1898,7 @@ def document_project_comprehensive(project_path: str = "") -> str:
         # Provide next steps
         results.append("## 🎯 Next Steps & Recommendations")
         results.append("-" * 50)
-        next_steps = _get_project_recommendations(base_path, found_configs)
+        next_steps = _get_project_recommendations(snapshot, found_configs)
         results.append(next_steps)
         results.append("")
         
@@ -1930,74 +1912,74 @@ def document_project_comprehensive(project_path: str = "") -> str:
     except Exception as e:
         return f"❌ Critical error in comprehensive documentation: {e}\n\nPlease try specifying the project path explicitly:\n'Document the project at /absolute/path/to/project comprehensively'"
 
-def _analyze_development_workflow(base_path: Path) -> str:
+def _analyze_development_workflow(snapshot: ProjectSnapshot) -> str:
     """Analyze development workflow based on project structure and files"""
     workflow_info = []
     
     # Check for CI/CD
     ci_files = ['.github/workflows', '.gitlab-ci.yml', 'azure-pipelines.yml', 'Jenkinsfile', '.circleci']
-    found_ci = [ci for ci in ci_files if (base_path / ci).exists()]
+    found_ci = [ci for ci in ci_files if snapshot.exists(ci)]
     
     if found_ci:
         workflow_info.append(f"🔄 **CI/CD Detected**: {', '.join(found_ci)}")
     
     # Check for testing
     test_indicators = ['test', 'tests', '__tests__', 'spec', 'specs']
-    test_dirs = [td for td in test_indicators if (base_path / td).exists()]
+    test_dirs = [td for td in test_indicators if snapshot.exists(td)]
     
     if test_dirs:
         workflow_info.append(f"🧪 **Testing Structure**: {', '.join(test_dirs)}")
     
     # Check for documentation
     doc_indicators = ['docs', 'documentation', 'README.md', 'CONTRIBUTING.md']
-    doc_files = [doc for doc in doc_indicators if (base_path / doc).exists()]
+    doc_files = [doc for doc in doc_indicators if snapshot.exists(doc)]
     
     if doc_files:
         workflow_info.append(f"📚 **Documentation**: {', '.join(doc_files)}")
     
     # Check for containerization
     container_files = ['Dockerfile', 'docker-compose.yml', '.dockerignore']
-    container_found = [cf for cf in container_files if (base_path / cf).exists()]
+    container_found = [cf for cf in container_files if snapshot.exists(cf)]
     
     if container_found:
         workflow_info.append(f"🐳 **Containerization**: {', '.join(container_found)}")
     
     # Check for environment management
     env_files = ['.env.example', '.env.template', '.env.local', 'config']
-    env_found = [ef for ef in env_files if (base_path / ef).exists()]
+    env_found = [ef for ef in env_files if snapshot.exists(ef)]
     
     if env_found:
         workflow_info.append(f"🌍 **Environment Config**: {', '.join(env_found)}")
     
     return '\n'.join(workflow_info) if workflow_info else "ℹ️ Standard development workflow detected"
 
-def _get_project_recommendations(base_path: Path, found_configs: List[str]) -> str:
+def _get_project_recommendations(snapshot: ProjectSnapshot, found_configs: List[str]) -> str:
     """Generate recommendations based on project analysis"""
     recommendations = []
     
     # Generic recommendations
-    if not (base_path / 'README.md').exists():
+    if not snapshot.exists('README.md'):
         recommendations.append("📝 Consider creating a comprehensive README.md")
     
-    if not (base_path / '.gitignore').exists():
+    if not snapshot.exists('.gitignore'):
         recommendations.append("🚫 Add a .gitignore file for your project type")
     
-    if not (base_path / 'LICENSE').exists():
+    if not snapshot.exists('LICENSE'):
         recommendations.append("⚖️ Consider adding a LICENSE file")
     
     # Technology-specific recommendations
     if any('package.json' in config for config in found_configs):
-        if not (base_path / '.nvmrc').exists():
+        if not snapshot.exists('.nvmrc'):
             recommendations.append("🔧 Consider adding .nvmrc for Node.js version management")
-        if not (base_path / 'tsconfig.json').exists() and 'typescript' in str(found_configs).lower():
+        if not snapshot.exists('tsconfig.json') and 'typescript' in str(found_configs).lower():
             recommendations.append("📘 Consider adding TypeScript configuration")
     
     if any('requirements.txt' in config or 'pyproject.toml' in config for config in found_configs):
-        if not (base_path / '.python-version').exists():
+        if not snapshot.exists('.python-version'):
             recommendations.append("🐍 Consider adding .python-version for Python version management")
     
     if any('.csproj' in config or '.sln' in config for config in found_configs):
-        if not (base_path / '.editorconfig').exists():
+        if not snapshot.exists('.editorconfig'):
             recommendations.append("📝 Consider adding .editorconfig for consistent coding style")
     
     return '\n'.join(f"• {rec}" for rec in recommendations) if recommendations else "✅ Project structure looks comprehensive!"
@@ -0,0 +1,968 @@
+#!/usr/bin/env python3
+"""
+Documenter Project Scanner
+Shared filesystem traversal for the Documenter MCP servers (server.py, main.py).
+
+Directories are pruned before they are entered, so excluded trees such as
+node_modules are never enumerated, and every yielded entry reuses the stat
+information cached on its os.DirEntry. .gitignore/.documenterignore rules are
+applied with ignore_rules.IgnoreMatcher, the matcher the companion uses, and
+tracked files can be listed from .git/index instead of walking. Standard
+library only.
+"""
+
+import fnmatch
+import logging
+import multiprocessing
+import os
+import re
+import stat
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Iterable, Union
+
+from ignore_rules import IgnoreMatcher
+
+logger = logging.getLogger(__name__)
+
+# Build, dependency and cache directories never worth descending into
+DEFAULT_SKIP_DIRS = frozenset({
+    'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'
+})
+
+# Per-file content analysis execution (override per call or via environment)
+EXECUTION_MODES = ('serial', 'thread', 'process')
+CLIENT_EXECUTION_MODES = ('serial', 'thread')  # What tool callers may pick; 'process' only via DOCUMENTER_EXECUTION
+DEFAULT_EXECUTION = os.environ.get('DOCUMENTER_EXECUTION', 'serial').lower()
+DEFAULT_WORKERS = int(os.environ.get('DOCUMENTER_WORKERS', 0)) or os.cpu_count() or 1  # Also the per-call ceiling
+PARALLEL_MIN_FILES = 64  # Below this a pool costs more than it saves
+PROGRESS_INTERVAL = 0.5  # Seconds between file-count progress reports
+
+# Project file enumeration (override per snapshot or via environment)
+_ENV_OFF = ('0', 'false', 'off', 'no')
+USE_GITIGNORE = os.environ.get('DOCUMENTER_GITIGNORE', '1').lower() not in _ENV_OFF  # Honour ignore files
+USE_GIT_INDEX = os.environ.get('DOCUMENTER_GIT_INDEX', '0').lower() not in _ENV_OFF  # List tracked files from .git/index
+
+BINARY_SNIFF_BYTES = 8192  # A NUL byte in this leading block marks a file as binary
+_UTF8_LEAD_BYTES = bytes(b for b in range(256) if not 0x80 <= b < 0xC0)
+
+# Comment syntax per extension (or exact file name): line prefixes, block delimiters
+_C_STYLE = ((b'//',), ((b'/*', b'*/'),))
+_HASH = ((b'#',), ())
+_MARKUP = ((), ((b'<!--', b'-->'),))
+COMMENT_SYNTAX = {
+    '.py': ((b'#',), ((b'"""', b'"""'), (b"'''", b"'''"))),
+    '.js': _C_STYLE, '.ts': _C_STYLE, '.jsx': _C_STYLE, '.tsx': _C_STYLE,
+    '.java': _C_STYLE, '.kt': _C_STYLE, '.go': _C_STYLE, '.rs': _C_STYLE,
+    '.cs': _C_STYLE, '.cpp': _C_STYLE, '.c': _C_STYLE, '.h': _C_STYLE,
+    '.swift': _C_STYLE, '.dart': _C_STYLE, '.scss': _C_STYLE,
+    '.php': ((b'//', b'#'), ((b'/*', b'*/'),)),
+    '.css': ((), ((b'/*', b'*/'),)),
+    '.rb': ((b'#',), ((b'=begin', b'=end'),)),
+    '.html': _MARKUP, '.xml': _MARKUP, '.vue': ((b'//',), ((b'<!--', b'-->'), (b'/*', b'*/'))),
+    '.sh': _HASH, '.yaml': _HASH, '.yml': _HASH, '.toml': _HASH,
+    'Dockerfile': _HASH, 'Makefile': _HASH,
+}
+
+class _StatEntry:
+    """Minimal os.DirEntry stand-in for paths that were not found by scandir"""
+
+    __slots__ = ('path', 'name', '_stat')
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = stat_result
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return self._stat
+
+class FileEntry:
+    """Lightweight file record backed by a cached os.DirEntry"""
+
+    __slots__ = ('rel_path', '_entry')
+
+    def __init__(self, entry: os.DirEntry, rel_path: str):
+        self._entry = entry
+        self.rel_path = rel_path  # Relative to the walk root, native separators
+
+    @property
+    def path(self) -> str:
+        return self._entry.path
+
+    @property
+    def name(self) -> str:
+        return self._entry.name
+
+    @property
+    def suffix(self) -> str:
+        """File extension with the same semantics as pathlib.PurePath.suffix"""
+        name = self._entry.name
+        index = name.rfind('.')
+        if 0 < index < len(name) - 1:
+            return name[index:]
+        return ''
+
+    @property
+    def rel_posix(self) -> str:
+        return self.rel_path if os.sep == '/' else self.rel_path.replace(os.sep, '/')
+
+    @property
+    def size(self) -> int:
+        return self._entry.stat().st_size
+
+    @property
+    def mtime_ns(self) -> int:
+        return self._entry.stat().st_mtime_ns
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.rel_path!r})"
+
+def ignore_matcher(base_path) -> IgnoreMatcher:
+    """Matcher for a project's .gitignore/.documenterignore files (no built-in patterns)"""
+    return IgnoreMatcher(Path(base_path), ())
+
+def walk_files(base_path, skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS, skip_hidden: bool = True,
+               max_depth: Optional[int] = None,
+               listings: Optional[Dict[str, List[os.DirEntry]]] = None,
+               ignore: Optional[IgnoreMatcher] = None) -> Iterator[FileEntry]:
+    """
+    Yield regular files below base_path in a deterministic, depth-first order.
+
+    Directories named in skip_dirs (and dot-directories when skip_hidden is set)
+    are pruned without being listed. Symlinked directories are not followed.
+    max_depth limits how many directory levels below base_path are entered.
+    When listings is given, every scanned directory's sorted entries are stored
+    in it keyed by directory path so later lookups need no extra syscalls.
+    With an ignore matcher, each directory's ignore files are loaded from its
+    listing and ignored entries are skipped (directories without being entered).
+    """
+    skip_dirs = frozenset(skip_dirs)
+    stack: List[Tuple[str, str, int]] = [(os.fspath(base_path), '', 0)]
+
+    while stack:
+        dir_path, rel_dir, depth = stack.pop()
+        try:
+            with os.scandir(dir_path) as iterator:
+                entries = sorted(iterator, key=lambda e: e.name)
+        except OSError:
+            continue  # Unreadable directory - skip it like rglob does
+        if listings is not None:
+            listings[dir_path] = entries
+        if ignore is not None:
+            rel_posix = rel_dir.replace(os.sep, '/')
+            ignore.enter(rel_posix, [entry.name for entry in entries])
+            ignore_prefix = f"{rel_posix}/" if rel_posix else ''
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if skip_hidden and name.startswith('.'):
+                continue
+            rel_path = f"{rel_dir}{os.sep}{name}" if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in skip_dirs and (max_depth is None or depth < max_depth):
+                        if ignore is None or not ignore.ignored(ignore_prefix + name, True):
+                            subdirs.append((entry.path, rel_path, depth + 1))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if ignore is not None and ignore.ignored(ignore_prefix + name, False):
+                continue
+            yield FileEntry(entry, rel_path)
+
+        # Reverse so the alphabetically first directory is visited next
+        stack.extend(reversed(subdirs))
+
+def _git_dir(base_path: str) -> Optional[str]:
+    """The repository directory for a work tree root, following 'gitdir:' files"""
+    dot_git = os.path.join(base_path, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+    try:
+        with open(dot_git, 'r', encoding='utf-8') as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+    if line.startswith('gitdir:'):
+        return os.path.normpath(os.path.join(base_path, line[len('gitdir:'):].strip()))
+    return None
+
+def read_git_index(git_dir: str) -> Optional[List[str]]:
+    """
+    Tracked paths ('/'-separated) from a .git/index file, versions 2-4.
+    Gitlinks (submodules) and sparse directory entries are left out.
+    Returns None when the index is missing or not understood.
+    """
+    try:
+        with open(os.path.join(git_dir, 'index'), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < 12 or data[:4] != b'DIRC':
+        return None
+    version = int.from_bytes(data[4:8], 'big')
+    count = int.from_bytes(data[8:12], 'big')
+    if version not in (2, 3, 4):
+        return None
+    hash_size = 20
+    try:
+        with open(os.path.join(git_dir, 'config'), 'r', encoding='utf-8', errors='replace') as f:
+            if re.search(r'objectformat\s*=\s*sha256', f.read(), re.IGNORECASE):
+                hash_size = 32
+    except OSError:
+        pass
+
+    paths: List[str] = []
+    previous = b''
+    offset = 12
+    try:
+        for _ in range(count):
+            start = offset
+            mode = int.from_bytes(data[offset + 24:offset + 28], 'big')
+            offset += 40 + hash_size
+            flags = int.from_bytes(data[offset:offset + 2], 'big')
+            offset += 2
+            if version >= 3 and flags & 0x4000:
+                offset += 2  # Extended flags
+            if version == 4:
+                # Path is stored as (bytes to drop from the previous path, NUL-terminated suffix)
+                byte = data[offset]
+                offset += 1
+                strip = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[offset]
+                    offset += 1
+                    strip = ((strip + 1) << 7) | (byte & 0x7F)
+                end = data.index(b'\0', offset)
+                path = previous[:len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                end = data.index(b'\0', offset)
+                path = data[offset:end]
+                offset = start + ((end - start + 8) & ~7)  # 1-8 NUL bytes pad entries to 8
+            previous = path
+            if (flags >> 12) & 3 or stat.S_IFMT(mode) not in (stat.S_IFREG, stat.S_IFLNK):
+                continue  # Merge conflict stages, gitlinks, sparse directories
+            paths.append(path.decode('utf-8', 'surrogateescape'))
+    except (IndexError, ValueError):
+        return None
+    return paths
+
+def _walk_order_key(rel_posix: str) -> Tuple[Tuple[int, str], ...]:
+    """Sort key reproducing walk_files order: a directory's files, then its subdirectories"""
+    parts = rel_posix.split('/')
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def git_index_files(base_path, skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS, skip_hidden: bool = True,
+                    max_depth: Optional[int] = None,
+                    ignore: Optional[IgnoreMatcher] = None) -> Optional[List[FileEntry]]:
+    """
+    Files tracked in base_path's git index, filtered and ordered like
+    walk_files() but without listing any directory. Each file is stat'ed
+    once (the index's own stat data may be stale). Returns None when
+    base_path is not a git work tree root or its index can't be read.
+    """
+    root = os.fspath(base_path)
+    git_dir = _git_dir(root)
+    paths = read_git_index(git_dir) if git_dir else None
+    if paths is None:
+        return None
+    skip_dirs = frozenset(skip_dirs)
+    files = []
+    for rel_posix in sorted(paths, key=_walk_order_key):
+        parts = rel_posix.split('/')
+        if max_depth is not None and len(parts) - 1 > max_depth:
+            continue
+        if skip_hidden and any(part.startswith('.') for part in parts):
+            continue
+        if any(part in skip_dirs for part in parts[:-1]):
+            continue
+        if ignore is not None and ignore.excluded(rel_posix):
+            continue  # Tracked files can still match rules added later
+        rel_path = rel_posix if os.sep == '/' else rel_posix.replace('/', os.sep)
+        path = os.path.join(root, rel_path)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue  # Deleted from the work tree
+        if stat.S_ISREG(stat_result.st_mode):
+            files.append(FileEntry(_StatEntry(path, stat_result), rel_path))
+    return files
+
+def iter_project_files(base_path, skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS, skip_hidden: bool = True,
+                       max_depth: Optional[int] = None,
+                       listings: Optional[Dict[str, List[os.DirEntry]]] = None,
+                       gitignore: Optional[bool] = None, git_index: Optional[bool] = None) -> Iterator[FileEntry]:
+    """
+    Project files for analysis: tracked files from .git/index when git_index
+    is enabled and available, otherwise walk_files(), both honouring ignore
+    files when gitignore is enabled. None means use the environment default.
+    """
+    ignore = ignore_matcher(base_path) if (USE_GITIGNORE if gitignore is None else gitignore) else None
+    if USE_GIT_INDEX if git_index is None else git_index:
+        files = git_index_files(base_path, skip_dirs, skip_hidden, max_depth, ignore)
+        if files is not None:
+            return iter(files)
+    return walk_files(base_path, skip_dirs, skip_hidden, max_depth, listings, ignore)
+
+def _tree_order(entries: Iterable[os.DirEntry], skip_names: Iterable[str], skip_hidden: bool) -> List[os.DirEntry]:
+    skip_names = frozenset(skip_names)
+    visible = [
+        entry for entry in entries
+        if not (skip_hidden and entry.name.startswith('.')) and entry.name not in skip_names
+    ]
+    visible.sort(key=lambda e: (e.is_file(), e.name.lower()))
+    return visible
+
+def list_dir(path, skip_names: Iterable[str] = (), skip_hidden: bool = True) -> List[os.DirEntry]:
+    """List one directory for tree rendering: directories first, then files, case-insensitive"""
+    with os.scandir(path) as iterator:
+        return _tree_order(iterator, skip_names, skip_hidden)
+
+def _translate_glob_segment(segment: str) -> str:
+    """Translate one glob path segment into a regex fragment that never crosses '/'"""
+    result = []
+    i, n = 0, len(segment)
+    while i < n:
+        char = segment[i]
+        i += 1
+        if char == '*':
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[':
+            end = segment.find(']', i + 1 if i < n and segment[i] in '!]' else i)
+            if end == -1:
+                result.append('\\[')
+                continue
+            body = segment[i:end].replace('\\', '\\\\')
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            result.append(f'[{body}]')
+            i = end + 1
+        else:
+            result.append(re.escape(char))
+    return ''.join(result)
+
+def compile_glob(pattern: str) -> Tuple[re.Pattern, Optional[int]]:
+    """
+    Compile a pathlib-style glob (*.py, src/*.ts, **/*.js) into a regex over
+    '/'-separated relative paths, plus the maximum directory depth it can match
+    (None when the pattern contains '**').
+    """
+    segments = [s for s in pattern.replace('\\', '/').split('/') if s and s != '.']
+    if not segments:
+        segments = ['*']
+
+    parts = []
+    recursive = False
+    for index, segment in enumerate(segments):
+        is_last = index == len(segments) - 1
+        if segment == '**':
+            recursive = True
+            parts.append('.*' if is_last else '(?:[^/]+/)*')
+        else:
+            parts.append(_translate_glob_segment(segment) + ('' if is_last else '/'))
+
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    regex = re.compile(''.join(parts) + r'\Z', flags)
+    return regex, None if recursive else len(segments) - 1
+
+def find_files(base_path, pattern: str, skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+               skip_hidden: bool = True) -> Iterator[FileEntry]:
+    """Yield files whose path relative to base_path matches a glob pattern"""
+    regex, max_depth = compile_glob(pattern)
+    for entry in iter_project_files(base_path, skip_dirs, skip_hidden, max_depth):
+        if regex.match(entry.rel_posix):
+            yield entry
+
+class ProjectSnapshot:
+    """
+    One traversal of a project shared by every analysis in a single request.
+
+    The file list is walked lazily on first use, directory listings are cached
+    as they are scanned, and file contents are read from disk at most once
+    (up to max_cached_bytes in total; larger projects fall back to re-reading).
+    Ignore files and git index listing follow iter_project_files().
+    """
+
+    def __init__(self, base_path, skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+                 max_cached_bytes: int = 64 * 1024 * 1024,
+                 gitignore: Optional[bool] = None, git_index: Optional[bool] = None):
+        self.base_path = Path(base_path).resolve()
+        self.skip_dirs = frozenset(skip_dirs)
+        self.max_cached_bytes = max_cached_bytes
+        self.gitignore = USE_GITIGNORE if gitignore is None else gitignore
+        self.git_index = USE_GIT_INDEX if git_index is None else git_index
+        self._ignore: Optional[IgnoreMatcher] = None
+        self._files_lock = threading.Lock()  # Snapshots can be shared by concurrent tool calls
+        self._root = os.fspath(self.base_path)
+        self._files: Optional[List[FileEntry]] = None
+        self._listings: Dict[str, List[os.DirEntry]] = {}
+        self._name_index: Dict[str, Dict[str, os.DirEntry]] = {}
+        self._contents: Dict[str, Union[str, bytes]] = {}
+        self._cached_bytes = 0
+
+    @property
+    def files(self) -> List[FileEntry]:
+        """Every non-excluded file in the project, walked once"""
+        if self._files is None:
+            with self._files_lock:
+                if self._files is None:
+                    self._files = list(iter_project_files(self._root, self.skip_dirs, listings=self._listings,
+                                                          gitignore=self.gitignore, git_index=self.git_index))
+        return self._files
+
+    def _resolve(self, path) -> str:
+        if isinstance(path, FileEntry):
+            return path.path
+        path = os.fspath(path)
+        if os.path.isabs(path):
+            return path
+        return os.path.normpath(os.path.join(self._root, path))
+
+    def _scan(self, dir_path: str) -> List[os.DirEntry]:
+        entries = self._listings.get(dir_path)
+        if entries is None:
+            with os.scandir(dir_path) as iterator:
+                entries = sorted(iterator, key=lambda e: e.name)
+            self._listings[dir_path] = entries
+        return entries
+
+    def _lookup(self, rel_path) -> Optional[os.DirEntry]:
+        """Find the DirEntry for a project-relative path using cached listings"""
+        parts = [p for p in os.fspath(rel_path).replace('\\', '/').split('/') if p and p != '.']
+        current = self._root
+        entry = None
+        for index, part in enumerate(parts):
+            index_for_dir = self._name_index.get(current)
+            if index_for_dir is None:
+                try:
+                    listing = self._scan(current)
+                except OSError:
+                    return None
+                index_for_dir = {os.path.normcase(e.name): e for e in listing}
+                self._name_index[current] = index_for_dir
+            entry = index_for_dir.get(os.path.normcase(part))
+            if entry is None:
+                return None
+            if index < len(parts) - 1:
+                try:
+                    if not entry.is_dir():
+                        return None
+                except OSError:
+                    return None
+                current = entry.path
+        return entry
+
+    def exists(self, rel_path) -> bool:
+        return self._lookup(rel_path) is not None
+
+    def is_file(self, rel_path) -> bool:
+        entry = self._lookup(rel_path)
+        try:
+            return entry is not None and entry.is_file()
+        except OSError:
+            return False
+
+    def is_dir(self, rel_path) -> bool:
+        entry = self._lookup(rel_path)
+        try:
+            return entry is not None and entry.is_dir()
+        except OSError:
+            return False
+
+    def match_root(self, pattern: str) -> List[str]:
+        """Names in the project root matching a wildcard such as *.csproj"""
+        try:
+            names = [e.name for e in self._scan(self._root)]
+        except OSError:
+            return []
+        return fnmatch.filter(names, pattern)
+
+    def list_dir(self, path, skip_names: Iterable[str] = (), skip_hidden: bool = True) -> List[os.DirEntry]:
+        """Cached equivalent of list_dir() for tree rendering, without ignored entries"""
+        dir_path = self._resolve(path)
+        entries = self._scan(dir_path)
+        rel_dir = os.path.relpath(dir_path, self._root)
+        if self.gitignore and not rel_dir.startswith('..'):
+            if self._ignore is None:
+                self._ignore = ignore_matcher(self.base_path)
+            rel_posix = '' if rel_dir == '.' else rel_dir.replace(os.sep, '/')
+            prefix = f"{rel_posix}/" if rel_posix else ''
+            self._ignore.enter(rel_posix, [e.name for e in entries])
+            entries = [e for e in entries if not self._ignore.ignored(prefix + e.name, e.is_dir())]
+        return _tree_order(entries, skip_names, skip_hidden)
+
+    def read_bytes(self, path) -> bytes:
+        """Raw file content; served from the snapshot cache when already read"""
+        key = self._resolve(path)
+        cached = self._contents.get(key)
+        if isinstance(cached, bytes):
+            return cached
+        if isinstance(cached, str):
+            return cached.encode('utf-8')
+        with open(key, 'rb') as f:
+            data = f.read()
+        self._remember(key, data, len(data))
+        return data
+
+    def read_text(self, path, errors: str = 'strict') -> Optional[str]:
+        """
+        UTF-8 content read from disk at most once. Returns None when the file
+        cannot be read, or cannot be decoded and errors is 'strict'.
+        """
+        key = self._resolve(path)
+        cached = self._contents.get(key)
+        if isinstance(cached, str):
+            return cached
+        if cached is None:
+            try:
+                with open(key, 'rb') as f:
+                    cached = f.read()
+            except OSError:
+                return None
+            size = len(cached)
+            try:
+                cached = cached.decode('utf-8')
+            except UnicodeDecodeError:
+                pass  # Keep the bytes so lenient readers can still decode them
+            self._remember(key, cached, size)
+        if isinstance(cached, str):
+            return cached
+        if errors == 'strict':
+            return None
+        return cached.decode('utf-8', errors=errors)
+
+    def _remember(self, key: str, content: Union[str, bytes], size: int):
+        if self._cached_bytes + size <= self.max_cached_bytes:
+            self._contents[key] = content
+            self._cached_bytes += size
+
+class ProjectTypeDetector:
+    """
+    Scores every type in a PROJECT_CONFIGS-style table in one sweep.
+
+    Indicator files, wildcards, important directories and content keywords are
+    indexed once when the detector is built. Detection checks each distinct
+    path once, reads each content file once and matches all of its keywords
+    in a single regex pass; results are remembered per snapshot.
+    """
+
+    def __init__(self, configs: Dict[str, Dict[str, Any]], skip_types: Iterable[str] = ('generic',)):
+        self._configs = [(name, config) for name, config in configs.items() if name not in skip_types]
+        indicators = dict.fromkeys(i for _, config in self._configs for i in config["indicators"])
+        self._literal_indicators = [i for i in indicators if '*' not in i]
+        self._wildcard_indicators = [i for i in indicators if '*' in i]
+        self._important_dirs = list(dict.fromkeys(d for _, config in self._configs for d in config["important_dirs"]))
+
+        # Per content file: one lookahead alternation (longest first, so a keyword
+        # that shares its start with a longer one is implied by it) over all keywords
+        self._keyword_scanners: Dict[str, Tuple[re.Pattern, Dict[str, Tuple[str, ...]]]] = {}
+        keywords_by_file: Dict[str, Dict[str, None]] = {}
+        for _, config in self._configs:
+            for file_name, keys in config["check_content"].items():
+                keys = [keys] if isinstance(keys, str) else keys
+                keywords_by_file.setdefault(file_name, {}).update(dict.fromkeys(k.lower() for k in keys))
+        for file_name, keywords in keywords_by_file.items():
+            ordered = sorted(keywords, key=len, reverse=True)
+            regex = re.compile('(?=(' + '|'.join(re.escape(k) for k in ordered) + '))')
+            implied = {k: tuple(other for other in ordered if other in k) for k in ordered}
+            self._keyword_scanners[file_name] = (regex, implied)
+
+        self._memo: "weakref.WeakKeyDictionary[ProjectSnapshot, List[Dict[str, Any]]]" = weakref.WeakKeyDictionary()
+        self._memo_lock = threading.Lock()
+
+    def _keywords_in(self, snapshot: ProjectSnapshot, file_name: str) -> Optional[set]:
+        """Lowercased keywords present in one content file, or None if it can't be read"""
+        if not snapshot.is_file(file_name):
+            return None
+        content = snapshot.read_text(file_name, errors='ignore')
+        if content is None:
+            return None
+        regex, implied = self._keyword_scanners[file_name]
+        found = set()
+        for match in regex.finditer(content.lower()):
+            keyword = match.group(1)
+            if keyword not in found:
+                found.update(implied[keyword])
+                if len(found) == len(implied):
+                    break
+        return found
+
+    def indicator_hits(self, snapshot: ProjectSnapshot) -> int:
+        """Indicator files present, counted once per project type that lists them"""
+        present = {i for i in self._literal_indicators if snapshot.exists(i)}
+        present.update(i for i in self._wildcard_indicators if snapshot.match_root(i))
+        return sum(1 for _, config in self._configs for i in config["indicators"] if i in present)
+
+    def detect(self, snapshot: ProjectSnapshot) -> List[Dict[str, Any]]:
+        """
+        Matching types as {'type', 'score', 'indicators', 'directories'} dicts,
+        highest score first (ties keep table order).
+        """
+        with self._memo_lock:
+            cached = self._memo.get(snapshot)
+        if cached is None:
+            cached = self._detect(snapshot)
+            with self._memo_lock:
+                self._memo[snapshot] = cached
+        return [{**t, 'indicators': list(t['indicators']), 'directories': list(t['directories'])} for t in cached]
+
+    def _detect(self, snapshot: ProjectSnapshot) -> List[Dict[str, Any]]:
+        present = {i for i in self._literal_indicators if snapshot.exists(i)}
+        wildcard_matches = {i: snapshot.match_root(i) for i in self._wildcard_indicators}
+        dirs = {d for d in self._important_dirs if snapshot.exists(d)}
+        keywords = {}
+        for file_name in self._keyword_scanners:
+            try:
+                keywords[file_name] = self._keywords_in(snapshot, file_name)
+            except Exception:
+                keywords[file_name] = None  # Skip files that can't be read
+
+        detected_types = []
+        for project_type, config in self._configs:
+            score = 0
+            found_indicators = []
+
+            for indicator in config["indicators"]:
+                if '*' in indicator:
+                    matches = wildcard_matches[indicator]
+                    if matches:
+                        found_indicators.append(f"{indicator} ({len(matches)} files)")
+                        score += 2
+                elif indicator in present:
+                    found_indicators.append(indicator)
+                    score += 2
+
+            for file_to_check, content_keys in config["check_content"].items():
+                found = keywords[file_to_check]
+                if not found:
+                    continue
+                if isinstance(content_keys, str):
+                    if content_keys.lower() in found:
+                        score += 3
+                        found_indicators.append(f"{file_to_check} (contains '{content_keys}')")
+                    continue
+                matched_keys = [key for key in content_keys if key.lower() in found]
+                if matched_keys:
+                    score += len(matched_keys) * 2  # More matches = higher score
+                    found_indicators.append(f"{file_to_check} (contains {', '.join(matched_keys)})")
+
+            found_dirs = [d for d in config["important_dirs"] if d in dirs]
+            score += min(len(found_dirs), 4)  # Cap directory score at 4
+            score += config.get("confidence_boost", 0)
+
+            if score > 0:
+                detected_types.append({
+                    'type': project_type,
+                    'score': score,
+                    'indicators': found_indicators,
+                    'directories': found_dirs
+                })
+
+        detected_types.sort(key=lambda x: x['score'], reverse=True)
+        return detected_types
+
+# Per-file analyzers: take raw file bytes and the file name, return
+# JSON-serialisable results (None when the file cannot be analysed)
+
+def line_counts(data: bytes, name: str) -> Optional[List[int]]:
+    """
+    [lines, characters, blank, comment, code] for one file, counted on the raw
+    bytes without decoding. Returns None for binary files.
+    """
+    if b'\0' in data[:BINARY_SNIFF_BYTES]:
+        return None
+    lines = data.count(b'\n') + 1
+    # UTF-8 continuation bytes don't start a character
+    characters = len(data) if data.isascii() else len(data) - len(data.translate(None, _UTF8_LEAD_BYTES))
+    blank, comment, code = classify_lines(data, comment_syntax(name))
+    return [lines, characters, blank, comment, code]
+
+def comment_syntax(name: str) -> Tuple[Tuple[bytes, ...], Tuple[Tuple[bytes, bytes], ...]]:
+    """(line comment prefixes, block comment delimiters) for a file name"""
+    return COMMENT_SYNTAX.get(os.path.splitext(name)[1].lower()) or COMMENT_SYNTAX.get(name, ((), ()))
+
+def classify_lines(data: bytes, syntax) -> Tuple[int, int, int]:
+    """
+    (blank, comment, code) line counts. Block comments are recognised when a
+    line starts with their opening delimiter; anything after the closing
+    delimiter on the same line makes it a code line. Lines are split the way
+    line_counts counts them, so the text after the last newline (empty for a
+    trailing newline) is a line too and the three counts add up to its total.
+    """
+    line_prefixes, blocks = syntax
+    blank = comment = code = 0
+    block_end = None
+    for line in data.split(b'\n'):
+        stripped = line.strip()
+        if block_end is not None:
+            end = stripped.find(block_end)
+            if end == -1:
+                if stripped:
+                    comment += 1
+                else:
+                    blank += 1
+                continue
+            rest = stripped[end + len(block_end):].strip()
+            block_end = None
+            if rest and not rest.startswith(line_prefixes):
+                code += 1
+            else:
+                comment += 1
+            continue
+        if not stripped:
+            blank += 1
+        elif line_prefixes and stripped.startswith(line_prefixes):
+            comment += 1
+        else:
+            for opener, closer in blocks:
+                if stripped.startswith(opener):
+                    end = stripped.find(closer, len(opener))
+                    if end == -1:
+                        block_end = closer
+                        comment += 1
+                    else:
+                        rest = stripped[end + len(closer):].strip()
+                        if rest and not rest.startswith(line_prefixes):
+                            code += 1
+                        else:
+                            comment += 1
+                    break
+            else:
+                code += 1
+    return blank, comment, code
+
+def normalize_tags(tags: Optional[Iterable[str]], default: Iterable[str]) -> Tuple[str, ...]:
+    """Upper-cased, de-duplicated annotation tags, falling back to default when none are given"""
+    cleaned = [tag.strip().upper() for tag in tags or () if tag and tag.strip()]
+    return tuple(dict.fromkeys(cleaned or [tag.upper() for tag in default]))
+
+@lru_cache(maxsize=32)
+def _annotation_scanner(tags: Tuple[str, ...]) -> Tuple["re.Pattern", "re.Pattern"]:
+    """One compiled alternation over every tag, plus a bytes version for pre-filtering undecoded files"""
+    alternation = '|'.join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True))
+    # The comment is captured inside a lookahead so later tags on the same line still match
+    pattern = re.compile(rf'(?i)({alternation})(?=[^\S\n]*:?[^\S\n]*(.*))')
+    # Bytes patterns only fold ASCII case, so non-ASCII tags are also tried lower-cased
+    spellings = dict.fromkeys(spelling.encode('utf-8') for tag in tags
+                              for spelling in ((tag,) if tag.isascii() else (tag, tag.lower())))
+    prefilter = re.compile(b'(?i)' + b'|'.join(re.escape(spelling) for spelling in spellings))
+    return pattern, prefilter
+
+def find_annotations(data: bytes, name: str, tags: Tuple[str, ...]) -> Optional[List[list]]:
+    """
+    [tag, line_number, comment] for the first occurrence of each tag on a line,
+    matched case-insensitively. Files containing none of the tags are skipped
+    before decoding.
+    """
+    pattern, prefilter = _annotation_scanner(tuple(tags))
+    if prefilter.search(data) is None:
+        return []
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+    order = {tag.lower(): index for index, tag in enumerate(tags)}
+    hits = []
+    line_num, scanned, line_tags = 1, 0, set()
+    for match in pattern.finditer(text):
+        start = match.start()
+        newlines = text.count('\n', scanned, start)
+        if newlines:
+            line_num += newlines
+            line_tags.clear()
+        scanned = start
+        key = match.group(1).lower()
+        if key in line_tags:
+            continue
+        line_tags.add(key)
+        comment = match.group(2).strip()
+        if not comment:
+            line_end = text.find('\n', start)
+            comment = text[text.rfind('\n', 0, start) + 1:line_end if line_end != -1 else len(text)].strip()
+        hits.append([tags[order[key]], line_num, comment])
+    # Report tags in configured order within each line
+    hits.sort(key=lambda hit: (hit[1], order[hit[0].lower()]))
+    return hits
+
+def _format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:,} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+class ScanProgress:
+    """
+    Progress of one long-running tool call, for clients that asked for it.
+
+    Every phase() advances the reported progress by one step; file counts
+    within a phase fill in the fraction and are throttled to one report per
+    interval. report(progress, total, message) receives each update and
+    publish(title, text), when given, each finished report section. Without
+    callbacks every call is a no-op, and a failing callback never interrupts
+    the scan. analyze_files also totals the call's files, bytes read and
+    cache lookups here.
+    """
+
+    def __init__(self, report: Optional[Callable[[float, float, str], None]] = None, steps: int = 1,
+                 publish: Optional[Callable[[str, str], None]] = None, interval: float = PROGRESS_INTERVAL):
+        self._report = report
+        self._publish = publish
+        self.steps = steps
+        self.interval = interval
+        self.step = -1
+        self.phase_name = ''
+        self._last_report = 0.0
+        self.files_scanned = 0  # Including results served from the analysis cache
+        self.bytes_read = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def phase(self, name: str):
+        self.step += 1
+        self.steps = max(self.steps, self.step + 1)
+        self.phase_name = name
+        self._send(self.step, name)
+
+    def files(self, done: int, total: int, bytes_read: int):
+        if done < total and time.monotonic() - self._last_report < self.interval:
+            return
+        # Stays below the next phase's step so reported progress keeps increasing
+        self._send(max(self.step, 0) + done / (total + 1),
+                   f"{self.phase_name}: {done:,}/{total:,} files, {_format_bytes(bytes_read)} read")
+
+    def section(self, title: str, text: str):
+        if self._publish is not None:
+            try:
+                self._publish(title, text)
+            except Exception as e:
+                logger.warning(f"Dropped partial result '{title}': {e}")
+
+    def finish(self):
+        self._send(self.steps, 'Done')
+
+    def _send(self, progress: float, message: str):
+        self._last_report = time.monotonic()
+        if self._report is not None:
+            try:
+                self._report(progress, self.steps, message)
+            except Exception as e:
+                logger.warning(f"Dropped progress report: {e}")
+
+def _analyze_path(path: str, analyzer: Callable, args: tuple) -> Tuple[bool, Any]:
+    """Worker entry point: read one file, then run the analyzer on its bytes. Returns (readable, result)."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return False, None
+    return True, analyzer(data, os.path.basename(path), *args)
+
+_PENDING = object()
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+def _shared_process_pool() -> ProcessPoolExecutor:
+    """DEFAULT_WORKERS processes started on first use and reused by every later call"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn keeps workers safe to start from the threaded HTTP server
+            _process_pool = ProcessPoolExecutor(max_workers=DEFAULT_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """Drop a broken shared pool so the next call starts a fresh one"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+def analyze_files(snapshot: ProjectSnapshot, entries: List[FileEntry], analyzer: Callable, *args,
+                  cache=None, execution: Optional[str] = None, workers: Optional[int] = None,
+                  progress: Optional[ScanProgress] = None) -> List[Any]:
+    """
+    Apply analyzer(data, name, *args) to every entry and return the results
+    in entry order (None for unreadable files).
+
+    Results found in cache (an analysis_cache.CacheSession) are reused and new
+    ones are stored; unreadable files are not cached, so they are retried
+    next time. execution selects 'serial', 'thread' or 'process' fan-out for
+    the remaining files. workers sets the thread pool size, capped at
+    DEFAULT_WORKERS; process mode shares one DEFAULT_WORKERS-sized pool
+    across calls. Output ordering is identical in every mode. progress
+    receives file and byte counts as results arrive.
+    """
+    execution = (execution or DEFAULT_EXECUTION).lower()
+    if execution not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode '{execution}' (expected one of: {', '.join(EXECUTION_MODES)})")
+    workers = max(1, min(workers or DEFAULT_WORKERS, DEFAULT_WORKERS))
+
+    results = [cache.get(entry, _PENDING) if cache is not None else _PENDING for entry in entries]
+    pending = [index for index, result in enumerate(results) if result is _PENDING]
+    progress = progress or ScanProgress()
+    total = len(entries)
+    done = total - len(pending)
+    bytes_read = 0
+    progress.files(done, total, bytes_read)
+
+    computed = []
+    if execution == 'serial' or workers == 1 or len(pending) < PARALLEL_MIN_FILES:
+        for index in pending:
+            try:
+                data = snapshot.read_bytes(entries[index])
+            except OSError:
+                data = None
+            computed.append((False, None) if data is None else (True, analyzer(data, entries[index].name, *args)))
+            done += 1
+            bytes_read += len(data or b'')
+            progress.files(done, total, bytes_read)
+    else:
+        paths = [entries[index].path for index in pending]
+
+        def collect(mapped):
+            nonlocal done, bytes_read
+            for index, outcome in zip(pending, mapped):
+                computed.append(outcome)
+                done += 1
+                bytes_read += entries[index].size
+                progress.files(done, total, bytes_read)
+
+        if execution == 'process':
+            pool = _shared_process_pool()
+            try:
+                collect(pool.map(_analyze_path, paths, repeat(analyzer), repeat(args),
+                                 chunksize=max(1, len(paths) // (DEFAULT_WORKERS * 4))))
+            except BrokenProcessPool:
+                _discard_process_pool(pool)
+                raise
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='documenter-scan') as pool:
+                collect(pool.map(_analyze_path, paths, repeat(analyzer), repeat(args)))
+
+    for index, (readable, result) in zip(pending, computed):
+        results[index] = result
+        if cache is not None and readable:
+            cache.put(entries[index], result)
+    progress.files_scanned += total
+    progress.bytes_read += bytes_read
+    if cache is not None:
+        progress.cache_hits += total - len(pending)
+        progress.cache_misses += len(pending)
+    return results
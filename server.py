@@ -5,18 +5,24 @@ A complete MCP server for project documentation with hybrid cloud-local analysis
 DEPLOYMENT FORCE UPDATE: 2024-12-19 19:30 UTC
 """
 
+import hashlib
+import io
 import json
 import os
 import re
 import sys
 import platform
+import queue
 import time
 import uuid
 import tempfile
 import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Any
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import List, Dict, Optional, Tuple, Any, Iterable, Iterator, Union
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
 from urllib.parse import urlparse
 import logging
 
@@ -25,11 +31,47 @@ import urllib.request
 import zipfile
 import tempfile
 import shutil
+import gzip
+import zlib
+
+try:
+    import zstandard  # Optional: enables zstd request bodies and responses
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli  # Optional: enables br responses
+except ImportError:
+    brotli = None
+
+from analysis_cache import get_analysis_cache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from companion import IntegrityHasher
+from upload_store import MissingBlobs, UploadStore, UploadTooLarge
+from project_scanner import CLIENT_EXECUTION_MODES, ProjectSnapshot, ProjectTypeDetector, ScanProgress, analyze_files, find_annotations, find_files, line_counts, normalize_tags
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Serving configuration (override via environment on Render)
+SERVER_MODE = os.environ.get("MCP_SERVER_MODE", "threaded").lower()  # "threaded" or "single"
+TOOL_WORKERS = max(1, int(os.environ.get("MCP_TOOL_WORKERS", 4)))  # Concurrent tools/call executions
+TOOL_QUEUE_SIZE = max(0, int(os.environ.get("MCP_TOOL_QUEUE_SIZE", 16)))  # Calls allowed to wait for a worker
+LISTEN_BACKLOG = max(1, int(os.environ.get("MCP_LISTEN_BACKLOG", 64)))  # Pending TCP connections
+MAX_CONNECTIONS = max(1, int(os.environ.get("MCP_MAX_CONNECTIONS", 64)))  # Open connections (one handler thread each)
+MAX_REQUEST_BYTES = max(1024, int(os.environ.get("MCP_MAX_REQUEST_BYTES", 16 * 1024 * 1024)))  # Decoded body ceiling
+LARGE_BODY_BYTES = max(1024, int(os.environ.get("MCP_LARGE_BODY_BYTES", 1024 * 1024)))  # Bodies past this need a large-body slot
+LARGE_BODY_READS = max(1, int(os.environ.get("MCP_LARGE_BODY_READS", 2)))  # Large bodies held at once
+MAX_COMPRESSION_RATIO = max(1, int(os.environ.get("MCP_MAX_COMPRESSION_RATIO", 200)))  # Decoded/wire bytes guard
+COMPRESSION_RATIO_FLOOR = 1024 * 1024  # Small bodies may exceed the ratio (e.g. repetitive JSON)
+BODY_READ_SIZE = 64 * 1024
+COMPRESS_MIN_BYTES = max(0, int(os.environ.get("MCP_COMPRESS_MIN_BYTES", 1024)))  # Smaller responses go out as-is
+COMPRESS_LEVEL = min(9, max(1, int(os.environ.get("MCP_COMPRESS_LEVEL", 6))))  # gzip/deflate level
+SSE_HEARTBEAT = max(1.0, float(os.environ.get("MCP_SSE_HEARTBEAT", 15)))  # Idle seconds between keep-alive comments
+KEEPALIVE_TIMEOUT = max(1.0, float(os.environ.get("MCP_KEEPALIVE_TIMEOUT", 75)))  # Idle seconds before a persistent connection closes
+KEEPALIVE_MAX_REQUESTS = max(1, int(os.environ.get("MCP_KEEPALIVE_MAX_REQUESTS", 100)))  # Requests served per connection
+
 # Enhanced project type detection with comprehensive patterns
 PROJECT_CONFIGS = {
     "nextjs": {
@@ -106,17 +148,529 @@ PROJECT_CONFIGS = {
     }
 }
 
+# Indicator/keyword index over PROJECT_CONFIGS, built once
+PROJECT_DETECTOR = ProjectTypeDetector(PROJECT_CONFIGS)
+
+class RequestBodyError(Exception):
+    """Request body rejected while reading; carries the HTTP status to answer with"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class LargeBodySlot:
+    """
+    A request's claim on one of the LARGE_BODY_READS slots, taken once its
+    body grows past LARGE_BODY_BYTES and held until release() after the
+    request is answered. Requests that find every slot taken get a 503.
+    """
+    
+    _slots = threading.BoundedSemaphore(LARGE_BODY_READS)
+    
+    def __init__(self):
+        self.held = False
+    
+    def acquire(self):
+        if self.held:
+            return
+        if not self._slots.acquire(blocking=False):
+            raise RequestBodyError(503, "Server busy: too many large requests in progress, retry shortly")
+        self.held = True
+    
+    def release(self):
+        if self.held:
+            self.held = False
+            self._slots.release()
+
+class RequestBodyStream:
+    """Raw request body as a file-like object, framed by Content-Length or chunked encoding"""
+    
+    def __init__(self, rfile, content_length: int = 0, chunked: bool = False, limit: int = MAX_REQUEST_BYTES):
+        self._rfile = rfile
+        self._remaining = content_length  # Bytes left in the body or current chunk
+        self._chunked = chunked
+        self._done = not chunked and content_length == 0
+        self._limit = limit
+        self.bytes_read = 0
+    
+    def _next_chunk(self):
+        line = self._rfile.readline(1024)
+        try:
+            size = int(line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise RequestBodyError(400, "Invalid chunked encoding")
+        if size == 0:
+            # Discard trailers up to the terminating blank line
+            while line not in (b'\r\n', b'\n', b''):
+                line = self._rfile.readline(1024)
+            self._done = True
+        self._remaining = size
+    
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = BODY_READ_SIZE
+        while not self._done and self._remaining == 0:
+            self._next_chunk()
+        if self._done:
+            return b''
+        
+        data = self._rfile.read(min(size, self._remaining))
+        if not data:
+            raise RequestBodyError(400, "Request body ended early")
+        self._remaining -= len(data)
+        self.bytes_read += len(data)
+        if self.bytes_read > self._limit:
+            raise RequestBodyError(413, "Request too large")
+        if self._remaining == 0:
+            if self._chunked:
+                self._rfile.readline(1024)  # CRLF after chunk data
+            else:
+                self._done = True
+        return data
+
+class ZlibBodyReader:
+    """File-like zlib/raw-deflate decoder with bounded output per read"""
+    
+    def __init__(self, raw: RequestBodyStream):
+        self._raw = raw
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+        self._pending = b''
+        self._started = False
+    
+    def read(self, size: int = BODY_READ_SIZE) -> bytes:
+        while not self._decompressor.eof:
+            data = self._pending or self._raw.read(BODY_READ_SIZE)
+            if not data:
+                return self._decompressor.flush()
+            try:
+                out = self._decompressor.decompress(data, size)
+            except zlib.error:
+                if self._started:
+                    raise
+                # Some clients send raw deflate without the zlib wrapper
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                out = self._decompressor.decompress(data, size)
+            self._started = True
+            self._pending = self._decompressor.unconsumed_tail
+            if out:
+                return out
+        return b''
+
+def open_request_body(raw: RequestBodyStream, content_encoding: str):
+    """Wrap the raw body in a streaming decoder for its Content-Encoding"""
+    encoding = content_encoding.strip().lower()
+    if encoding in ('', 'identity'):
+        return raw
+    if encoding in ('gzip', 'x-gzip'):
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if encoding == 'deflate':
+        return ZlibBodyReader(raw)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    raise RequestBodyError(415, f"Unsupported Content-Encoding: {content_encoding}")
+
+def read_request_body(rfile, headers, limit: int = MAX_REQUEST_BYTES,
+                      slot: Optional[LargeBodySlot] = None) -> bytearray:
+    """
+    Read and decode a request body in blocks, so neither the wire bytes nor the
+    decoded bytes are held twice. Decoded output is bounded by limit and, past
+    COMPRESSION_RATIO_FLOOR, by MAX_COMPRESSION_RATIO times the bytes received.
+    Bodies past LARGE_BODY_BYTES first take slot, so only a few are buffered
+    at once.
+    """
+    chunked = 'chunked' in headers.get('Transfer-Encoding', '').lower()
+    try:
+        content_length = 0 if chunked else int(headers.get('Content-Length', 0))
+    except ValueError:
+        raise RequestBodyError(400, "Invalid content length")
+    if content_length < 0:
+        raise RequestBodyError(400, "Invalid content length")
+    if content_length > limit:
+        raise RequestBodyError(413, "Request too large")
+    if slot is not None and content_length > LARGE_BODY_BYTES:
+        slot.acquire()
+    
+    raw = RequestBodyStream(rfile, content_length, chunked, limit)
+    reader = open_request_body(raw, headers.get('Content-Encoding', ''))
+    body = bytearray()
+    try:
+        while True:
+            block = reader.read(BODY_READ_SIZE)
+            if not block:
+                break
+            body += block
+            if len(body) > limit:
+                raise RequestBodyError(413, "Request too large")
+            if slot is not None and len(body) > LARGE_BODY_BYTES:
+                slot.acquire()
+            if len(body) > COMPRESSION_RATIO_FLOOR and len(body) > raw.bytes_read * MAX_COMPRESSION_RATIO:
+                raise RequestBodyError(413, "Compressed request expands beyond the allowed ratio")
+    except (OSError, EOFError, zlib.error) as e:
+        raise RequestBodyError(400, f"Invalid compressed body: {e}")
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise RequestBodyError(400, f"Invalid compressed body: {e}")
+        raise
+    return body
+
+class BrotliCompressor:
+    """brotli.Compressor with the compress()/flush() interface of zlib objects"""
+    
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+def response_encodings() -> List[str]:
+    """Supported response encodings in server preference order"""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings + ['gzip', 'deflate']
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported Content-Encoding for an Accept-Encoding header (None for identity)"""
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    
+    best, best_weight = None, 0.0
+    for encoding in response_encodings():
+        weight = weights.get(encoding, weights.get('x-gzip' if encoding == 'gzip' else encoding, weights.get('*', 0.0)))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def response_compressor(encoding: str):
+    if encoding == 'gzip':
+        return zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return zlib.compressobj(COMPRESS_LEVEL)
+    if encoding == 'br':
+        return BrotliCompressor()
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise ValueError(f"Unsupported response encoding: {encoding}")
+
+def json_blocks(data: Any, block_size: int = BODY_READ_SIZE) -> Iterator[bytes]:
+    """json.dumps(data) encoded in blocks of roughly block_size bytes; bytes are taken as serialised JSON"""
+    if isinstance(data, bytes):
+        yield data
+        return
+    buffer: List[str] = []
+    buffered = 0
+    for piece in json.JSONEncoder().iterencode(data):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= block_size:
+            yield ''.join(buffer).encode()
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+def encode_json_body(data: Any, encoding: Optional[str]) -> Tuple[List[bytes], Optional[str]]:
+    """
+    Serialise data as JSON block by block, compressing blocks as they are
+    produced. Returns the body parts and the Content-Encoding actually
+    applied; bodies under COMPRESS_MIN_BYTES are left uncompressed.
+    """
+    head: List[bytes] = []
+    head_size = 0
+    compressor = None
+    parts: List[bytes] = []
+    for block in json_blocks(data):
+        if compressor is not None:
+            parts.append(compressor.compress(block))
+            continue
+        head.append(block)
+        head_size += len(block)
+        if encoding and head_size >= COMPRESS_MIN_BYTES:
+            compressor = response_compressor(encoding)
+            parts.append(compressor.compress(b''.join(head)))
+            head = []
+    
+    if compressor is None:
+        return head, None
+    parts.append(compressor.flush())
+    return [part for part in parts if part], encoding
+
+class StaticPayload:
+    """
+    A response body that never changes while the server runs, serialised
+    once. Each content coding gets its own strong ETag; compressed variants
+    are built on first request and kept.
+    """
+    
+    def __init__(self, body: bytes, content_type: str = 'application/json', headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._encoded: Dict[str, bytes] = {}
+    
+    @classmethod
+    def from_json(cls, data: Any) -> "StaticPayload":
+        return cls(json.dumps(data).encode('utf-8'))
+    
+    def encoded(self, encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """Body, Content-Encoding actually applied and ETag for a negotiated encoding"""
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, None, self.etag
+        body = self._encoded.get(encoding)
+        if body is None:
+            compressor = response_compressor(encoding)
+            body = self._encoded[encoding] = compressor.compress(self.body) + compressor.flush()
+        return body, encoding, f'{self.etag[:-1]}-{encoding}"'
+    
+    def rpc_response(self, request_id: Any) -> bytes:
+        """Serialised JSON-RPC response with this payload as its result"""
+        return b'{"jsonrpc": "2.0", "id": %s, "result": %s}' % (json.dumps(request_id).encode('utf-8'), self.body)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check, using the weak comparison RFC 9110 requires"""
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+COMPANION_INLINE_IMPORT = 'from ignore_rules import IgnoreMatcher'
+
+def companion_source() -> Optional[str]:
+    """
+    companion.py as handed to users: its ignore_rules import is replaced by
+    that module's source, so the downloaded script runs on its own
+    """
+    root = Path(__file__).parent
+    try:
+        source = (root / "companion.py").read_text(encoding='utf-8')
+        rules = (root / "ignore_rules.py").read_text(encoding='utf-8')
+    except OSError:
+        return None
+    if rules.startswith('#!'):
+        rules = rules.split('\n', 1)[1]
+    lines = source.split('\n')
+    for index, line in enumerate(lines):
+        if line.startswith(COMPANION_INLINE_IMPORT):
+            lines[index] = f"# --- ignore_rules.py ---\n{rules.rstrip()}\n# --- end ignore_rules.py ---"
+            break
+    return '\n'.join(lines)
+
+# Phases reported by tools that stream progress (see ScanProgress.phase)
+PROGRESS_STEPS = {
+    'analyze_code_metrics': 1,
+    'scan_for_todos_and_fixmes': 1,
+    'document_project_comprehensive': 5,
+}
+
+class ToolProgress(ScanProgress):
+    """
+    Progress of one streamed tools/call. The worker thread queues MCP
+    notifications/progress messages and finished report sections (as
+    notifications/message log entries); the handler thread writes them out as
+    server-sent events. None on the queue marks the end of the call.
+    """
+    
+    def __init__(self, token: Union[str, int], steps: int = 1):
+        super().__init__(self._notify_progress, steps, self._notify_section)
+        self.token = token
+        self.events: "queue.Queue[Optional[Dict]]" = queue.Queue()
+    
+    def _notify_progress(self, progress: float, total: float, message: str):
+        self.events.put({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {"progressToken": self.token, "progress": progress, "total": total, "message": message}
+        })
+    
+    def _notify_section(self, title: str, text: str):
+        self.events.put({
+            "jsonrpc": "2.0",
+            "method": "notifications/message",
+            "params": {
+                "level": "info",
+                "logger": "documenter",
+                "data": {"progressToken": self.token, "section": title, "text": text}
+            }
+        })
+
+class CountingStream:
+    """Socket file wrapper that counts the bytes read or written through it"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes = 0
+    
+    def read(self, *args) -> bytes:
+        data = self._stream.read(*args)
+        self.bytes += len(data)
+        return data
+    
+    def readline(self, *args) -> bytes:
+        data = self._stream.readline(*args)
+        self.bytes += len(data)
+        return data
+    
+    def write(self, data) -> int:
+        written = self._stream.write(data)
+        self.bytes += len(data)
+        return written
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+# Served at /metrics; label values are limited to known paths, methods and tools
+METRICS = MetricsRegistry()
+METRIC_PATHS = ('/', '/tools', '/companion.py', '/mcp/request', '/metrics')
+METRIC_RPC_METHODS = ('initialize', 'tools/list', 'tools/call')
+HTTP_REQUESTS = METRICS.counter('documenter_http_requests_total', 'HTTP requests by method, path and status',
+                                ('method', 'path', 'status'))
+HTTP_DURATION = METRICS.histogram('documenter_http_request_duration_seconds', 'HTTP request latency in seconds',
+                                  ('method', 'path'))
+HTTP_IN_FLIGHT = METRICS.gauge('documenter_http_requests_in_flight', 'HTTP requests currently being served')
+HTTP_BYTES_IN = METRICS.counter('documenter_http_received_bytes_total',
+                                'Bytes received, request line and headers included, as sent on the wire', ('path',))
+HTTP_BYTES_OUT = METRICS.counter('documenter_http_sent_bytes_total',
+                                 'Bytes sent, status line and headers included, after compression', ('path',))
+RPC_REQUESTS = METRICS.counter('documenter_rpc_requests_total', 'JSON-RPC requests by method and tool', ('method', 'tool'))
+RPC_ERRORS = METRICS.counter('documenter_rpc_errors_total',
+                             'JSON-RPC error responses and failed tool calls by method and tool', ('method', 'tool'))
+RPC_DURATION = METRICS.histogram('documenter_rpc_duration_seconds',
+                                 'JSON-RPC latency in seconds, including the wait for a tool worker', ('method', 'tool'))
+TOOL_FILES = METRICS.counter('documenter_tool_files_scanned_total',
+                             'Files analysed by tool calls, including cached results', ('tool',))
+TOOL_BYTES = METRICS.counter('documenter_tool_bytes_read_total', 'File bytes read by tool calls', ('tool',))
+CACHE_LOOKUPS = METRICS.counter('documenter_analysis_cache_lookups_total',
+                                'Per-file analysis cache lookups by tool and result', ('tool', 'result'))
+
+def _cache_hit_ratios() -> List[Tuple[Tuple[str], float]]:
+    lookups = CACHE_LOOKUPS.values()
+    ratios = []
+    for tool in sorted({tool for tool, _ in lookups}):
+        hits, misses = lookups.get((tool, 'hit'), 0), lookups.get((tool, 'miss'), 0)
+        if hits + misses:
+            ratios.append(((tool,), hits / (hits + misses)))
+    return ratios
+
+METRICS.gauge('documenter_analysis_cache_hit_ratio', 'Share of analysis cache lookups served from the cache since start',
+              ('tool',), collect=_cache_hit_ratios)
+METRICS.gauge('documenter_upload_store_projects', 'Uploaded projects held',
+              collect=lambda: MCPHandler.projects.stats()['projects'])
+METRICS.gauge('documenter_upload_store_unique_files', 'Distinct file contents held for uploaded projects',
+              collect=lambda: MCPHandler.projects.stats()['unique_files'])
+METRICS.gauge('documenter_upload_store_bytes', 'Uploaded file content bytes by storage tier', ('tier',),
+              collect=lambda: [(('memory',), MCPHandler.projects.stats()['memory_bytes']),
+                               (('disk',), MCPHandler.projects.stats()['disk_bytes'])])
+
+class ToolExecutor:
+    """Bounded worker pool for tools/call execution"""
+    
+    def __init__(self, max_workers: int = TOOL_WORKERS, queue_size: int = TOOL_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        # One slot per running or waiting call; callers beyond that are rejected
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+    
+    def submit(self, fn, *args) -> Optional[Future]:
+        """Schedule fn on the pool, or return None when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def shutdown(self):
+        """Stop accepting work and drop queued calls"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+_CONNECTIONS_FULL_BODY = json.dumps({"error": "Server busy: too many open connections, retry shortly"}).encode('utf-8')
+_CONNECTIONS_FULL_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"Content-Length: " + str(len(_CONNECTIONS_FULL_BODY)).encode('ascii') + b"\r\n\r\n" + _CONNECTIONS_FULL_BODY
+)
+
+class MCPServer(ThreadingHTTPServer):
+    """Threaded HTTP server that runs tool calls on a shared bounded worker pool"""
+    
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+    
+    def __init__(self, server_address, handler_class, tool_workers: int = TOOL_WORKERS,
+                 tool_queue_size: int = TOOL_QUEUE_SIZE, max_connections: int = MAX_CONNECTIONS):
+        self.tool_executor = ToolExecutor(tool_workers, tool_queue_size)
+        # Kept-alive connections each hold a thread, so their number is capped
+        self._connection_slots = threading.BoundedSemaphore(max_connections)
+        super().__init__(server_address, handler_class)
+    
+    def process_request(self, request, client_address):
+        """Start a handler thread, or answer 503 when every connection slot is taken"""
+        if not self._connection_slots.acquire(blocking=False):
+            logger.warning(f"Rejected connection from {client_address[0]}: too many open connections")
+            try:
+                request.sendall(_CONNECTIONS_FULL_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._connection_slots.release()
+            raise
+    
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connection_slots.release()
+    
+    def server_close(self):
+        super().server_close()
+        self.tool_executor.shutdown()
+
 class MCPHandler(BaseHTTPRequestHandler):
     """MCP Protocol HTTP Handler"""
     
-    # Class-level storage for uploaded projects
-    projects: Dict[str, Dict] = {}
+    # Persistent connections: every response is framed by Content-Length or chunked encoding
+    protocol_version = "HTTP/1.1"
+    # Socket timeout, so an idle kept-alive connection is closed (longer than typical proxy idle timeouts)
+    timeout = KEEPALIVE_TIMEOUT
+    
+    # Class-level storage for uploaded projects (shared across handler threads, byte-budgeted)
+    projects = UploadStore.from_env()
+    # Verified hybrid analyses keyed by content hash, used as bases for delta uploads
+    hybrid_models: Dict[str, Dict] = {}
+    _projects_lock = threading.Lock()
     
     def __init__(self, *args, **kwargs):
         # Initialize hybrid capabilities
         self.companion_version = "1.0.0"
         self.companion_url = None  # Will be set to serve companion script
         self.hybrid_mode = True  # Enable hybrid functionality
+        self.requests_handled = 0  # On this connection
         # Call parent constructor
         super().__init__(*args, **kwargs)
         
@@ -357,27 +911,103 @@ class MCPHandler(BaseHTTPRequestHandler):
             logger.error(f"❌ Error extracting path from headers: {e}")
             return None
     
+    def setup(self):
+        super().setup()
+        self.rfile = CountingStream(self.rfile)
+        self.wfile = CountingStream(self.wfile)
+    
+    def handle_one_request(self):
+        self.requests_handled += 1
+        self._request_started = None
+        bytes_in, bytes_out = self.rfile.bytes, self.wfile.bytes
+        try:
+            super().handle_one_request()
+        finally:
+            if self._request_started is not None:
+                HTTP_IN_FLIGHT.dec()
+                self._record_request(self.rfile.bytes - bytes_in, self.wfile.bytes - bytes_out)
+    
+    def parse_request(self) -> bool:
+        # The request line has arrived; idle keep-alive time is not counted
+        self._request_started = time.perf_counter()
+        self._status = None
+        HTTP_IN_FLIGHT.inc()
+        return super().parse_request()
+    
+    def _record_request(self, bytes_in: int, bytes_out: int):
+        path = urlparse(self.path).path if isinstance(getattr(self, 'path', None), str) else ''
+        path = path if path in METRIC_PATHS else 'other'
+        method = self.command if self.command in ('GET', 'POST', 'OPTIONS') else 'other'
+        HTTP_REQUESTS.inc(method=method, path=path, status=self._status or 0)
+        HTTP_DURATION.observe(time.perf_counter() - self._request_started, method=method, path=path)
+        HTTP_BYTES_IN.inc(bytes_in, path=path)
+        HTTP_BYTES_OUT.inc(bytes_out, path=path)
+    
+    def send_response(self, code: int, message: Optional[str] = None):
+        """Status line plus connection headers: close after the last allowed request, else advertise keep-alive"""
+        super().send_response(code, message)
+        self._status = code
+        # A single-threaded server would block every other client on an idle connection
+        limit = KEEPALIVE_MAX_REQUESTS if getattr(self.server, 'tool_executor', None) is not None else 1
+        if self.close_connection or self.requests_handled >= limit:
+            self.send_header('Connection', 'close')
+        else:
+            self.send_header('Keep-Alive', f'timeout={int(KEEPALIVE_TIMEOUT)}, max={limit - self.requests_handled}')
+    
     def _send_response(self, status_code: int, data: dict):
-        """Send JSON response with proper headers"""
+        """Send JSON response with proper headers, compressed when the client accepts it"""
         try:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding', '')) if self.headers else None
+            parts, content_encoding = encode_json_body(data, encoding)
+            
             self.send_response(status_code)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(sum(len(part) for part in parts)))
+            if content_encoding:
+                self.send_header('Content-Encoding', content_encoding)
+            self.send_header('Vary', 'Accept-Encoding')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
             self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
+            for part in parts:
+                self.wfile.write(part)
         except Exception as e:
             logger.error(f"Error sending response: {e}")
             # Fallback to basic response
             try:
+                self.close_connection = True
                 self.send_response(500)
                 self.send_header('Content-type', 'text/plain')
+                self.send_header('Content-Length', '21')
                 self.end_headers()
                 self.wfile.write(b"Internal Server Error")
             except:
                 pass  # Last resort - connection might be broken
     
+    def _send_static(self, payload: StaticPayload):
+        """Send a precomputed payload, or 304 Not Modified when the client already holds its ETag"""
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding', ''))
+        body, content_encoding, etag = payload.encoded(encoding)
+        not_modified = etag_matches(self.headers.get('If-None-Match', ''), etag)
+        
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-Type', payload.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        for name, value in payload.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
     def do_GET(self):
         """Handle GET requests"""
         start_time = time.time()
@@ -386,57 +1016,29 @@ class MCPHandler(BaseHTTPRequestHandler):
             path = parsed_url.path
             
             if path == "/":
-                response = {
-                    "name": "Documenter MCP Server",
-                    "version": "3.1.0-hybrid-fixed",
-                    "status": "running",
-                    "description": "Intelligent documentation generator for any project type - HYBRID ARCHITECTURE",
-                    "platform": "Render",
-                    "url": "https://documenter-mcp.onrender.com",
-                    "endpoints": {
-                        "health": "/",
-                        "tools": "/tools",
-                        "mcp": "/mcp/request",
-                        "companion": "/companion.py"
-                    },
-                    "features": ["hybrid-mode", "auto-companion-download", "local-file-analysis"]
-                }
-                self._send_response(200, response)
+                self._send_static(HEALTH_PAYLOAD)
                 
             elif path == "/companion.py":
                 # Direct companion download endpoint
-                try:
-                    companion_path = Path(__file__).parent / "companion.py"
-                    if companion_path.exists():
-                        with open(companion_path, 'r', encoding='utf-8') as f:
-                            companion_content = f.read()
-                        
-                        self.send_response(200)
-                        self.send_header('Content-Type', 'text/plain')
-                        self.send_header('Content-Disposition', 'attachment; filename="companion.py"')
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.end_headers()
-                        self.wfile.write(companion_content.encode())
-                    else:
-                        self.send_response(404)
-                        self.send_header('Content-Type', 'text/plain')
-                        self.end_headers()
-                        self.wfile.write(b"Companion script not found")
-                except Exception as e:
-                    logger.error(f"Error serving companion: {e}")
-                    self.send_response(500)
+                if COMPANION_PAYLOAD is not None:
+                    self._send_static(COMPANION_PAYLOAD)
+                else:
+                    self.send_response(404)
                     self.send_header('Content-Type', 'text/plain')
+                    self.send_header('Content-Length', '26')
                     self.end_headers()
-                    self.wfile.write(f"Error: {e}".encode())
+                    self.wfile.write(b"Companion script not found")
                 
             elif path == "/tools":
-                tools = self._get_all_tools()
-                response = {
-                    "tools": tools,
-                    "count": len(tools),
-                    "platform": "Railway"
-                }
-                self._send_response(200, response)
+                self._send_static(TOOLS_PAYLOAD)
+                
+            elif path == "/metrics":
+                body = METRICS.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
                 
             else:
                 self._send_response(404, {"error": "Endpoint not found"})
@@ -451,35 +1053,34 @@ class MCPHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests (MCP protocol)"""
         start_time = time.time()
+        body_slot = LargeBodySlot()
         try:
             parsed_url = urlparse(self.path)
             path = parsed_url.path
             
             if path == "/mcp/request":
-                # Read request body with error handling
+                # Read (and decompress) request body with error handling
                 try:
-                    content_length = int(self.headers.get('Content-Length', 0))
-                    if content_length > 1024 * 1024:  # 1MB limit
-                        self._send_response(413, {"error": "Request too large"})
-                        return
-                    
-                    post_data = self.rfile.read(content_length)
+                    post_data = read_request_body(self.rfile, self.headers, slot=body_slot)
                     if not post_data:
                         self._send_response(400, {"error": "Empty request body"})
                         return
                         
-                except (ValueError, OverflowError) as e:
-                    logger.error(f"Invalid content length: {e}")
-                    self._send_response(400, {"error": "Invalid content length"})
+                except RequestBodyError as e:
+                    logger.error(f"Rejected request body: {e}")
+                    # The rest of the body is still unread, so the connection cannot be reused
+                    self.close_connection = True
+                    self._send_response(e.status, {"error": str(e)})
                     return
                 except Exception as e:
                     logger.error(f"Error reading request body: {e}")
+                    self.close_connection = True
                     self._send_response(500, {"error": "Error reading request"})
                     return
                 
                 # Parse JSON with error handling
                 try:
-                    request_data = json.loads(post_data.decode('utf-8'))
+                    request_data = json.loads(post_data)
                 except json.JSONDecodeError as e:
                     logger.error(f"JSON decode error: {e}")
                     self._send_response(400, {"error": "Invalid JSON"})
@@ -489,109 +1090,298 @@ class MCPHandler(BaseHTTPRequestHandler):
                     self._send_response(400, {"error": "Invalid encoding"})
                     return
                 
-                # Validate request structure
-                if not isinstance(request_data, dict):
-                    self._send_response(400, {"error": "Request must be a JSON object"})
+                # JSON-RPC 2.0 batch: calls run concurrently, one reply
+                if isinstance(request_data, list):
+                    self._handle_batch(request_data)
                     return
                 
-                # Handle MCP requests
-                method = request_data.get('method', '')
-                request_id = request_data.get('id')
-                
-                if not method:
-                    self._send_response(400, {"error": "Missing method"})
+                # Validate request structure
+                if not isinstance(request_data, dict):
+                    self._send_response(400, {"error": "Request must be a JSON object or batch array"})
                     return
                 
-                if method == 'initialize':
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "protocolVersion": "2024-11-05",
-                            "capabilities": {
-                                "tools": {
-                                    "listChanged": False
-                                }
-                            },
-                            "serverInfo": {
-                                "name": "Documenter",
-                                "version": "2.0.0"
-                            }
-                        }
-                    }
-                elif method == 'tools/list':
-                    tools = self._get_all_tools()
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {"tools": tools}
-                    }
-                elif method == 'tools/call':
-                    # Handle tool calls with validation
-                    params = request_data.get('params', {})
-                    if not isinstance(params, dict):
-                        self._send_response(400, {"error": "Invalid params"})
-                        return
-                    
-                    tool_name = params.get('name', '')
-                    arguments = params.get('arguments', {})
-                    
-                    if not tool_name:
-                        self._send_response(400, {"error": "Missing tool name"})
+                progress = self._progress_stream(request_data)
+                status, response = self._dispatch_rpc(request_data, progress=progress)
+                if isinstance(response, Future):
+                    if progress is not None:
+                        self._stream_tool_call(request_data.get('id'), response, progress)
                         return
-                    
-                    # Get user's project path and add it to context
-                    user_project_path = self._get_user_project_path(arguments, request_data)
-                    logger.info(f"User project path detected: {user_project_path}")
-                    
-                    # Add project context to arguments if not already present
-                    if 'base_path' not in arguments or not arguments['base_path']:
-                        arguments['base_path'] = str(user_project_path)
-                    
-                    result = self._execute_tool(tool_name, arguments)
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": result
-                                }
-                            ]
-                        }
-                    }
-                else:
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "error": {
-                            "code": -32601,
-                            "message": f"Method not found: {method}"
-                        }
-                    }
-                
-                self._send_response(200, response)
+                    response = self._tool_call_response(request_data.get('id'), response)
+                self._send_response(status, response)
                 
             else:
+                self.close_connection = True  # Request body left unread
                 self._send_response(404, {"error": "Endpoint not found"})
                 
         except Exception as e:
             logger.error(f"POST request error: {e}")
             self._send_response(500, {"error": "Internal server error"})
         finally:
+            body_slot.release()
             response_time = time.time() - start_time
             logger.info(f"POST {self.path} - {response_time:.3f}s")
     
+    def _progress_stream(self, request_data: Dict) -> Optional[ToolProgress]:
+        """Progress stream for a tools/call whose client sent a progressToken and accepts server-sent events"""
+        if request_data.get('method') != 'tools/call' or 'text/event-stream' not in self.headers.get('Accept', ''):
+            return None
+        params = request_data.get('params')
+        meta = params.get('_meta') if isinstance(params, dict) else None
+        token = meta.get('progressToken') if isinstance(meta, dict) else None
+        if not isinstance(token, (str, int)) or isinstance(token, bool):
+            return None
+        return ToolProgress(token, PROGRESS_STEPS.get(params.get('name'), 1))
+    
+    def _dispatch_rpc(self, request_data: Dict,
+                      snapshots: Optional[Dict[str, ProjectSnapshot]] = None,
+                      progress: Optional[ToolProgress] = None) -> Tuple[int, Union[Dict, bytes, Future]]:
+        """Route one JSON-RPC request and record its metrics once it has finished"""
+        started = time.perf_counter()
+        method = request_data.get('method', '')
+        params = request_data.get('params')
+        tool = ''
+        if method == 'tools/call':
+            tool = params.get('name') if isinstance(params, dict) else None
+            tool = tool if tool in TOOL_NAMES else 'unknown'
+            progress = progress or ScanProgress()  # Collects files and bytes read for the metrics
+        method = method if method in METRIC_RPC_METHODS else 'other'
+        
+        status, response = self._route_rpc(request_data, snapshots, progress)
+        if isinstance(response, Future):
+            response.add_done_callback(partial(self._record_tool_call, tool, started, progress))
+        else:
+            failed = status >= 400 or (isinstance(response, dict) and 'error' in response)
+            self._record_rpc(method, tool, started, failed)
+        return status, response
+    
+    def _record_rpc(self, method: str, tool: str, started: float, failed: bool):
+        RPC_REQUESTS.inc(method=method, tool=tool)
+        RPC_DURATION.observe(time.perf_counter() - started, method=method, tool=tool)
+        if failed:
+            RPC_ERRORS.inc(method=method, tool=tool)
+    
+    def _record_tool_call(self, tool: str, started: float, progress: ScanProgress, future: Future):
+        # Tools report failures as text starting with ❌ or "Error"
+        failed = future.exception() is not None or future.result().startswith(('❌', 'Error'))
+        self._record_rpc('tools/call', tool, started, failed)
+        TOOL_FILES.inc(progress.files_scanned, tool=tool)
+        TOOL_BYTES.inc(progress.bytes_read, tool=tool)
+        if progress.cache_hits or progress.cache_misses:
+            CACHE_LOOKUPS.inc(progress.cache_hits, tool=tool, result='hit')
+            CACHE_LOOKUPS.inc(progress.cache_misses, tool=tool, result='miss')
+    
+    def _route_rpc(self, request_data: Dict, snapshots: Optional[Dict[str, ProjectSnapshot]] = None,
+                   progress: Optional[ScanProgress] = None) -> Tuple[int, Union[Dict, bytes, Future]]:
+        """
+        Answer one JSON-RPC request as (HTTP status, response). The response is
+        a dict or already serialised bytes; tools/call is started on the worker
+        pool and returned as a Future of the tool text.
+        Calls in one batch share a ProjectSnapshot per base_path via snapshots;
+        progress receives a streamed call's progress and partial sections.
+        """
+        method = request_data.get('method', '')
+        request_id = request_data.get('id')
+        
+        if not method:
+            return 400, {"error": "Missing method"}
+        
+        if method == 'initialize':
+            return 200, {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "protocolVersion": "2024-11-05",
+                    "capabilities": {
+                        "tools": {
+                            "listChanged": False
+                        },
+                        "logging": {}
+                    },
+                    "serverInfo": {
+                        "name": "Documenter",
+                        "version": "2.0.0"
+                    }
+                }
+            }
+        elif method == 'tools/list':
+            return 200, TOOLS_LIST_RESULT.rpc_response(request_id)
+        elif method == 'tools/call':
+            # Handle tool calls with validation
+            params = request_data.get('params', {})
+            if not isinstance(params, dict):
+                return 400, {"error": "Invalid params"}
+            
+            tool_name = params.get('name', '')
+            arguments = params.get('arguments', {})
+            
+            if not tool_name:
+                return 400, {"error": "Missing tool name"}
+            
+            # Get user's project path and add it to context
+            user_project_path = self._get_user_project_path(arguments, request_data)
+            logger.info(f"User project path detected: {user_project_path}")
+            
+            # Add project context to arguments if not already present
+            if 'base_path' not in arguments or not arguments['base_path']:
+                arguments['base_path'] = str(user_project_path)
+            
+            snapshot = None
+            if snapshots is not None and isinstance(arguments.get('base_path'), str):
+                base_path = arguments['base_path']
+                snapshot = snapshots.get(base_path)
+                if snapshot is None:
+                    snapshot = snapshots[base_path] = ProjectSnapshot(base_path)
+            
+            future = self._start_tool(tool_name, arguments, snapshot, progress)
+            if future is None:
+                return 503, {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {
+                        "code": -32000,
+                        "message": "Server busy: too many tool calls in progress, retry shortly"
+                    }
+                }
+            return 200, future
+        else:
+            return 200, {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {
+                    "code": -32601,
+                    "message": f"Method not found: {method}"
+                }
+            }
+    
+    def _tool_call_response(self, request_id: Any, future: Future) -> Dict:
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": future.result()
+                    }
+                ]
+            }
+        }
+    
+    def _stream_tool_call(self, request_id: Any, future: Future, progress: ToolProgress):
+        """
+        Reply with server-sent events: progress and partial sections as they
+        arrive, then the result. HTTP/1.1 clients get a chunked stream on a
+        connection that stays open; HTTP/1.0 clients read until it closes.
+        """
+        future.add_done_callback(lambda _: progress.events.put(None))
+        chunked = self.request_version != 'HTTP/1.0'
+        if not chunked:
+            self.close_connection = True  # The stream ends when the connection does
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            while True:
+                try:
+                    event = progress.events.get(timeout=SSE_HEARTBEAT)
+                except queue.Empty:
+                    # Keeps proxies and clients from timing out while a phase runs
+                    self._write_stream(b": keep-alive\n\n", chunked)
+                    continue
+                if event is None:
+                    break
+                self._write_event(event, chunked)
+            
+            progress.finish()
+            try:
+                response = self._tool_call_response(request_id, future)
+            except Exception as e:
+                logger.error(f"Streamed tool call error: {e}")
+                response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": "Internal server error"}}
+            while not progress.events.empty():
+                self._write_event(progress.events.get_nowait(), chunked)
+            self._write_event(response, chunked)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except OSError as e:
+            logger.warning(f"Client left during streamed tool call: {e}")
+            self.close_connection = True
+    
+    def _write_event(self, message: Dict, chunked: bool):
+        self._write_stream(b"event: message\ndata: " + json.dumps(message).encode('utf-8') + b"\n\n", chunked)
+    
+    def _write_stream(self, data: bytes, chunked: bool):
+        if chunked:
+            data = b"%X\r\n%s\r\n" % (len(data), data)
+        self.wfile.write(data)
+        self.wfile.flush()
+    
+    def _handle_batch(self, batch: List[Any]):
+        """Start every call in a JSON-RPC batch, then reply with all responses in request order"""
+        if not batch:
+            self._send_response(400, {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {"code": -32600, "message": "Invalid Request: empty batch"}
+            })
+            return
+        
+        snapshots: Dict[str, ProjectSnapshot] = {}
+        started = []
+        for item in batch:
+            if not isinstance(item, dict):
+                started.append((None, False, 400, {"error": "Request must be a JSON object"}))
+                continue
+            try:
+                status, payload = self._dispatch_rpc(item, snapshots)
+            except Exception as e:
+                logger.error(f"Batch request error: {e}")
+                status, payload = 500, {"error": "Internal server error"}
+            # Requests without an id are notifications and get no response
+            started.append((item.get('id'), 'id' not in item, status, payload))
+        
+        responses = []
+        for request_id, is_notification, status, payload in started:
+            if isinstance(payload, Future):
+                try:
+                    payload = self._tool_call_response(request_id, payload)
+                except Exception as e:
+                    logger.error(f"Batch tool call error: {e}")
+                    status, payload = 500, {"error": "Internal server error"}
+            if isinstance(payload, dict) and 'error' in payload and 'jsonrpc' not in payload:
+                code = -32600 if status == 400 else -32603
+                payload = {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": payload['error']}}
+            if not is_notification:
+                responses.append(payload)
+        
+        if responses:
+            if any(isinstance(response, bytes) for response in responses):
+                responses = b'[' + b', '.join(
+                    response if isinstance(response, bytes) else json.dumps(response).encode('utf-8')
+                    for response in responses
+                ) + b']'
+            self._send_response(200, responses)
+        else:
+            self.send_response(204)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+    
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
-    def _get_all_tools(self) -> List[Dict]:
+    @staticmethod
+    def _get_all_tools() -> List[Dict]:
         """Get all available tools with proper MCP schema"""
         return [
             {
@@ -718,6 +1508,15 @@ class MCPHandler(BaseHTTPRequestHandler):
                         "base_path": {
                             "type": "string",
                             "description": "Base path to analyze (default: current directory)"
+                        },
+                        "execution": {
+                            "type": "string",
+                            "description": "How file contents are processed (default: server configuration)",
+                            "enum": ["serial", "thread"]
+                        },
+                        "workers": {
+                            "type": "integer",
+                            "description": "Worker count for thread execution (default and maximum: server configuration)"
                         }
                     }
                 }
@@ -731,6 +1530,20 @@ class MCPHandler(BaseHTTPRequestHandler):
                         "base_path": {
                             "type": "string",
                             "description": "Base path to scan (default: current directory)"
+                        },
+                        "tags": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Annotation tags to look for (default: TODO, FIXME, HACK)"
+                        },
+                        "execution": {
+                            "type": "string",
+                            "description": "How file contents are processed (default: server configuration)",
+                            "enum": ["serial", "thread"]
+                        },
+                        "workers": {
+                            "type": "integer",
+                            "description": "Worker count for thread execution (default and maximum: server configuration)"
                         }
                     }
                 }
@@ -757,10 +1570,37 @@ class MCPHandler(BaseHTTPRequestHandler):
                         "files_data": {
                             "type": "object",
                             "description": "Object containing file paths as keys and file contents as values"
+                        },
+                        "file_hashes": {
+                            "type": "object",
+                            "description": "Optional: file paths mapped to the SHA-256 of contents in base_project_id (see check_project_blobs)"
+                        },
+                        "base_project_id": {
+                            "type": "string",
+                            "description": "Optional: project ID of your earlier upload whose contents file_hashes refer to"
                         }
                     }
                 }
             },
+            {
+                "name": "check_project_blobs",
+                "description": "Check which file contents of an earlier upload can be reused before re-uploading. Send the project ID and SHA-256 hashes of file contents (UTF-8); only the missing ones need to be sent in files_data, the rest can go in file_hashes.",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "project_id": {
+                            "type": "string",
+                            "description": "Project ID returned by your earlier upload_project_files call"
+                        },
+                        "hashes": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Hex SHA-256 digests of file contents"
+                        }
+                    },
+                    "required": ["project_id", "hashes"]
+                }
+            },
             {
                 "name": "analyze_uploaded_project",
                 "description": "Analyze a previously uploaded project. Use this after uploading files to get comprehensive documentation. Example: 'Analyze the uploaded project'",
@@ -794,8 +1634,24 @@ class MCPHandler(BaseHTTPRequestHandler):
             }
         ]
     
-    def _execute_tool(self, tool_name: str, arguments: Dict) -> str:
-        """Execute a tool with the given arguments"""
+    def _start_tool(self, tool_name: str, arguments: Dict, snapshot: Optional[ProjectSnapshot] = None,
+                    progress: Optional[ScanProgress] = None) -> Optional[Future]:
+        """Schedule a tool on the server's worker pool; returns None when the pool is saturated"""
+        executor = getattr(self.server, 'tool_executor', None)
+        if executor is None:
+            # Single-threaded mode: execute inline
+            future = Future()
+            future.set_result(self._execute_tool(tool_name, arguments, snapshot, progress))
+            return future
+        
+        future = executor.submit(self._execute_tool, tool_name, arguments, snapshot, progress)
+        if future is None:
+            logger.warning(f"Tool pool saturated, rejecting {tool_name}")
+        return future
+    
+    def _execute_tool(self, tool_name: str, arguments: Dict, snapshot: Optional[ProjectSnapshot] = None,
+                      progress: Optional[ScanProgress] = None) -> str:
+        """Execute a tool with the given arguments, reusing a caller's snapshot of base_path"""
         try:
             # Validate tool name
             if not tool_name or not isinstance(tool_name, str):
@@ -810,7 +1666,7 @@ class MCPHandler(BaseHTTPRequestHandler):
                 base_path = arguments.get("base_path", ".")
                 if not isinstance(base_path, str):
                     return "❌ Invalid base_path parameter"
-                return self._detect_project_type(base_path)
+                return self._detect_project_type(base_path, snapshot)
             elif tool_name == "read_file":
                 file_path = arguments.get("file_path")
                 if not isinstance(file_path, str):
@@ -833,7 +1689,7 @@ class MCPHandler(BaseHTTPRequestHandler):
                 base_path = arguments.get("base_path", ".")
                 if not isinstance(base_path, str):
                     return "❌ Invalid base_path parameter"
-                return self._analyze_project_structure(base_path)
+                return self._analyze_project_structure(base_path, snapshot)
             elif tool_name == "analyze_package_json":
                 file_path = arguments.get("file_path", "package.json")
                 if not isinstance(file_path, str):
@@ -843,7 +1699,7 @@ class MCPHandler(BaseHTTPRequestHandler):
                 base_path = arguments.get("base_path", ".")
                 if not isinstance(base_path, str):
                     return "❌ Invalid base_path parameter"
-                return self._generate_project_readme(base_path)
+                return self._generate_project_readme(base_path, snapshot)
             elif tool_name == "find_files_by_pattern":
                 pattern = arguments.get("pattern")
                 base_path = arguments.get("base_path", ".")
@@ -854,24 +1710,57 @@ class MCPHandler(BaseHTTPRequestHandler):
                 return self._find_files_by_pattern(pattern, base_path)
             elif tool_name == "analyze_code_metrics":
                 base_path = arguments.get("base_path", ".")
+                execution = arguments.get("execution")
+                workers = arguments.get("workers")
                 if not isinstance(base_path, str):
                     return "❌ Invalid base_path parameter"
-                return self._analyze_code_metrics(base_path)
+                if execution is not None and execution not in CLIENT_EXECUTION_MODES:
+                    return f"❌ Invalid execution parameter - expected one of: {', '.join(CLIENT_EXECUTION_MODES)}"
+                if workers is not None and not isinstance(workers, int):
+                    return "❌ Invalid workers parameter"
+                return self._analyze_code_metrics(base_path, snapshot, execution=execution, workers=workers,
+                                                  progress=progress)
             elif tool_name == "scan_for_todos_and_fixmes":
                 base_path = arguments.get("base_path", ".")
+                execution = arguments.get("execution")
+                workers = arguments.get("workers")
+                tags = arguments.get("tags")
                 if not isinstance(base_path, str):
                     return "❌ Invalid base_path parameter"
-                return self._scan_for_todos_and_fixmes(base_path)
+                if execution is not None and execution not in CLIENT_EXECUTION_MODES:
+                    return f"❌ Invalid execution parameter - expected one of: {', '.join(CLIENT_EXECUTION_MODES)}"
+                if workers is not None and not isinstance(workers, int):
+                    return "❌ Invalid workers parameter"
+                if tags is not None and (not isinstance(tags, list) or not all(isinstance(t, str) for t in tags)):
+                    return "❌ Invalid tags parameter"
+                return self._scan_for_todos_and_fixmes(base_path, snapshot, execution=execution, workers=workers, tags=tags,
+                                                       progress=progress)
             elif tool_name == "document_project_comprehensive":
                 project_path = arguments.get("project_path", "")
                 if not isinstance(project_path, str):
                     return "❌ Invalid project_path parameter"
-                return self._document_project_comprehensive(project_path)
+                return self._document_project_comprehensive(project_path, progress)
             elif tool_name == "upload_project_files":
                 files_data = arguments.get("files_data", {})
+                file_hashes = arguments.get("file_hashes", {})
+                base_project_id = arguments.get("base_project_id")
                 if not isinstance(files_data, dict):
                     return "❌ Invalid files_data parameter"
-                return self._upload_project_files(files_data)
+                if not isinstance(file_hashes, dict) or not all(self._is_blob_hash(h) for h in file_hashes.values()):
+                    return "❌ Invalid file_hashes parameter - expected file paths mapped to SHA-256 hex digests"
+                if base_project_id is not None and not isinstance(base_project_id, str):
+                    return "❌ Invalid base_project_id parameter"
+                if file_hashes and not base_project_id:
+                    return "❌ file_hashes requires base_project_id - the project ID of your earlier upload"
+                return self._upload_project_files(files_data, file_hashes, base_project_id)
+            elif tool_name == "check_project_blobs":
+                project_id = arguments.get("project_id", "")
+                hashes = arguments.get("hashes", [])
+                if not isinstance(project_id, str) or not project_id:
+                    return "❌ Invalid project_id parameter"
+                if not isinstance(hashes, list) or not all(self._is_blob_hash(h) for h in hashes):
+                    return "❌ Invalid hashes parameter - expected a list of SHA-256 hex digests"
+                return json.dumps(self._check_project_blobs(project_id, hashes), indent=2)
             elif tool_name == "analyze_uploaded_project":
                 project_id = arguments.get("project_id", "")
                 if not isinstance(project_id, str):
@@ -886,8 +1775,8 @@ class MCPHandler(BaseHTTPRequestHandler):
                 return json.dumps(result, indent=2)
             elif tool_name == "orchestrate_hybrid_analysis":
                 analysis_data = arguments.get("analysis_data", {})
-                if not isinstance(analysis_data, dict):
-                    return "❌ Invalid analysis_data parameter - expected JSON object from companion script"
+                if not isinstance(analysis_data, (dict, str)):
+                    return "❌ Invalid analysis_data parameter - expected JSON object or NDJSON stream from companion script"
                 result = self._orchestrate_hybrid_analysis(analysis_data)
                 return json.dumps(result, indent=2)
             elif tool_name == "verify_companion":
@@ -907,7 +1796,7 @@ class MCPHandler(BaseHTTPRequestHandler):
             return f"❌ Error executing {tool_name}: {str(e)}"
     
     # Tool implementations (simplified versions from main.py)
-    def _detect_project_type(self, base_path: str) -> str:
+    def _detect_project_type(self, base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
         """Detect project type with enhanced accuracy - HYBRID AWARE"""
         try:
             # HYBRID MODE DETECTION: If on cloud and analyzing "." (server dir), trigger hybrid
@@ -926,67 +1815,13 @@ class MCPHandler(BaseHTTPRequestHandler):
                            "   → `\"Document this project comprehensively\"`\n\n"
                            "This will automatically download the companion and analyze YOUR project files! 🚀")
             
-            base_path = Path(base_path).resolve()
-            detected_types = []
+            snapshot = snapshot or ProjectSnapshot(base_path)
+            base_path = snapshot.base_path
             
             if not base_path.exists():
                 return f"❌ Path does not exist: {base_path}\n💡 Please provide the correct path to your project directory.\n📝 Example: Use 'Analyze the project at /path/to/your/project' or specify the base_path argument."
             
-            for project_type, config in PROJECT_CONFIGS.items():
-                score = 0
-                found_indicators = []
-                
-                # Check for indicator files
-                for indicator in config["indicators"]:
-                    if "*" in indicator:
-                        matches = list(base_path.glob(indicator))
-                        if matches:
-                            found_indicators.append(f"{indicator} ({len(matches)} files)")
-                            score += 2
-                    elif (base_path / indicator).exists():
-                        found_indicators.append(indicator)
-                        score += 2
-                
-                # Check file contents
-                for file_to_check, content_keys in config["check_content"].items():
-                    file_path = base_path / file_to_check
-                    if file_path.exists() and file_path.is_file():
-                        try:
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read().lower()
-                            
-                            if isinstance(content_keys, list):
-                                matched_keys = [key for key in content_keys if key.lower() in content]
-                                if matched_keys:
-                                    score += len(matched_keys) * 2
-                                    found_indicators.append(f"{file_to_check} (contains {', '.join(matched_keys)})")
-                        except Exception:
-                            pass
-                
-                # Check for important directories
-                dir_score = 0
-                found_dirs = []
-                for important_dir in config["important_dirs"]:
-                    if (base_path / important_dir).exists():
-                        found_dirs.append(important_dir)
-                        dir_score += 1
-                
-                if dir_score > 0:
-                    score += min(dir_score, 4)
-                
-                # Apply confidence boost
-                score += config.get("confidence_boost", 0)
-                
-                if score > 0:
-                    detected_types.append({
-                        'type': project_type,
-                        'score': score,
-                        'indicators': found_indicators,
-                        'directories': found_dirs
-                    })
-            
-            # Sort by score
-            detected_types.sort(key=lambda x: x['score'], reverse=True)
+            detected_types = PROJECT_DETECTOR.detect(snapshot)
             
             # Check if we're analyzing the server's own directory
             path_str = str(base_path).lower()
@@ -1066,7 +1901,7 @@ class MCPHandler(BaseHTTPRequestHandler):
         except Exception as e:
             return f"Error writing to file '{file_path}': {e}"
     
-    def _analyze_project_structure(self, base_path: str) -> str:
+    def _analyze_project_structure(self, base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
         """Analyze project structure - HYBRID AWARE"""
         try:
             # HYBRID MODE DETECTION: If on cloud and analyzing "." (server dir), trigger hybrid
@@ -1085,8 +1920,9 @@ class MCPHandler(BaseHTTPRequestHandler):
                            "   → `\"Document this project comprehensively\"`\n\n"
                            "This will automatically download the companion and analyze YOUR project files! 🚀")
             
-            base_path = Path(base_path).resolve()
-            project_info = self._detect_project_type(str(base_path))
+            snapshot = snapshot or ProjectSnapshot(base_path)
+            base_path = snapshot.base_path
+            project_info = self._detect_project_type(str(base_path), snapshot)
             
             structure = []
             structure.append("# 📊 Project Structure Analysis")
@@ -1100,14 +1936,8 @@ class MCPHandler(BaseHTTPRequestHandler):
                 if current_depth >= max_depth:
                     return
                     
-                items = []
                 try:
-                    for item in path.iterdir():
-                        if item.name.startswith('.') or item.name in ['node_modules', '__pycache__', '.next', 'out', 'dist', 'build']:
-                            continue
-                        items.append(item)
-                    
-                    items.sort(key=lambda x: (x.is_file(), x.name.lower()))
+                    items = snapshot.list_dir(path, ['node_modules', '__pycache__', '.next', 'out', 'dist', 'build'])
                     
                     for i, item in enumerate(items):
                         is_last = i == len(items) - 1
@@ -1116,7 +1946,7 @@ class MCPHandler(BaseHTTPRequestHandler):
                         
                         if item.is_dir() and current_depth < max_depth - 1:
                             next_prefix = prefix + ("    " if is_last else "│   ")
-                            generate_tree(item, next_prefix, max_depth, current_depth + 1)
+                            generate_tree(Path(item.path), next_prefix, max_depth, current_depth + 1)
                 except PermissionError:
                     structure.append(f"{prefix}    [Permission Denied]")
             
@@ -1186,22 +2016,21 @@ class MCPHandler(BaseHTTPRequestHandler):
         except Exception as e:
             return f"Error analyzing package.json: {e}"
     
-    def _generate_project_readme(self, base_path: str) -> str:
+    def _generate_project_readme(self, base_path: str, snapshot: Optional[ProjectSnapshot] = None) -> str:
         """Generate project README"""
         try:
-            base_path = Path(base_path).resolve()
-            project_type = self._detect_project_type(str(base_path))
+            snapshot = snapshot or ProjectSnapshot(base_path)
+            base_path = snapshot.base_path
+            project_type = self._detect_project_type(str(base_path), snapshot)
             
             project_name = base_path.name
             description = "A software project"
             
-            package_json_path = base_path / "package.json"
-            if package_json_path.exists():
+            if snapshot.exists("package.json"):
                 try:
-                    with open(package_json_path, 'r', encoding='utf-8') as f:
-                        package_data = json.load(f)
-                        project_name = package_data.get('name', project_name)
-                        description = package_data.get('description', description)
+                    package_data = json.loads(snapshot.read_text("package.json"))
+                    project_name = package_data.get('name', project_name)
+                    description = package_data.get('description', description)
                 except:
                     pass
             
@@ -1230,21 +2059,9 @@ class MCPHandler(BaseHTTPRequestHandler):
         """Find files by pattern"""
         try:
             base_path = Path(base_path).resolve()
-            matching_files = list(base_path.glob(pattern))
             
-            filtered_files = []
-            for file_path in matching_files:
-                relative_path = file_path.relative_to(base_path)
-                path_parts = relative_path.parts
-                
-                if any(part.startswith('.') for part in path_parts):
-                    continue
-                
-                skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-                if any(part in skip_dirs for part in path_parts):
-                    continue
-                
-                filtered_files.append(file_path)
+            # Hidden and build/dependency directories are pruned during the walk
+            filtered_files = list(find_files(base_path, pattern))
             
             if not filtered_files:
                 return f"No files found matching pattern: {pattern}"
@@ -1257,17 +2074,20 @@ class MCPHandler(BaseHTTPRequestHandler):
             results.append(f"Found {len(filtered_files)} files:")
             results.append("")
             
-            for file_path in filtered_files:
-                results.append(f"- `{file_path.relative_to(base_path)}`")
+            for file_entry in filtered_files:
+                results.append(f"- `{file_entry.rel_path}`")
             
             return '\n'.join(results)
         except Exception as e:
             return f"Error finding files: {e}"
     
-    def _analyze_code_metrics(self, base_path: str) -> str:
+    def _analyze_code_metrics(self, base_path: str, snapshot: Optional[ProjectSnapshot] = None,
+                              execution: Optional[str] = None, workers: Optional[int] = None,
+                              progress: Optional[ScanProgress] = None) -> str:
         """Analyze code metrics"""
         try:
-            base_path = Path(base_path).resolve()
+            snapshot = snapshot or ProjectSnapshot(base_path)
+            progress = progress or ScanProgress()
             
             code_extensions = {
                 '.py': 'Python', '.js': 'JavaScript', '.ts': 'TypeScript', 
@@ -1284,39 +2104,34 @@ class MCPHandler(BaseHTTPRequestHandler):
                 'by_language': {},
             }
             
-            for file_path in base_path.rglob('*'):
-                if not file_path.is_file():
-                    continue
-                
-                relative_path = file_path.relative_to(base_path)
-                path_parts = relative_path.parts
-                
-                if any(part.startswith('.') for part in path_parts):
-                    continue
-                
-                skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-                if any(part in skip_dirs for part in path_parts):
-                    continue
-                
+            # Per-file [lines, chars, blank, comment, code] are reused from earlier runs while mtime and size match
+            progress.phase("Counting lines")
+            files = snapshot.files
+            with get_analysis_cache().session(snapshot.base_path, 'line_counts:v3') as cache:
+                file_counts = analyze_files(snapshot, files, line_counts, cache=cache,
+                                            execution=execution, workers=workers, progress=progress)
+            logger.info(f"Code metrics cache: {cache.hits} hits, {cache.misses} misses")
+            
+            for file_entry, counts in zip(files, file_counts):
                 metrics['total_files'] += 1
+                if counts is None:
+                    continue  # Binary file
                 
-                ext = file_path.suffix.lower()
+                ext = file_entry.suffix.lower()
                 language = code_extensions.get(ext, 'Other')
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        lines = content.count('\n') + 1
-                        
-                        metrics['total_lines'] += lines
-                        
-                        if language not in metrics['by_language']:
-                            metrics['by_language'][language] = {'files': 0, 'lines': 0}
-                        
-                        metrics['by_language'][language]['files'] += 1
-                        metrics['by_language'][language]['lines'] += lines
-                except:
-                    pass
+                lines, _, blank, comment, code = counts
+                metrics['total_lines'] += lines
+                
+                if language not in metrics['by_language']:
+                    metrics['by_language'][language] = {'files': 0, 'lines': 0, 'blank': 0, 'comment': 0, 'code': 0}
+                
+                stats = metrics['by_language'][language]
+                stats['files'] += 1
+                stats['lines'] += lines
+                stats['blank'] += blank
+                stats['comment'] += comment
+                stats['code'] += code
             
             results = []
             results.append("# 📊 Code Metrics Analysis")
@@ -1334,56 +2149,48 @@ class MCPHandler(BaseHTTPRequestHandler):
                     percentage = (stats['lines'] / total_lines * 100) if total_lines > 0 else 0
                     results.append(f"- **{language}**: {stats['files']} files, {stats['lines']:,} lines ({percentage:.1f}%)")
                 results.append("")
+                
+                results.append("## 🧾 Line Breakdown")
+                for language, stats in sorted_languages:
+                    results.append(f"- **{language}**: {stats['code']:,} code, {stats['comment']:,} comment, {stats['blank']:,} blank")
+                results.append("")
             
             return '\n'.join(results)
         except Exception as e:
             return f"Error analyzing code metrics: {e}"
     
-    def _scan_for_todos_and_fixmes(self, base_path: str) -> str:
+    def _scan_for_todos_and_fixmes(self, base_path: str, snapshot: Optional[ProjectSnapshot] = None,
+                                   execution: Optional[str] = None, workers: Optional[int] = None,
+                                   tags: Optional[List[str]] = None, progress: Optional[ScanProgress] = None) -> str:
         """Scan for TODOs and FIXMEs"""
         try:
-            base_path = Path(base_path).resolve()
+            snapshot = snapshot or ProjectSnapshot(base_path)
+            progress = progress or ScanProgress()
             
-            patterns = {
-                'TODO': r'(?i)(?://|#|\*|<!--)?\s*TODO\s*:?\s*(.*)',
-                'FIXME': r'(?i)(?://|#|\*|<!--)?\s*FIXME\s*:?\s*(.*)',
-                'HACK': r'(?i)(?://|#|\*|<!--)?\s*HACK\s*:?\s*(.*)',
-            }
+            # Annotation tags to search for (matched case-insensitively)
+            tags = normalize_tags(tags, ('TODO', 'FIXME', 'HACK'))
             
-            findings = {pattern: [] for pattern in patterns.keys()}
+            findings = {tag: [] for tag in tags}
             
             code_extensions = {'.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.kt', '.go', '.rs', '.php', '.rb', '.cs', '.cpp', '.c', '.swift', '.dart'}
             
-            for file_path in base_path.rglob('*'):
-                if not file_path.is_file() or file_path.suffix not in code_extensions:
-                    continue
-                
-                relative_path = file_path.relative_to(base_path)
-                path_parts = relative_path.parts
-                
-                if any(part.startswith('.') for part in path_parts):
-                    continue
-                
-                skip_dirs = {'node_modules', '__pycache__', '.next', 'out', 'dist', 'build', 'target', 'vendor'}
-                if any(part in skip_dirs for part in path_parts):
-                    continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        
-                    for line_num, line in enumerate(lines, 1):
-                        for pattern_name, pattern in patterns.items():
-                            match = re.search(pattern, line)
-                            if match:
-                                comment = match.group(1).strip() if match.group(1) else line.strip()
-                                findings[pattern_name].append({
-                                    'file': relative_path,
-                                    'line': line_num,
-                                    'comment': comment
-                                })
-                except:
-                    pass
+            # Per-file [tag, line, comment] hits are reused from earlier runs while mtime and size match
+            progress.phase("Scanning annotations")
+            code_files = [f for f in snapshot.files if f.suffix in code_extensions]
+            # Sorted, so every ordering of the same tags shares one cache entry
+            scan_tags = tuple(sorted(tags))
+            with get_analysis_cache().session(snapshot.base_path, f"annotations:v2:{','.join(scan_tags)}") as cache:
+                file_hits = analyze_files(snapshot, code_files, find_annotations, scan_tags, cache=cache,
+                                          execution=execution, workers=workers, progress=progress)
+            logger.info(f"Annotation scan cache: {cache.hits} hits, {cache.misses} misses")
+            
+            for file_entry, hits in zip(code_files, file_hits):
+                for pattern_name, line_num, comment in hits or []:
+                    findings[pattern_name].append({
+                        'file': file_entry.rel_path,
+                        'line': line_num,
+                        'comment': comment
+                    })
             
             results = []
             results.append("# 🔍 Code Annotations Scan")
@@ -1418,8 +2225,9 @@ class MCPHandler(BaseHTTPRequestHandler):
         except Exception as e:
             return f"Error scanning for annotations: {e}"
     
-    def _document_project_comprehensive(self, project_path: str) -> str:
-        """Complete comprehensive documentation workflow with enhanced context detection"""
+    def _document_project_comprehensive(self, project_path: str, progress: Optional[ScanProgress] = None) -> str:
+        """Complete comprehensive documentation workflow; each finished step is published to progress"""
+        progress = progress or ScanProgress()
         try:
             # Enhanced project path detection with hybrid trigger
             original_path = project_path
@@ -1548,39 +2356,50 @@ class MCPHandler(BaseHTTPRequestHandler):
                 results.append("- For cloud version, specify the full project path in your prompt")
                 return '\n'.join(results)
             
+            # One traversal and one read per file, shared by every step below
+            snapshot = ProjectSnapshot(base_path)
+            
             # Step 1: Project type detection
+            progress.phase("Detecting project type")
             results.append("## 🔍 Step 1: Project Type Detection")
             results.append("-" * 50)
-            project_type_result = self._detect_project_type(str(base_path))
+            project_type_result = self._detect_project_type(str(base_path), snapshot)
             results.append(project_type_result)
+            progress.section("🔍 Step 1: Project Type Detection", project_type_result)
             results.append("")
             
             # Step 2: Project structure analysis
+            progress.phase("Analyzing structure")
             results.append("## 📊 Step 2: Project Structure Analysis")
             results.append("-" * 50)
-            structure_result = self._analyze_project_structure(str(base_path))
+            structure_result = self._analyze_project_structure(str(base_path), snapshot)
             results.append(structure_result)
+            progress.section("📊 Step 2: Project Structure Analysis", structure_result)
             results.append("")
             
             # Step 3: Code metrics
             results.append("## 📈 Step 3: Code Metrics & Technology Analysis")
             results.append("-" * 50)
-            metrics_result = self._analyze_code_metrics(str(base_path))
+            metrics_result = self._analyze_code_metrics(str(base_path), snapshot, progress=progress)
             results.append(metrics_result)
+            progress.section("📈 Step 3: Code Metrics & Technology Analysis", metrics_result)
             results.append("")
             
             # Step 4: Technical debt scanning
             results.append("## 🐛 Step 4: Technical Debt Analysis")
             results.append("-" * 50)
-            debt_result = self._scan_for_todos_and_fixmes(str(base_path))
+            debt_result = self._scan_for_todos_and_fixmes(str(base_path), snapshot, progress=progress)
             results.append(debt_result)
+            progress.section("🐛 Step 4: Technical Debt Analysis", debt_result)
             results.append("")
             
             # Step 5: README generation
+            progress.phase("Generating README")
             results.append("## 📝 Step 5: README Generation")
             results.append("-" * 50)
-            readme_result = self._generate_project_readme(str(base_path))
+            readme_result = self._generate_project_readme(str(base_path), snapshot)
             results.append(readme_result)
+            progress.section("📝 Step 5: README Generation", readme_result)
             results.append("")
             
             # Final recommendations
@@ -1616,13 +2435,27 @@ class MCPHandler(BaseHTTPRequestHandler):
         except Exception as e:
             return f"❌ Critical error in comprehensive documentation: {e}\n\n💡 Try specifying your project path explicitly in the prompt."
 
-    def _upload_project_files(self, files_data: Dict) -> str:
+    @staticmethod
+    def _is_blob_hash(value: Any) -> bool:
+        return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+    
+    def _check_project_blobs(self, project_id: str, hashes: List[str]) -> Dict[str, Any]:
+        """Report which contents a client still has to send on top of its earlier upload"""
+        missing = self.projects.missing(project_id, hashes)
+        unique = len(set(hashes))
+        return {
+            "missing": missing,
+            "known": unique - len(missing),
+            "hint": "Send missing contents in files_data and the rest as file_hashes (path -> SHA-256), with this project_id as base_project_id"
+        }
+    
+    def _upload_project_files(self, files_data: Dict, file_hashes: Optional[Dict[str, str]] = None,
+                              base_project_id: Optional[str] = None) -> str:
         """Handle file uploads for project analysis"""
         try:
-            if not files_data:
+            if not files_data and not file_hashes:
                 return "❌ No files provided for upload"
             
-            project_id = str(uuid.uuid4())
             uploaded_files = {}
             
             # Process uploaded files
@@ -1632,21 +2465,21 @@ class MCPHandler(BaseHTTPRequestHandler):
                 else:
                     return f"❌ Invalid file content for {file_path}"
             
-            # Store project data
-            self.projects[project_id] = {
-                'files': uploaded_files,
-                'uploaded_at': time.time(),
-                'status': 'uploaded',
-                'file_count': len(uploaded_files)
-            }
+            # Identical contents are stored once; old projects are evicted to stay within budget.
+            # Hashes only resolve against the caller's own earlier upload.
+            file_hashes = {path: digest for path, digest in (file_hashes or {}).items() if path not in uploaded_files}
+            reused = len(file_hashes)
             
-            # Clean up old projects (keep only last 10)
-            if len(self.projects) > 10:
-                oldest_projects = sorted(self.projects.items(), key=lambda x: x[1]['uploaded_at'])[:-10]
-                for old_id, _ in oldest_projects:
-                    del self.projects[old_id]
+            try:
+                project_id = self.projects.put(uploaded_files, file_hashes, base=base_project_id)
+            except MissingBlobs as e:
+                shown = ', '.join(digest[:12] for digest in e.digests[:10])
+                more = f" (+{len(e.digests) - 10} more)" if len(e.digests) > 10 else ""
+                return f"❌ Upload incomplete: {e}\n🔑 Missing: {shown}{more}\n💡 Call 'check_project_blobs' and resend those files in files_data."
+            except UploadTooLarge as e:
+                return f"❌ Upload too large: {e}\n💡 Upload fewer files or analyze the project locally with the companion script."
             
-            return f"✅ Project uploaded successfully!\n📁 Project ID: {project_id}\n📄 Files uploaded: {len(uploaded_files)}\n💡 Use 'analyze_uploaded_project' with this project ID to generate documentation."
+            return f"✅ Project uploaded successfully!\n📁 Project ID: {project_id}\n📄 Files uploaded: {len(uploaded_files) + len(file_hashes)} ({reused} reused by hash)\n💡 Use 'analyze_uploaded_project' with this project ID to generate documentation."
             
         except Exception as e:
             logger.error(f"Upload failed: {e}")
@@ -1655,10 +2488,10 @@ class MCPHandler(BaseHTTPRequestHandler):
     def _analyze_uploaded_project(self, project_id: str) -> str:
         """Analyze project from uploaded files"""
         try:
-            if project_id not in self.projects:
+            project_data = self.projects.get(project_id)
+            if project_data is None:
                 return f"❌ Project {project_id} not found. Please upload your project files first using 'upload_project_files'."
             
-            project_data = self.projects[project_id]
             files = project_data['files']
             
             if not files:
@@ -1963,19 +2796,15 @@ class MCPHandler(BaseHTTPRequestHandler):
         try:
             logger.info("🔄 Preparing companion script for hybrid analysis...")
             
-            # Read the companion script from local file
-            companion_path = Path(__file__).parent / "companion.py"
-            if not companion_path.exists():
+            # Read the companion script (with its shared modules inlined)
+            companion_content = companion_source()
+            if companion_content is None:
                 return {
                     "success": False,
                     "error": "Companion script not found on server",
                     "instructions": "Please contact support - hybrid mode unavailable"
                 }
             
-            # Read companion script content
-            with open(companion_path, 'r', encoding='utf-8') as f:
-                companion_content = f.read()
-            
             # Calculate checksum for integrity
             import hashlib
             checksum = hashlib.sha256(companion_content.encode()).hexdigest()[:16]
@@ -2008,14 +2837,159 @@ class MCPHandler(BaseHTTPRequestHandler):
                 "instructions": "Hybrid mode temporarily unavailable"
             }
 
-    def _orchestrate_hybrid_analysis(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _read_analysis_stream(self, lines: Iterable[str]) -> Tuple[Dict[str, Any], IntegrityHasher]:
+        """
+        Fold a companion NDJSON stream (--format ndjson) into the package shape
+        produced by the JSON output, hashing each record as it is read. Raises
+        ValueError if the stream is malformed or truncated.
+        """
+        hasher = IntegrityHasher()
+        package: Dict[str, Any] = {}
+        structure: Dict[str, Any] = {'directories': [], 'files': []}
+        project_data = {'structure': structure, 'project_type': {}, 'important_files': []}
+        integrity = None
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if integrity is not None:
+                raise ValueError("Analysis stream has records after its integrity record")
+            record = json.loads(line)
+            record_type = record.pop('type', None)
+            
+            if record_type == 'file':
+                hasher.update('files', record)
+                structure['files'].append(record)
+            elif record_type == 'directory':
+                hasher.update('directories', record['path'])
+                structure['directories'].append(record['path'])
+            elif record_type == 'important_file':
+                hasher.update('important_files', record)
+                project_data['important_files'].append(record)
+            elif record_type == 'project_type':
+                hasher.update('project_type', record)
+                project_data['project_type'] = record
+            elif record_type == 'structure_summary':
+                hasher.update('summary', record)
+                structure.update(record)
+            elif record_type == 'header':
+                hasher.update_header(record)
+                package = {field: record.get(field) for field in IntegrityHasher.HEADER_FIELDS}
+            elif record_type == 'integrity':
+                integrity = record
+        
+        if integrity is None:
+            raise ValueError("Analysis stream is incomplete (no integrity record)")
+        
+        package.setdefault('user_preferences', {})
+        package['project_data'] = project_data
+        package['integrity_hash'] = integrity.get('integrity_hash')
+        package['section_hashes'] = integrity.get('section_hashes')
+        return package, hasher
+    
+    def _apply_analysis_delta(self, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rebuild a full package from a companion --delta upload by patching the
+        cached model it was computed against. Raises ValueError when that base
+        is unknown (e.g. after a server restart).
+        """
+        delta = analysis_data['delta']
+        base_hash = delta.get('base_manifest_hash')
+        with self._projects_lock:
+            base = self.hybrid_models.get(base_hash)
+        if base is None:
+            raise ValueError(f"Unknown base analysis {base_hash}; re-run the companion with --delta --full")
+        base_data = base['package']['project_data']
+        
+        removed_dirs = set(delta['directories'].get('removed', []))
+        directories = [d for d in base_data['structure'].get('directories', []) if d not in removed_dirs]
+        directories.extend(d for d in delta['directories'].get('added', []) if d not in removed_dirs)
+        directories = list(dict.fromkeys(directories))
+        
+        def patch(records: List[Dict], changes: Dict) -> List[Dict]:
+            by_path = {record['path']: record for record in records}
+            for path in changes.get('removed', []):
+                by_path.pop(path, None)
+            for record in changes.get('changed', []):
+                by_path[record['path']] = record
+            return list(by_path.values())
+        
+        project_data = analysis_data['project_data']
+        return {
+            **{key: value for key, value in analysis_data.items() if key != 'delta'},
+            'project_data': {
+                'structure': {
+                    **project_data.get('structure', {}),
+                    'directories': directories,
+                    'files': patch(base_data['structure'].get('files', []), delta['files'])
+                },
+                'project_type': project_data.get('project_type', {}),
+                'important_files': patch(base_data.get('important_files', []), delta['important_files'])
+            }
+        }
+    
+    def _remember_hybrid_model(self, content_hash: str, package: Dict[str, Any]):
+        with self._projects_lock:
+            self.hybrid_models[content_hash] = {'package': package, 'stored_at': time.time()}
+            
+            # Keep only the 10 most recent models
+            if len(self.hybrid_models) > 10:
+                oldest_models = sorted(self.hybrid_models.items(), key=lambda x: x[1]['stored_at'])[:-10]
+                for old_hash, _ in oldest_models:
+                    del self.hybrid_models[old_hash]
+    
+    def _check_package_integrity(self, analysis_data: Dict[str, Any], hasher: IntegrityHasher) -> Dict[str, Any]:
+        """Compare a package's declared hashes with the ones computed from its records"""
+        declared = analysis_data.get('section_hashes')
+        if not isinstance(declared, dict):
+            # Packages from older companions carry no section hashes
+            return {"verified": None, "changed_sections": []}
+        computed = hasher.section_hashes()
+        changed = [section for section in IntegrityHasher.SECTIONS if declared.get(section) != computed[section]]
+        verified = not changed and analysis_data.get('integrity_hash') == hasher.root_hash()
+        if not verified:
+            logger.warning(f"Rejected hybrid analysis with integrity mismatch (changed sections: {', '.join(changed) or 'root'})")
+        return {"verified": verified, "changed_sections": changed}
+    
+    def _orchestrate_hybrid_analysis(self, analysis_data: Union[Dict[str, Any], str, Iterable[str]]) -> Dict[str, Any]:
         """Process local analysis data and generate enhanced documentation"""
         try:
             logger.info("🔄 Processing hybrid analysis data...")
             
+            hasher = None
+            if analysis_data and not isinstance(analysis_data, dict):
+                # NDJSON stream from the companion: raw text or an iterable of lines
+                if isinstance(analysis_data, str):
+                    analysis_data = io.StringIO(analysis_data)
+                try:
+                    analysis_data, hasher = self._read_analysis_stream(analysis_data)
+                except ValueError as e:
+                    return {"error": f"Invalid analysis stream: {e}"}
+            
             if not analysis_data or 'project_data' not in analysis_data:
                 return {"error": "Invalid analysis data provided"}
             
+            is_delta = isinstance(analysis_data.get('delta'), dict)
+            if is_delta:
+                try:
+                    analysis_data = self._apply_analysis_delta(analysis_data)
+                except (ValueError, KeyError, TypeError) as e:
+                    return {"error": f"Cannot apply delta upload: {e}"}
+            
+            hasher = hasher or IntegrityHasher.for_package(analysis_data)
+            integrity = self._check_package_integrity(analysis_data, hasher)
+            changed = ', '.join(integrity['changed_sections']) or 'root'
+            if is_delta and not integrity['verified']:
+                return {"error": "Delta upload does not reproduce the companion's project state "
+                                 f"(changed sections: {changed}); re-run the companion with --delta --full"}
+            if integrity['verified'] is False:
+                # Packages from older companions (verified None) carry nothing to check
+                return {"error": f"Analysis package failed its integrity check (changed sections: {changed}); "
+                                 "re-run the companion and upload its output unmodified"}
+            if integrity['verified']:
+                self._remember_hybrid_model(hasher.content_hash(), analysis_data)
+            
             project_data = analysis_data['project_data']
             user_preferences = analysis_data.get('user_preferences', {})
             
@@ -2038,7 +3012,8 @@ class MCPHandler(BaseHTTPRequestHandler):
                     "analysis_timestamp": analysis_data.get('analysis_timestamp'),
                     "privacy_mode": user_preferences.get('exclude_content', False),
                     "total_files_analyzed": structure.get('total_files', 0),
-                    "total_size": structure.get('total_size', 0)
+                    "total_size": structure.get('total_size', 0),
+                    "integrity": integrity
                 }
             }
             
@@ -2508,6 +3483,10 @@ This is a **{detected_type.upper()}** project (confidence: {confidence}/10) cont
                 "name": "analyze_uploaded_project",
                 "description": "Analyze a previously uploaded project. Use this after uploading files to get comprehensive documentation. Example: 'Analyze the uploaded project'"
             },
+            {
+                "name": "check_project_blobs",
+                "description": "Check which file contents (by SHA-256) of your earlier upload can be reused, so re-uploads only send what changed"
+            },
             # New hybrid tools
             {
                 "name": "download_companion",
@@ -2529,19 +3508,15 @@ This is a **{detected_type.upper()}** project (confidence: {confidence}/10) cont
         try:
             logger.info("🔍 Verifying companion script integrity...")
             
-            # Check if companion script exists
-            companion_path = Path(__file__).parent / "companion.py"
-            if not companion_path.exists():
+            # Read and analyze the companion script as served
+            companion_content = companion_source()
+            if companion_content is None:
                 return json.dumps({
                     "verified": False,
                     "error": "Companion script not found on server",
                     "recommendation": "Contact support for assistance"
                 }, indent=2)
             
-            # Read and analyze companion script
-            with open(companion_path, 'r', encoding='utf-8') as f:
-                companion_content = f.read()
-            
             # Calculate checksums
             import hashlib
             sha256_hash = hashlib.sha256(companion_content.encode()).hexdigest()
@@ -2728,6 +3703,32 @@ This is a **{detected_type.upper()}** project (confidence: {confidence}/10) cont
             logger.error(f"Error generating auto-run command: {e}")
             return f"❌ Error generating command: {str(e)}"
 
+# Payloads that never change while the server runs, serialised once at startup
+HEALTH_PAYLOAD = StaticPayload.from_json({
+    "name": "Documenter MCP Server",
+    "version": "3.1.0-hybrid-fixed",
+    "status": "running",
+    "description": "Intelligent documentation generator for any project type - HYBRID ARCHITECTURE",
+    "platform": "Render",
+    "url": "https://documenter-mcp.onrender.com",
+    "endpoints": {
+        "health": "/",
+        "tools": "/tools",
+        "mcp": "/mcp/request",
+        "companion": "/companion.py",
+        "metrics": "/metrics"
+    },
+    "features": ["hybrid-mode", "auto-companion-download", "local-file-analysis"]
+})
+TOOLS = MCPHandler._get_all_tools()
+TOOL_NAMES = frozenset(tool['name'] for tool in TOOLS)
+TOOLS_PAYLOAD = StaticPayload.from_json({"tools": TOOLS, "count": len(TOOLS), "platform": "Railway"})
+TOOLS_LIST_RESULT = StaticPayload.from_json({"tools": TOOLS})
+_companion_source = companion_source()
+COMPANION_PAYLOAD = StaticPayload(
+    _companion_source.encode('utf-8'), 'text/plain', {'Content-Disposition': 'attachment; filename="companion.py"'}
+) if _companion_source is not None else None
+
 if __name__ == "__main__":
     # Get port from environment or use default
     port = int(os.environ.get("PORT", 8000))
@@ -2738,10 +3739,16 @@ if __name__ == "__main__":
     print(f"🌐 URL: https://documenter-mcp.onrender.com")
     
     # Create server
-    server = HTTPServer(('0.0.0.0', port), MCPHandler)
+    if SERVER_MODE == "single":
+        print("🧵 Serving mode: single-threaded")
+        server = HTTPServer(('0.0.0.0', port), MCPHandler)
+    else:
+        print(f"🧵 Serving mode: threaded ({TOOL_WORKERS} tool workers, queue {TOOL_QUEUE_SIZE})")
+        server = MCPServer(('0.0.0.0', port), MCPHandler)
     
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
-        server.shutdown() 
\ No newline at end of file
+    finally:
+        server.server_close()
\ No newline at end of file
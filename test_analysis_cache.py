@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent analysis cache (analysis_cache.py)
+"""
+
+import os
+import sqlite3
+import time
+
+from analysis_cache import MISSING, AnalysisCache
+from project_scanner import walk_files
+
+OLD = time.time() - 3600  # Outside the racy-mtime window
+
+def write(path, text, mtime=OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+def entries(root):
+    return {entry.rel_posix: entry for entry in walk_files(root)}
+
+def row_count(cache, root=None):
+    with sqlite3.connect(str(cache.db_path)) as connection:
+        if root is None:
+            return connection.execute("SELECT COUNT(*) FROM file_results").fetchone()[0]
+        return connection.execute("SELECT COUNT(*) FROM file_results WHERE root = ?", (root,)).fetchone()[0]
+
+def test_results_are_reused_until_the_file_changes(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'a.py', 'print(1)\n')
+    write(project / 'b.py', 'print(2)\n')
+    cache = AnalysisCache(tmp_path / 'analysis.db')
+
+    with cache.session(project, 'lines') as session:
+        for rel_path, entry in entries(project).items():
+            assert session.get(entry) is MISSING
+            session.put(entry, {'path': rel_path})
+
+    write(project / 'b.py', 'print(2)\nprint(3)\n')
+    with cache.session(project, 'lines') as session:
+        files = entries(project)
+        assert session.get(files['a.py']) == {'path': 'a.py'}
+        assert session.get(files['b.py']) is MISSING
+        assert (session.hits, session.misses) == (1, 1)
+
+def test_analyses_and_roots_are_kept_apart(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'a.py', 'x = 1\n')
+    cache = AnalysisCache(tmp_path / 'analysis.db')
+    with cache.session(project, 'lines') as session:
+        session.put(entries(project)['a.py'], 1)
+
+    entry = entries(project)['a.py']
+    assert cache.session(project, 'todos').get(entry) is MISSING
+    assert cache.session(tmp_path, 'lines').get(entry) is MISSING
+
+def test_fresh_files_are_not_cached(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'new.py', 'x = 1\n', mtime=time.time())
+    cache = AnalysisCache(tmp_path / 'analysis.db')
+    with cache.session(project, 'lines') as session:
+        session.put(entries(project)['new.py'], 1)
+    assert cache.session(project, 'lines').get(entries(project)['new.py']) is MISSING
+
+def test_rows_for_files_not_seen_again_are_pruned(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'keep.py', 'a\n')
+    write(project / 'gone.py', 'b\n')
+    cache = AnalysisCache(tmp_path / 'analysis.db')
+    with cache.session(project, 'lines') as session:
+        for entry in entries(project).values():
+            session.put(entry, 1)
+    assert row_count(cache) == 2
+
+    (project / 'gone.py').unlink()
+    with cache.session(project, 'lines') as session:
+        for entry in entries(project).values():
+            session.get(entry)
+    assert row_count(cache) == 1
+
+def test_failed_runs_do_not_prune(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'a.py', 'a\n')
+    cache = AnalysisCache(tmp_path / 'analysis.db')
+    with cache.session(project, 'lines') as session:
+        session.put(entries(project)['a.py'], 1)
+    try:
+        with cache.session(project, 'lines'):
+            raise RuntimeError("scan interrupted")
+    except RuntimeError:
+        pass
+    assert row_count(cache) == 1
+
+def test_least_recently_used_pairs_are_evicted_past_max_rows(tmp_path):
+    cache = AnalysisCache(tmp_path / 'analysis.db', max_rows=3)
+    roots = []
+    for name in ('one', 'two', 'three'):
+        root = tmp_path / name
+        write(root / 'a.py', 'a\n')
+        write(root / 'b.py', 'b\n')
+        with cache.session(root, 'lines') as session:
+            for entry in entries(root).values():
+                session.put(entry, 1)
+        roots.append(os.fspath(root))
+
+    # Only the most recent pair fits in three rows
+    assert [row_count(cache, root) for root in roots] == [0, 0, 2]
+
+def test_pairs_unused_past_max_age_are_evicted(tmp_path):
+    cache = AnalysisCache(tmp_path / 'analysis.db', max_age=0)
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    for root in (first, second):
+        write(root / 'a.py', 'a\n')
+        with cache.session(root, 'lines') as session:
+            session.put(entries(root)['a.py'], 1)
+        time.sleep(0.01)
+    assert row_count(cache, os.fspath(first)) == 0
+    assert row_count(cache, os.fspath(second)) == 1
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    project = tmp_path / 'project'
+    write(project / 'a.py', 'a\n')
+    cache = AnalysisCache(tmp_path / 'analysis.db', enabled=False)
+    with cache.session(project, 'lines') as session:
+        session.put(entries(project)['a.py'], 1)
+    assert cache.session(project, 'lines').get(entries(project)['a.py']) is MISSING
+    assert not cache.db_path.exists()
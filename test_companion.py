@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for the local companion (companion.py)
+"""
+
+import copy
+import json
+import mimetypes
+from pathlib import Path
+
+from companion import (IMPORTANT_FILE_CHARS, SUPPORTED_TEXT_EXTENSIONS, CompanionLogger, IntegrityHasher,
+                       ProjectAnalyzer, SecureCommunicator, decode_text, is_text_name)
+
+def make_project(root):
+    files = {
+        'package.json': '{"name": "demo", "dependencies": {"express": "^4.0.0"}}',
+        'README.md': '# Demo\n',
+        'src/index.js': 'const express = require("express");\n',
+        'src/lib/util.js': 'module.exports = {};\n',
+    }
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return root
+
+def analyze(root):
+    """Full JSON package as uploaded by the companion"""
+    analyzer = ProjectAnalyzer(str(root), CompanionLogger())
+    project_data = {
+        'structure': analyzer.analyze_project_structure(),
+        'project_type': analyzer.detect_project_type(),
+        'important_files': analyzer.get_important_files()
+    }
+    package = SecureCommunicator(CompanionLogger()).create_analysis_package(project_data, {})
+    return json.loads(json.dumps(package, default=str))
+
+def stream(root):
+    analyzer = ProjectAnalyzer(str(root), CompanionLogger())
+    return list(SecureCommunicator(CompanionLogger()).stream_analysis_package(analyzer, {}))
+
+def delta(root, previous=None):
+    """(package, manifest) as produced by --delta, JSON round-tripped like an upload"""
+    analyzer = ProjectAnalyzer(str(root), CompanionLogger())
+    package, manifest = SecureCommunicator(CompanionLogger()).create_delta_package(analyzer, previous, {})
+    return json.loads(json.dumps(package, default=str)), json.loads(json.dumps(manifest))
+
+def change_project(root):
+    """Edit one file, remove a directory with its file and add a file in a new directory"""
+    (root / 'src' / 'index.js').write_text('const express = require("express");\nexpress();\n', encoding='utf-8')
+    (root / 'src' / 'lib' / 'util.js').unlink()
+    (root / 'src' / 'lib').rmdir()
+    (root / 'docs').mkdir()
+    (root / 'docs' / 'guide.md').write_text('# Guide\n', encoding='utf-8')
+
+def test_package_hashes_verify(tmp_path):
+    package = analyze(make_project(tmp_path))
+    hasher = IntegrityHasher.for_package(package)
+    assert hasher.root_hash() == package['integrity_hash']
+    assert hasher.section_hashes() == package['section_hashes']
+    # Full-length SHA-256 hex digests
+    assert len(package['integrity_hash']) == 64
+    assert all(len(digest) == 64 for digest in package['section_hashes'].values())
+
+def test_tampering_changes_only_the_affected_section(tmp_path):
+    package = analyze(make_project(tmp_path))
+    tampered = copy.deepcopy(package)
+    tampered['project_data']['structure']['files'][0]['size'] += 1
+    hashes = IntegrityHasher.for_package(tampered).section_hashes()
+    changed = [section for section in IntegrityHasher.SECTIONS if hashes[section] != package['section_hashes'][section]]
+    assert changed == ['files']
+
+def test_stream_hashes_match_the_json_package(tmp_path):
+    root = make_project(tmp_path)
+    package = analyze(root)
+    records = [json.loads(line) for line in stream(root)]
+    assert records[0]['type'] == 'header'
+    assert records[-1]['type'] == 'integrity'
+    streamed = records[-1]['section_hashes']
+    # Headers differ only by their timestamps
+    for section in IntegrityHasher.SECTIONS[1:]:
+        assert streamed[section] == package['section_hashes'][section], section
+
+def test_delta_without_a_manifest_is_a_full_package(tmp_path):
+    root = make_project(tmp_path)
+    package, manifest = delta(root)
+    assert 'delta' not in package
+    assert IntegrityHasher.for_package(package).root_hash() == package['integrity_hash']
+    assert manifest['manifest_hash'] == IntegrityHasher.for_package(package).content_hash()
+    assert sorted(manifest['files']) == ['README.md', 'package.json', 'src/index.js', 'src/lib/util.js']
+
+def test_delta_lists_only_changes(tmp_path):
+    root = make_project(tmp_path)
+    _, manifest = delta(root)
+    unchanged, same_manifest = delta(root, manifest)
+    assert unchanged['delta']['files'] == {'changed': [], 'removed': []}
+    assert unchanged['delta']['directories'] == {'added': [], 'removed': []}
+    assert same_manifest['manifest_hash'] == manifest['manifest_hash']
+
+    change_project(root)
+    package, new_manifest = delta(root, manifest)
+    changes = package['delta']
+    assert changes['base_manifest_hash'] == manifest['manifest_hash']
+    assert changes['manifest_hash'] == new_manifest['manifest_hash'] != manifest['manifest_hash']
+    assert sorted(record['path'] for record in changes['files']['changed']) == ['docs/guide.md', 'src/index.js']
+    assert changes['files']['removed'] == ['src/lib/util.js']
+    assert changes['directories'] == {'added': ['docs'], 'removed': ['src/lib']}
+
+def test_project_type_comes_from_the_structure_walk(tmp_path):
+    root = make_project(tmp_path)
+    for rel_path in ('public/index.html', 'src/App.csproj', 'tools/Build.csproj', 'node_modules/x/Vendored.csproj'):
+        (root / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel_path).write_text('', encoding='utf-8')
+    analyzer = ProjectAnalyzer(str(root), CompanionLogger())
+    project_type = analyzer.detect_project_type()
+    assert project_type['indicators_found'] == {'nodejs': 1, 'csharp': 2}
+    assert project_type['all_detected'] == {'nodejs': 1, 'csharp': 2, 'react': 2}
+    assert project_type['detected_type'] == 'csharp'
+
+def test_unknown_project_type(tmp_path):
+    (tmp_path / 'notes.txt').write_text('hello', encoding='utf-8')
+    project_type = ProjectAnalyzer(str(tmp_path), CompanionLogger()).detect_project_type()
+    assert project_type == {'detected_type': 'unknown', 'confidence': 0, 'all_detected': {}, 'indicators_found': {}}
+
+def test_read_text_prefix(tmp_path):
+    analyzer = ProjectAnalyzer(str(tmp_path), CompanionLogger())
+    text = 'é€𝄞' * 1000
+    cases = {
+        'utf8.txt': text.encode('utf-8'),
+        'utf16.txt': text.encode('utf-16'),
+        'bom.txt': text.encode('utf-8-sig'),
+    }
+    for name, data in cases.items():
+        (tmp_path / name).write_bytes(data)
+        assert analyzer.read_text_prefix(tmp_path / name, 10) == (text[:10], len(data), True), name
+        assert analyzer.read_text_prefix(tmp_path / name, 3000) == (text, len(data), False), name
+
+    (tmp_path / 'latin1.txt').write_bytes('café'.encode('latin-1'))
+    assert analyzer.read_text_prefix(tmp_path / 'latin1.txt', 100) == ('café', 4, False)
+    assert analyzer.read_text_prefix(tmp_path / 'missing.txt', 100) is None
+
+def test_decode_text_tolerates_cut_characters():
+    data = 'naïve'.encode('utf-8')[:3]
+    assert decode_text(data, final=False) == 'na'
+    assert decode_text(data) == 'na\xc3'  # A complete sample that isn't UTF-8 is read as Latin-1
+
+def test_important_files_are_truncated(tmp_path):
+    root = make_project(tmp_path)
+    (root / 'README.md').write_text('x' * (IMPORTANT_FILE_CHARS + 10), encoding='utf-8')
+    files = {info['path']: info for info in ProjectAnalyzer(str(root), CompanionLogger()).get_important_files()}
+    readme = files['README.md']
+    assert len(readme['content']) == IMPORTANT_FILE_CHARS
+    assert readme['size'] == IMPORTANT_FILE_CHARS + 10 and readme['truncated'] is True
+    assert files['package.json']['truncated'] is False
+
+def test_is_text_name_matches_a_per_file_mimetypes_check():
+    names = ['main.py', 'MAIN.PY', 'notes.csv', 'page.HTM', 'image.png', 'archive.tar.gz', 'notes.txt.gz',
+             'Makefile', '.gitignore', 'data.bin', 'style.scss', 'report.PDF']
+    for name in names:
+        mime_type, _ = mimetypes.guess_type(name)
+        expected = Path(name).suffix.lower() in SUPPORTED_TEXT_EXTENSIONS or bool(mime_type and mime_type.startswith('text/'))
+        assert is_text_name(name) is expected, name
+        assert is_text_name(name) is expected, name  # Memoised answer
+
+def walked_paths(root):
+    analyzer = ProjectAnalyzer(str(root), CompanionLogger())
+    return sorted(record['path'] for record in analyzer.iter_project_structure() if record['type'] == 'file')
+
+def test_structure_walk_honours_exclusions(tmp_path):
+    root = tmp_path / 'build' / 'project'  # Directories above the project don't count
+    make_project(root)
+    for rel_path, text in {'debug.log': '', 'node_modules/x/index.js': '', '.gitignore': 'secret/\n*.bak\n',
+                           'secret/key.txt': '', 'src/old.bak': '', 'src/.documenterignore': '!old.bak\n'}.items():
+        (root / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel_path).write_text(text, encoding='utf-8')
+    paths = walked_paths(root)
+    assert 'debug.log' not in paths and 'node_modules/x/index.js' not in paths
+    assert 'secret/key.txt' not in paths
+    assert 'src/old.bak' in paths and 'src/index.js' in paths
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for gitignore-style exclusion matching (ignore_rules.py)
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from ignore_rules import IgnoreMatcher, IgnoreRules
+
+@pytest.mark.parametrize("patterns, path, is_dir, expected", [
+    (['*.log'], 'debug.log', False, True),
+    (['*.log'], 'deep/dir/debug.log', False, True),
+    (['*.log'], 'debug.log.txt', False, None),
+    (['/build'], 'build', True, True),
+    (['/build'], 'src/build', True, None),
+    (['docs/*.md'], 'docs/index.md', False, True),
+    (['docs/*.md'], 'docs/api/index.md', False, None),
+    (['docs/*.md'], 'src/docs/index.md', False, None),
+    (['tmp/'], 'tmp', True, True),
+    (['tmp/'], 'tmp', False, None),
+    (['**/cache'], 'a/b/cache', True, True),
+    (['**/cache'], 'cache', False, True),
+    (['logs/**'], 'logs/2024/app.txt', False, True),
+    (['a/**/b'], 'a/b', True, True),
+    (['a/**/b'], 'a/x/y/b', True, True),
+    (['file?.[ch]'], 'file1.c', False, True),
+    (['file?.[ch]'], 'file12.c', False, None),
+    (['[!a]x'], 'bx', False, True),
+    (['[!a]x'], 'ax', False, None),
+    (['*.log', '!keep.log'], 'keep.log', False, False),
+    (['!keep.log', '*.log'], 'keep.log', False, True),
+    (['# comment', '\\#hash'], '#hash', False, True),
+    (['\\!bang'], '!bang', False, True),
+    (['trailing   '], 'trailing', False, True),
+    (['escaped\\ '], 'escaped ', False, True),
+    ([''], 'anything', False, None),
+])
+def test_ignore_rules_match(patterns, path, is_dir, expected):
+    assert IgnoreRules(patterns).match(path, is_dir) is expected
+
+def write(root, rel_path, text=''):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+def test_deeper_ignore_files_override_shallower_ones(tmp_path):
+    write(tmp_path, '.gitignore', '*.log\nsecret/\n')
+    write(tmp_path, 'sub/.gitignore', '!*.log\n')
+    write(tmp_path, 'sub/.documenterignore', 'drafts/\n')
+    matcher = IgnoreMatcher(tmp_path, ['node_modules'])
+    assert matcher.ignored('app.log', False)
+    assert not matcher.ignored('sub/app.log', False)
+    assert matcher.ignored('sub/drafts', True)
+    assert not matcher.ignored('drafts', True)
+    assert matcher.excluded('secret/notes.txt')
+    assert not matcher.excluded('sub/notes.txt')
+
+def test_builtin_patterns_cannot_be_negated(tmp_path):
+    write(tmp_path, '.gitignore', '!node_modules\n!*.pyc\n')
+    matcher = IgnoreMatcher(tmp_path, ['node_modules', '*.pyc'])
+    assert matcher.ignored('node_modules', True)
+    assert matcher.ignored('pkg/module.pyc', False)
+
+def test_enter_only_reads_listed_ignore_files(tmp_path):
+    write(tmp_path, 'sub/.gitignore', '*.tmp\n')
+    matcher = IgnoreMatcher(tmp_path, [])
+    matcher.enter('sub', ['a.tmp'])  # Listing without .gitignore: nothing to load
+    assert not matcher.ignored('sub/a.tmp', False)
+    assert IgnoreMatcher(tmp_path, []).ignored('sub/a.tmp', False)
+
+TREE = {
+    '.gitignore': '*.log\n!important.log\n/build/\ndocs/**/*.tmp\ncache/\n[Tt]emp*\n',
+    'app.log': '', 'important.log': '', 'main.py': '',
+    'build/out.o': '', 'src/build/keep.py': '',
+    'docs/a.tmp': '', 'docs/x/y/b.tmp': '', 'docs/readme.md': '',
+    'cache/data': '', 'src/cache/data': '', 'src/cache.py': '',
+    'Temp.txt': '', 'src/temporary.py': '',
+    'lib/.gitignore': '!*.log\n*.py\n!keep.py\n', 'lib/debug.log': '', 'lib/mod.py': '', 'lib/keep.py': '',
+    'lib/deep/.gitignore': '/only_here.txt\n', 'lib/deep/only_here.txt': '', 'lib/deep/x/only_here.txt': '',
+}
+
+@pytest.mark.skipif(shutil.which('git') is None, reason="git not installed")
+def test_matches_git_on_a_sample_tree(tmp_path):
+    for rel_path, text in TREE.items():
+        write(tmp_path, rel_path, text)
+    subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True)
+    listed = subprocess.run(['git', 'ls-files', '--others', '--exclude-standard'], cwd=tmp_path,
+                            check=True, capture_output=True, text=True).stdout.split()
+
+    matcher = IgnoreMatcher(Path(tmp_path), [], ignore_files=('.gitignore',))
+    kept = []
+    for dir_path, dir_names, file_names in os.walk(tmp_path):
+        rel_dir = Path(dir_path).relative_to(tmp_path).as_posix()
+        prefix = '' if rel_dir == '.' else rel_dir + '/'
+        dir_names[:] = [name for name in dir_names if name != '.git' and not matcher.ignored(prefix + name, True)]
+        kept.extend(prefix + name for name in file_names if not matcher.ignored(prefix + name, False))
+    assert sorted(kept) == sorted(listed)
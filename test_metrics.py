@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry (metrics.py)
+"""
+
+import pytest
+
+from metrics import MetricsRegistry
+
+def test_counters_and_gauges_render():
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests by path', ('path',))
+    in_flight = registry.gauge('app_in_flight', 'Requests in flight')
+    requests.inc(path='/')
+    requests.inc(2, path='/tools')
+    requests.inc(path='/')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.render() == (
+        '# HELP app_requests_total Requests by path\n'
+        '# TYPE app_requests_total counter\n'
+        'app_requests_total{path="/"} 2\n'
+        'app_requests_total{path="/tools"} 2\n'
+        '# HELP app_in_flight Requests in flight\n'
+        '# TYPE app_in_flight gauge\n'
+        'app_in_flight 1\n'
+    )
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('app_seconds', 'Latency', ('method',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, method='GET')
+    assert registry.render().splitlines()[2:] == [
+        'app_seconds_bucket{method="GET",le="0.1"} 2',
+        'app_seconds_bucket{method="GET",le="1"} 3',
+        'app_seconds_bucket{method="GET",le="+Inf"} 4',
+        'app_seconds_sum{method="GET"} 3.65',
+        'app_seconds_count{method="GET"} 4',
+    ]
+
+def test_collected_gauges_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.gauge('app_ratio', 'Hit ratio', ('analysis',), collect=lambda: [(('b"\\\n',), 0.5), (('a',), 1.0)])
+    registry.gauge('app_size', 'Size', collect=lambda: 7)
+    assert registry.render().splitlines() == [
+        '# HELP app_ratio Hit ratio',
+        '# TYPE app_ratio gauge',
+        'app_ratio{analysis="a"} 1',
+        'app_ratio{analysis="b\\"\\\\\\n"} 0.5',
+        '# HELP app_size Size',
+        '# TYPE app_size gauge',
+        'app_size 7',
+    ]
+
+def test_invalid_use_is_rejected():
+    registry = MetricsRegistry()
+    counter = registry.counter('app_total', 'Total', ('path',))
+    with pytest.raises(ValueError):
+        registry.counter('app_total', 'Duplicate')
+    with pytest.raises(ValueError):
+        counter.inc(-1, path='/')
+    with pytest.raises(ValueError):
+        counter.inc(method='GET')
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared project scanner (project_scanner.py)
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import PurePath
+
+import pytest
+
+import project_scanner
+from project_scanner import (PARALLEL_MIN_FILES, ProjectSnapshot, ProjectTypeDetector, analyze_files, compile_glob,
+                             find_annotations, find_files, git_index_files, ignore_matcher, iter_project_files,
+                             line_counts, list_dir, normalize_tags, read_git_index, walk_files)
+
+def make_tree(root, files):
+    """Create files (relative '/'-separated paths) with small contents"""
+    for rel_path in files:
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {rel_path}\n", encoding='utf-8')
+
+def rel_paths(entries):
+    return [entry.rel_posix for entry in entries]
+
+def test_walk_files_is_depth_first_and_sorted(tmp_path):
+    make_tree(tmp_path, ['b.txt', 'a.txt', 'src/z.py', 'src/a/one.py', 'docs/index.md'])
+    assert rel_paths(walk_files(tmp_path)) == [
+        'a.txt', 'b.txt', 'docs/index.md', 'src/z.py', 'src/a/one.py'
+    ]
+
+def test_walk_files_prunes_skipped_and_hidden_directories(tmp_path):
+    make_tree(tmp_path, ['main.py', 'node_modules/pkg/index.js', '.git/config', '.env', 'build/out.o'])
+    assert rel_paths(walk_files(tmp_path)) == ['main.py']
+    assert rel_paths(walk_files(tmp_path, skip_dirs=(), skip_hidden=False)) == [
+        '.env', 'main.py', '.git/config', 'build/out.o', 'node_modules/pkg/index.js'
+    ]
+
+def test_walk_files_max_depth(tmp_path):
+    make_tree(tmp_path, ['top.py', 'a/mid.py', 'a/b/deep.py'])
+    assert rel_paths(walk_files(tmp_path, max_depth=0)) == ['top.py']
+    assert rel_paths(walk_files(tmp_path, max_depth=1)) == ['top.py', 'a/mid.py']
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason="symlinks unavailable")
+def test_walk_files_does_not_follow_directory_symlinks(tmp_path):
+    make_tree(tmp_path, ['real/file.py'])
+    try:
+        os.symlink(tmp_path / 'real', tmp_path / 'link', target_is_directory=True)
+    except OSError:
+        pytest.skip("cannot create symlinks here")
+    assert rel_paths(walk_files(tmp_path)) == ['real/file.py']
+
+def test_file_entry_matches_pathlib(tmp_path):
+    make_tree(tmp_path, ['pkg/module.tar.gz', 'pkg/.hidden', 'pkg/Makefile'])
+    for entry in walk_files(tmp_path, skip_hidden=False):
+        assert entry.suffix == PurePath(entry.name).suffix
+        assert entry.path == os.path.join(tmp_path, entry.rel_path)
+        assert entry.size == os.path.getsize(entry.path)
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ('*.py', 'main.py', True),
+    ('*.py', 'src/main.py', False),
+    ('src/*.ts', 'src/app.ts', True),
+    ('**/*.js', 'a/b/c.js', True),
+    ('**/*.js', 'c.js', True),
+    ('file?.[ch]', 'file1.c', True),
+    ('file[!0-9].c', 'file1.c', False),
+])
+def test_compile_glob(pattern, path, expected):
+    regex, _ = compile_glob(pattern)
+    assert bool(regex.match(path)) is expected
+
+def test_find_files_limits_walk_depth(tmp_path):
+    make_tree(tmp_path, ['setup.py', 'pkg/mod.py', 'pkg/sub/deep.py'])
+    assert rel_paths(find_files(tmp_path, '*.py')) == ['setup.py']
+    assert rel_paths(find_files(tmp_path, '**/*.py')) == ['setup.py', 'pkg/mod.py', 'pkg/sub/deep.py']
+
+def test_list_dir_puts_directories_first(tmp_path):
+    make_tree(tmp_path, ['b.txt', 'A.txt', 'zdir/x', 'Cdir/y', '.hidden'])
+    assert [entry.name for entry in list_dir(tmp_path)] == ['Cdir', 'zdir', 'A.txt', 'b.txt']
+
+def test_snapshot_lookups_and_reads(tmp_path):
+    make_tree(tmp_path, ['package.json', 'src/app.js', 'App.csproj'])
+    snapshot = ProjectSnapshot(tmp_path)
+    assert rel_paths(snapshot.files) == ['App.csproj', 'package.json', 'src/app.js']
+    assert snapshot.is_file('src/app.js') and snapshot.is_dir('src')
+    assert not snapshot.exists('src/missing.js') and not snapshot.is_file('package.json/x')
+    assert snapshot.match_root('*.csproj') == ['App.csproj']
+
+    # Contents are read from disk once, then served from the snapshot
+    (tmp_path / 'package.json').write_text('{"name": "changed"}', encoding='utf-8')
+    original = snapshot.read_text('package.json')
+    (tmp_path / 'package.json').write_text('{}', encoding='utf-8')
+    assert snapshot.read_text('package.json') == original
+    assert snapshot.read_bytes('package.json') == original.encode('utf-8')
+
+def test_snapshot_read_text_errors(tmp_path):
+    (tmp_path / 'latin1.txt').write_bytes(b'caf\xe9')
+    snapshot = ProjectSnapshot(tmp_path)
+    assert snapshot.read_text('latin1.txt') is None
+    assert snapshot.read_text('latin1.txt', errors='replace') == 'caf�'
+    assert snapshot.read_text('missing.txt') is None
+    assert snapshot.read_bytes('latin1.txt') == b'caf\xe9'
+
+def count_words(data, name, minimum):
+    """Module-level analyzer, so process workers can unpickle it"""
+    return len([word for word in data.split() if len(word) >= minimum])
+
+class RecordingCache:
+    """CacheSession stand-in that remembers what was stored"""
+
+    def __init__(self, stored=None):
+        self.stored = dict(stored or {})
+
+    def get(self, entry, default):
+        return self.stored.get(entry.rel_posix, default)
+
+    def put(self, entry, result):
+        self.stored[entry.rel_posix] = result
+
+@pytest.mark.parametrize("execution", ['serial', 'thread', 'process'])
+def test_analyze_files_keeps_entry_order_in_every_mode(tmp_path, monkeypatch, execution):
+    monkeypatch.setattr(project_scanner, 'DEFAULT_WORKERS', 2)  # Use pools even on one CPU
+    for index in range(PARALLEL_MIN_FILES + 6):
+        (tmp_path / f"file{index:03}.txt").write_text('word ' * index + 'a b', encoding='utf-8')
+    snapshot = ProjectSnapshot(tmp_path)
+    results = analyze_files(snapshot, snapshot.files, count_words, 2, execution=execution)
+    assert results == list(range(PARALLEL_MIN_FILES + 6))
+
+def test_analyze_files_rejects_unknown_modes(tmp_path):
+    snapshot = ProjectSnapshot(tmp_path)
+    with pytest.raises(ValueError):
+        analyze_files(snapshot, [], count_words, 1, execution='gpu')
+
+def test_analyze_files_uses_and_fills_the_cache(tmp_path):
+    make_tree(tmp_path, ['cached.txt', 'fresh.txt', 'deleted.txt'])
+    snapshot = ProjectSnapshot(tmp_path)
+    entries = snapshot.files
+    (tmp_path / 'deleted.txt').unlink()
+    cache = RecordingCache({'cached.txt': 99})
+    assert analyze_files(snapshot, entries, count_words, 1, cache=cache) == [99, None, 2]
+    # Unreadable files are retried next time rather than cached
+    assert cache.stored == {'cached.txt': 99, 'fresh.txt': 2}
+
+def test_normalize_tags():
+    assert normalize_tags([' todo', 'FIXME', 'Todo', ''], ['HACK']) == ('TODO', 'FIXME')
+    assert normalize_tags(None, ['todo', 'fixme']) == ('TODO', 'FIXME')
+
+def test_find_annotations_reports_each_tag_once_per_line():
+    data = (b"x = 1  # TODO: tidy this up\n"
+            b"# fixme handle errors, todo: later\n"
+            b"\n"
+            b"// TODO\n"
+            b"# TODO first TODO second\n")
+    assert find_annotations(data, 'notes.py', ('TODO', 'FIXME')) == [
+        ['TODO', 1, 'tidy this up'],
+        ['TODO', 2, 'later'],
+        ['FIXME', 2, 'handle errors, todo: later'],
+        ['TODO', 4, '// TODO'],
+        ['TODO', 5, 'first TODO second'],
+    ]
+
+def test_find_annotations_prefers_the_longest_tag():
+    assert find_annotations(b"# TODOLIST: rename\n", 'notes.py', ('TODO', 'TODOLIST')) == [['TODOLIST', 1, 'rename']]
+
+def test_find_annotations_skips_files_without_tags():
+    assert find_annotations(b"\xff\xfe binary without tags", 'notes.py', ('TODO',)) == []
+    assert find_annotations(b"\xff TODO: not utf-8", 'notes.py', ('TODO',)) is None
+
+def test_find_annotations_non_ascii_tags():
+    assert find_annotations('# À_FAIRE: traduire\n'.encode('utf-8'), 'notes.py', ('À_FAIRE',)) == [['À_FAIRE', 1, 'traduire']]
+    assert find_annotations('# à_faire: aussi\n'.encode('utf-8'), 'notes.py', ('À_FAIRE',)) == [['À_FAIRE', 1, 'aussi']]
+
+def test_line_counts_python():
+    data = (b'"""Module docstring\n'
+            b'spanning lines"""\n'
+            b'\n'
+            b'import os  # trailing comment\n'
+            b'# full-line comment\n'
+            b'x = "caf\xc3\xa9"\n')
+    lines, characters, blank, comment, code = line_counts(data, 'module.py')
+    assert lines == 7  # The empty text after the final newline counts as a line
+    assert characters == len(data.decode('utf-8'))
+    assert (blank, comment, code) == (2, 3, 2)
+    assert blank + comment + code == lines
+
+def test_line_counts_block_comments():
+    data = b"/* header\n * more\n */ int x;\n// note\nint y;"
+    assert line_counts(data, 'main.c') == [5, len(data), 0, 3, 2]
+
+def test_line_counts_uses_file_names_without_extensions():
+    assert line_counts(b"# build\nall:\n", 'Makefile')[2:] == [1, 1, 1]
+    assert line_counts(b"# heading\ntext\n", 'README')[2:] == [1, 0, 2]
+
+def test_line_counts_skips_binary_files():
+    assert line_counts(b"\x89PNG\r\n\x1a\n\0\0\0", 'image.png') is None
+
+DETECTOR_CONFIGS = {
+    'react': {
+        'indicators': ['package.json'],
+        'check_content': {'package.json': ['"react"', '"react-dom"']},
+        'important_dirs': ['src', 'public'],
+    },
+    'node': {
+        'indicators': ['package.json', 'server.js'],
+        'check_content': {'package.json': '"express"'},
+        'important_dirs': ['src'],
+        'confidence_boost': 1,
+    },
+    'dotnet': {
+        'indicators': ['*.csproj'],
+        'check_content': {},
+        'important_dirs': [],
+    },
+    'generic': {'indicators': ['README.md'], 'check_content': {}, 'important_dirs': []},
+}
+
+def test_project_type_detector_scores(tmp_path):
+    make_tree(tmp_path, ['src/index.js', 'README.md', 'App.csproj', 'Lib.csproj'])
+    (tmp_path / 'package.json').write_text('{"dependencies": {"React": "18", "react-dom": "18"}}', encoding='utf-8')
+    detector = ProjectTypeDetector(DETECTOR_CONFIGS)
+    assert detector.detect(ProjectSnapshot(tmp_path)) == [
+        {'type': 'react', 'score': 7, 'indicators': ['package.json', 'package.json (contains "react", "react-dom")'],
+         'directories': ['src']},
+        {'type': 'node', 'score': 4, 'indicators': ['package.json'], 'directories': ['src']},
+        {'type': 'dotnet', 'score': 2, 'indicators': ['*.csproj (2 files)'], 'directories': []},
+    ]
+    assert detector.indicator_hits(ProjectSnapshot(tmp_path)) == 3
+
+def test_project_type_detector_results_are_copies(tmp_path):
+    make_tree(tmp_path, ['server.js'])
+    detector = ProjectTypeDetector(DETECTOR_CONFIGS)
+    snapshot = ProjectSnapshot(tmp_path)
+    first = detector.detect(snapshot)
+    first[0]['indicators'].append('tampered')
+    assert detector.detect(snapshot) == [{'type': 'node', 'score': 3, 'indicators': ['server.js'], 'directories': []}]
+
+def test_walk_files_honours_ignore_files(tmp_path):
+    make_tree(tmp_path, ['main.py', 'debug.log', 'logs/today.txt', 'src/app.py', 'src/keep.log', 'src/gen/out.py'])
+    (tmp_path / '.gitignore').write_text('*.log\nlogs/\n', encoding='utf-8')
+    (tmp_path / 'src' / '.documenterignore').write_text('!keep.log\ngen/\n', encoding='utf-8')
+    expected = ['main.py', 'src/app.py', 'src/keep.log']
+    assert rel_paths(walk_files(tmp_path, ignore=ignore_matcher(tmp_path))) == expected
+    assert rel_paths(iter_project_files(tmp_path, gitignore=True, git_index=False)) == expected
+    assert len(rel_paths(iter_project_files(tmp_path, gitignore=False, git_index=False))) == 6
+    assert rel_paths(ProjectSnapshot(tmp_path, gitignore=True, git_index=False).files) == expected
+
+needs_git = pytest.mark.skipif(shutil.which('git') is None, reason="git not installed")
+
+def git(root, *args):
+    return subprocess.run(['git', '-c', 'core.autocrlf=false', *args], cwd=root, check=True,
+                          capture_output=True, text=True).stdout
+
+def make_repo(root, object_format='sha1'):
+    """Work tree whose index holds regular files, an intent-to-add file, a symlink and a removed file"""
+    git(root, 'init', '-q', f'--object-format={object_format}')
+    make_tree(root, ['README.md', 'src/app.py', 'src/application/main.py', 'src/app/views.py',
+                     'docs/a/b/c/deep.md', 'untracked.txt', 'gone.py'])
+    os.symlink('README.md', root / 'link.md')
+    git(root, 'add', 'README.md', 'src', 'docs', 'link.md', 'gone.py')
+    make_tree(root, ['later.py'])
+    git(root, 'add', '--intent-to-add', 'later.py')  # Sets an extended flag (index v3+)
+    (root / 'gone.py').unlink()
+
+@needs_git
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_read_git_index_versions(tmp_path, version):
+    make_repo(tmp_path)
+    git(tmp_path, 'update-index', '--index-version', str(version))
+    assert sorted(read_git_index(str(tmp_path / '.git'))) == sorted(git(tmp_path, 'ls-files').split())
+
+@needs_git
+def test_read_git_index_sha256_repositories(tmp_path):
+    try:
+        make_repo(tmp_path, object_format='sha256')
+    except subprocess.CalledProcessError:
+        pytest.skip("git without sha256 repository support")
+    git(tmp_path, 'update-index', '--index-version', '4')
+    assert sorted(read_git_index(str(tmp_path / '.git'))) == sorted(git(tmp_path, 'ls-files').split())
+
+def test_read_git_index_rejects_unknown_data(tmp_path):
+    assert read_git_index(str(tmp_path)) is None
+    (tmp_path / 'index').write_bytes(b'DIRC\0\0\0\x05\0\0\0\0')
+    assert read_git_index(str(tmp_path)) is None
+    (tmp_path / 'index').write_bytes(b'DIRC\0\0\0\x02\0\0\0\x01truncated')
+    assert read_git_index(str(tmp_path)) is None
+
+@needs_git
+def test_git_index_files_match_a_walk_of_tracked_files(tmp_path):
+    make_repo(tmp_path)
+    (tmp_path / '.gitignore').write_text('docs/\n', encoding='utf-8')
+    git(tmp_path, 'update-index', '--index-version', '4')
+    tracked = set(git(tmp_path, 'ls-files').split())
+    walked = [path for path in rel_paths(walk_files(tmp_path, ignore=ignore_matcher(tmp_path))) if path in tracked]
+    listed = git_index_files(tmp_path, ignore=ignore_matcher(tmp_path))
+    # Same order as the walk; symlinks to files, deleted files and ignored paths behave alike
+    assert rel_paths(listed) == walked == ['README.md', 'later.py', 'link.md', 'src/app.py', 'src/app/views.py',
+                                           'src/application/main.py']
+    assert rel_paths(iter_project_files(tmp_path, gitignore=True, git_index=True)) == walked
+
+def test_git_index_falls_back_to_walking(tmp_path):
+    make_tree(tmp_path, ['a.py', '.git/HEAD'])
+    assert git_index_files(tmp_path) is None
+    assert rel_paths(iter_project_files(tmp_path, git_index=True)) == ['a.py']
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Tests for the MCP HTTP server (server.py), run against a local instance
+"""
+
+import copy
+import gzip
+import http.client
+import io
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+import pytest
+
+import server as server_module
+from server import (COMPRESS_MIN_BYTES, HTTP_REQUESTS, LARGE_BODY_READS, LargeBodySlot, MCPHandler, MCPServer,
+                    RequestBodyError, StaticPayload, ToolExecutor, companion_source, encode_json_body, etag_matches,
+                    negotiate_encoding, read_request_body, response_encodings)
+from upload_store import content_digest
+from test_companion import analyze, change_project, delta, make_project, stream
+
+@pytest.fixture
+def make_server():
+    """Start MCPServer instances on free local ports, shutting them down afterwards"""
+    servers = []
+
+    def start(**kwargs):
+        server = MCPServer(('127.0.0.1', 0), MCPHandler, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def post_json(server, payload, headers=None):
+    """POST a JSON-RPC payload to /mcp/request and return (status, decoded body)"""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/mcp/request', json.dumps(payload).encode('utf-8'),
+                           {'Content-Type': 'application/json', **(headers or {})})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def call_tool(server, name, arguments):
+    """Text returned by one tools/call"""
+    status, reply = post_json(server, {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+                                       'params': {'name': name, 'arguments': arguments}})
+    assert status == 200, reply
+    return reply['result']['content'][0]['text']
+
+def read_response(sock):
+    """Read one response from a connection the server closes afterwards"""
+    chunks = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        chunks.append(data)
+    head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+def read_body(body, headers, **kwargs):
+    return bytes(read_request_body(io.BytesIO(body), headers, **kwargs))
+
+def body_error(body, headers, **kwargs):
+    with pytest.raises(RequestBodyError) as caught:
+        read_body(body, headers, **kwargs)
+    return caught.value
+
+def test_tool_executor_rejects_calls_past_its_queue():
+    executor = ToolExecutor(max_workers=1, queue_size=1)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+        assert running is not None and queued is not None
+        assert executor.submit(release.wait) is None
+        release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+        # Finished calls free their slots again
+        assert executor.submit(lambda: 42).result(timeout=5) == 42
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_connections_past_the_cap_get_503(make_server):
+    server = make_server(max_connections=2)
+    address = server.server_address
+    idle = [socket.create_connection(address) for _ in range(2)]
+    try:
+        time.sleep(0.2)  # Both handler threads are now waiting for a request line
+        with socket.create_connection(address, timeout=5) as extra:
+            status, headers, body = read_response(extra)
+        assert status == 503
+        assert headers['Retry-After'] == '1'
+        assert int(headers['Content-Length']) == len(body)
+        assert 'too many open connections' in json.loads(body)['error']
+    finally:
+        idle.pop().close()
+
+    # A closed connection frees its slot
+    time.sleep(0.2)
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        status, _, _ = read_response(sock)
+    assert status == 200
+    for sock in idle:
+        sock.close()
+
+def test_hybrid_analysis_accepts_an_unmodified_package(make_server, tmp_path):
+    server = make_server()
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis',
+                                  {'analysis_data': analyze(make_project(tmp_path))}))
+    assert result['success'] is True
+    assert result['documentation']['analysis_metadata']['integrity'] == {'verified': True, 'changed_sections': []}
+
+def test_hybrid_analysis_rejects_tampered_packages(make_server, tmp_path):
+    server = make_server()
+    package = analyze(make_project(tmp_path))
+    tampered = copy.deepcopy(package)
+    tampered['project_data']['important_files'][0]['content'] = 'injected'
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': tampered}))
+    assert 'failed its integrity check' in result['error']
+    assert 'important_files' in result['error']
+
+    # A forged root hash is caught even when every section hash matches
+    forged = copy.deepcopy(package)
+    forged['integrity_hash'] = '0' * 64
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': forged}))
+    assert 'changed sections: root' in result['error']
+
+def test_hybrid_analysis_verifies_ndjson_streams(make_server, tmp_path):
+    server = make_server()
+    lines = stream(make_project(tmp_path))
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': ''.join(lines)}))
+    assert result['success'] is True
+
+    dropped = ''.join(line for line in lines if '"directory"' not in line)
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': dropped}))
+    assert 'directories' in result['error']
+
+    truncated = ''.join(lines[:-1])
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': truncated}))
+    assert 'no integrity record' in result['error']
+
+def test_delta_upload_round_trip(make_server, tmp_path):
+    server = make_server()
+    root = make_project(tmp_path)
+    full, manifest = delta(root)
+    assert json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': full}))['success'] is True
+
+    change_project(root)
+    package, new_manifest = delta(root, manifest)
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': package}))
+    assert result['success'] is True
+    assert result['documentation']['analysis_metadata']['integrity']['verified'] is True
+    # The patched model is the base for the next delta
+    unchanged, _ = delta(root, new_manifest)
+    assert json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': unchanged}))['success'] is True
+
+def test_delta_upload_rejections(make_server, tmp_path):
+    server = make_server()
+    root = make_project(tmp_path)
+    full, manifest = delta(root)
+    call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': full})
+    change_project(root)
+    package, _ = delta(root, manifest)
+
+    unknown = copy.deepcopy(package)
+    unknown['delta']['base_manifest_hash'] = 'f' * 64
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': unknown}))
+    assert 'Unknown base analysis' in result['error']
+
+    incomplete = copy.deepcopy(package)
+    incomplete['delta']['files']['removed'] = []
+    result = json.loads(call_tool(server, 'orchestrate_hybrid_analysis', {'analysis_data': incomplete}))
+    assert 'does not reproduce' in result['error'] and 'files' in result['error']
+
+PAYLOAD = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'}).encode('utf-8')
+
+def test_read_request_body_content_length():
+    assert read_body(PAYLOAD + b'trailing', {'Content-Length': str(len(PAYLOAD))}) == PAYLOAD
+    assert read_body(b'', {}) == b''
+    assert body_error(PAYLOAD[:10], {'Content-Length': str(len(PAYLOAD))}).status == 400
+    assert body_error(b'', {'Content-Length': 'ten'}).status == 400
+    assert body_error(PAYLOAD, {'Content-Length': str(len(PAYLOAD))}, limit=10).status == 413
+
+def test_read_request_body_chunked():
+    wire = b'5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nX-Trailer: yes\r\n\r\nnext request'
+    stream = io.BytesIO(wire)
+    assert bytes(read_request_body(stream, {'Transfer-Encoding': 'chunked'})) == b'hello world'
+    assert stream.read() == b'next request'
+    assert body_error(b'zz\r\nhello\r\n', {'Transfer-Encoding': 'chunked'}).status == 400
+    assert body_error(b'5\r\nhello\r\n6\r\n world\r\n0\r\n\r\n', {'Transfer-Encoding': 'chunked'},
+                      limit=8).status == 413
+
+@pytest.mark.parametrize("encoding, compress", [
+    ('gzip', gzip.compress),
+    ('x-gzip', gzip.compress),
+    ('deflate', zlib.compress),
+    ('deflate', lambda data: zlib.compress(data)[2:-4]),  # Raw deflate without the zlib wrapper
+])
+def test_read_request_body_decodes_content_encodings(encoding, compress):
+    body = compress(PAYLOAD)
+    assert read_body(body, {'Content-Length': str(len(body)), 'Content-Encoding': encoding}) == PAYLOAD
+
+def test_read_request_body_rejects_bad_encodings():
+    assert body_error(PAYLOAD, {'Content-Length': str(len(PAYLOAD)), 'Content-Encoding': 'lzma'}).status == 415
+    corrupt = gzip.compress(PAYLOAD)[:-12] + b'\0' * 12
+    assert body_error(corrupt, {'Content-Length': str(len(corrupt)), 'Content-Encoding': 'gzip'}).status == 400
+
+def test_read_request_body_compression_limits():
+    bomb = gzip.compress(b'\0' * (4 * 1024 * 1024))
+    error = body_error(bomb, {'Content-Length': str(len(bomb)), 'Content-Encoding': 'gzip'})
+    assert error.status == 413 and 'ratio' in str(error)
+
+    # The decoded size is capped even when the wire size is within the limit
+    body = gzip.compress(PAYLOAD * 100)
+    assert len(body) < 4096
+    assert body_error(body, {'Content-Length': str(len(body)), 'Content-Encoding': 'gzip'}, limit=4096).status == 413
+
+def test_large_bodies_need_a_slot():
+    held = [LargeBodySlot() for _ in range(LARGE_BODY_READS)]
+    try:
+        for slot in held:
+            slot.acquire()
+        body = b' ' * (2 * 1024 * 1024)
+        assert body_error(body, {'Content-Length': str(len(body))}, slot=LargeBodySlot()).status == 503
+        # Small bodies don't need one
+        assert read_body(PAYLOAD, {'Content-Length': str(len(PAYLOAD))}, slot=LargeBodySlot()) == PAYLOAD
+    finally:
+        for slot in held:
+            slot.release()
+
+def test_compressed_requests_over_http(make_server):
+    server = make_server()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/mcp/request', gzip.compress(PAYLOAD),
+                           {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())['result']['tools']
+    finally:
+        connection.close()
+
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/mcp/request', PAYLOAD,
+                           {'Content-Type': 'application/json', 'Content-Encoding': 'br-unknown'})
+        response = connection.getresponse()
+        assert response.status == 415
+        assert 'Unsupported Content-Encoding' in json.loads(response.read())['error']
+    finally:
+        connection.close()
+
+def test_negotiate_encoding():
+    preferred = response_encodings()[0]
+    assert negotiate_encoding('') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('gzip') == 'gzip'
+    assert negotiate_encoding('gzip;q=0.5, deflate') == 'deflate'
+    assert negotiate_encoding('deflate;q=0, gzip;q=0') is None
+    assert negotiate_encoding('*') == preferred
+    assert negotiate_encoding('*, gzip;q=0') not in (None, 'gzip')
+
+def test_encode_json_body():
+    small = {'ok': True}
+    assert encode_json_body(small, 'gzip') == ([b'{"ok": true}'], None)
+
+    large = {'items': ['x' * 100] * (COMPRESS_MIN_BYTES // 10 + 1000)}
+    parts, encoding = encode_json_body(large, 'gzip')
+    assert encoding == 'gzip'
+    assert json.loads(gzip.decompress(b''.join(parts))) == large
+    parts, encoding = encode_json_body(large, 'deflate')
+    assert json.loads(zlib.decompress(b''.join(parts))) == large
+    parts, encoding = encode_json_body(large, None)
+    assert encoding is None and json.loads(b''.join(parts)) == large
+
+def test_responses_are_compressed_when_accepted(make_server):
+    server = make_server()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/mcp/request', PAYLOAD,
+                           {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        response = connection.getresponse()
+        body = response.read()
+        assert response.status == 200
+        assert response.getheader('Content-Encoding') == 'gzip'
+        assert response.getheader('Vary') == 'Accept-Encoding'
+        assert int(response.getheader('Content-Length')) == len(body)
+        assert json.loads(gzip.decompress(body))['result']['tools']
+    finally:
+        connection.close()
+
+def test_uploads_reuse_contents_by_hash(make_server):
+    server = make_server()
+    first = call_tool(server, 'upload_project_files', {'files_data': {'main.py': 'print(1)\n', 'README.md': '# Demo\n'}})
+    project_id = first.split('Project ID: ')[1].split()[0]
+
+    hashes = [content_digest('print(1)\n'), content_digest('print(2)\n')]
+    status = json.loads(call_tool(server, 'check_project_blobs', {'project_id': project_id, 'hashes': hashes}))
+    assert status['missing'] == [content_digest('print(2)\n')] and status['known'] == 1
+
+    second = call_tool(server, 'upload_project_files', {
+        'files_data': {'extra.py': 'print(2)\n'},
+        'file_hashes': {'main.py': hashes[0]},
+        'base_project_id': project_id
+    })
+    assert 'Files uploaded: 2 (1 reused by hash)' in second
+
+    rejected = call_tool(server, 'upload_project_files', {
+        'files_data': {}, 'file_hashes': {'main.py': content_digest('never uploaded')}, 'base_project_id': project_id
+    })
+    assert rejected.startswith('❌ Upload incomplete')
+
+def test_served_companion_runs_on_its_own(tmp_path):
+    source = companion_source()
+    assert 'from ignore_rules import' not in source
+    (tmp_path / 'companion.py').write_text(source, encoding='utf-8')
+    project = make_project(tmp_path / 'project')
+    (project / 'debug.log').write_text('', encoding='utf-8')
+    output = tmp_path / 'analysis.json'
+    # Run outside the checkout, so ignore_rules.py can't be imported
+    subprocess.run([sys.executable, 'companion.py', '-p', str(project), '-o', str(output)],
+                   cwd=tmp_path, check=True, capture_output=True)
+    files = json.loads(output.read_text(encoding='utf-8'))['project_data']['structure']['files']
+    assert sorted(info['path'] for info in files) == ['README.md', 'package.json', 'src/index.js', 'src/lib/util.js']
+
+def rpc(request_id, method, params=None):
+    request = {'jsonrpc': '2.0', 'method': method, 'params': params or {}}
+    if request_id is not None:
+        request['id'] = request_id
+    return request
+
+def test_batch_requests(make_server, tmp_path):
+    server = make_server()
+    project = make_project(tmp_path)
+    status, replies = post_json(server, [
+        rpc(1, 'initialize'),
+        rpc(None, 'tools/list'),  # Notification: no response
+        rpc('two', 'tools/call', {'name': 'detect_project_type', 'arguments': {'base_path': str(project)}}),
+        42,
+        {'jsonrpc': '2.0', 'id': 4},
+        rpc(5, 'tools/call', {'name': 'analyze_project_structure', 'arguments': {'base_path': str(project)}}),
+    ])
+    assert status == 200
+    assert [reply['id'] for reply in replies] == [1, 'two', None, 4, 5]
+    assert replies[0]['result']['serverInfo']['name'] == 'Documenter'
+    assert replies[1]['result']['content'][0]['text'].startswith('Detected project type:')
+    assert replies[2]['error']['code'] == -32600 and replies[3]['error']['code'] == -32600
+    assert 'package.json' in replies[4]['result']['content'][0]['text']
+
+def test_batch_edge_cases(make_server):
+    server = make_server()
+    status, reply = post_json(server, [])
+    assert status == 400 and reply['error']['code'] == -32600
+
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/mcp/request', json.dumps([rpc(None, 'tools/list')]),
+                           {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        assert response.status == 204 and response.read() == b''
+    finally:
+        connection.close()
+
+def stream_tool(server, name, arguments, token):
+    """JSON-RPC messages of a streamed tools/call, in arrival order"""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        request = rpc(7, 'tools/call', {'name': name, 'arguments': arguments, '_meta': {'progressToken': token}})
+        connection.request('POST', '/mcp/request', json.dumps(request),
+                           {'Content-Type': 'application/json', 'Accept': 'application/json, text/event-stream'})
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.getheader('Content-Type') == 'text/event-stream'
+        body = response.read().decode('utf-8')
+    finally:
+        connection.close()
+    return [json.loads(line[len('data: '):]) for line in body.split('\n') if line.startswith('data: ')]
+
+def test_tool_calls_stream_progress_and_sections(make_server, tmp_path):
+    server = make_server()
+    project = make_project(tmp_path)
+    messages = stream_tool(server, 'document_project_comprehensive', {'project_path': str(project)}, 'tok')
+    *notifications, result = messages
+    assert result['id'] == 7 and result['result']['content'][0]['text']
+
+    progress = [m['params'] for m in notifications if m['method'] == 'notifications/progress']
+    assert progress and all(p['progressToken'] == 'tok' for p in progress)
+    assert [p['progress'] for p in progress] == sorted(p['progress'] for p in progress)
+    assert progress[-1]['progress'] == progress[-1]['total'] == 5
+    sections = [m['params']['data'] for m in notifications if m['method'] == 'notifications/message']
+    assert sections and all(section['progressToken'] == 'tok' and section['text'] for section in sections)
+
+def test_tool_calls_without_a_token_are_not_streamed(make_server, tmp_path):
+    server = make_server()
+    status, reply = post_json(server, rpc(1, 'tools/call', {'name': 'analyze_code_metrics',
+                                                             'arguments': {'base_path': str(make_project(tmp_path))}}),
+                              {'Accept': 'application/json, text/event-stream'})
+    assert status == 200 and reply['result']['content'][0]['text']
+
+def test_connections_are_kept_alive(make_server, monkeypatch):
+    monkeypatch.setattr(server_module, 'KEEPALIVE_MAX_REQUESTS', 3)
+    server = make_server()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        headers = []
+        sockets = set()
+        for path in ('/', '/tools', '/'):
+            connection.request('GET', path)
+            sockets.add(id(connection.sock))
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 200
+            headers.append((response.getheader('Keep-Alive'), response.getheader('Connection')))
+        timeout = int(server_module.KEEPALIVE_TIMEOUT)
+        assert headers == [(f'timeout={timeout}, max=2', None), (f'timeout={timeout}, max=1', None), (None, 'close')]
+        assert len(sockets) == 1
+    finally:
+        connection.close()
+
+def test_unread_bodies_close_the_connection(make_server):
+    server = make_server()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('POST', '/elsewhere', b'{"ignored": true}', {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 404 and response.getheader('Connection') == 'close'
+    finally:
+        connection.close()
+
+def test_idle_connections_time_out_and_free_their_slot(make_server, monkeypatch):
+    monkeypatch.setattr(MCPHandler, 'timeout', 0.3)
+    server = make_server(max_connections=1)
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        time.sleep(1)
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break  # Closed by the server once idle
+            data += chunk
+        assert data.startswith(b'HTTP/1.1 200')
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        assert read_response(sock)[0] == 200
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('', '"abc"')
+    assert not etag_matches('"abc-gzip"', '"abc"')
+
+def test_static_payload_variants():
+    data = {'items': ['x' * 100] * (COMPRESS_MIN_BYTES // 10)}
+    payload = StaticPayload.from_json(data)
+    body, encoding, etag = payload.encoded(None)
+    assert json.loads(body) == data and encoding is None and etag == payload.etag
+    gzipped, encoding, gzip_etag = payload.encoded('gzip')
+    assert encoding == 'gzip' and json.loads(gzip.decompress(gzipped)) == data
+    assert gzip_etag != etag and payload.encoded('gzip')[0] is gzipped
+    # Small payloads are never compressed
+    assert StaticPayload.from_json({'ok': True}).encoded('gzip')[1] is None
+    assert json.loads(payload.rpc_response('a"b')) == {'jsonrpc': '2.0', 'id': 'a"b', 'result': data}
+
+def test_static_endpoints_answer_304_for_known_etags(make_server):
+    server = make_server()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        etags = {}
+        for accept in ('identity', 'gzip'):
+            connection.request('GET', '/tools', headers={'Accept-Encoding': accept})
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 200 and response.getheader('Cache-Control') == 'no-cache'
+            etags[accept] = response.getheader('ETag')
+        assert etags['identity'] != etags['gzip']
+
+        connection.request('GET', '/tools', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etags['gzip']})
+        response = connection.getresponse()
+        assert response.status == 304 and response.read() == b''
+        assert response.getheader('ETag') == etags['gzip']
+
+        # The identity ETag doesn't match the gzip variant
+        connection.request('GET', '/tools', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etags['identity']})
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 200
+    finally:
+        connection.close()
+
+def test_tools_list_and_companion_payloads(make_server):
+    server = make_server()
+    status, reply = post_json(server, rpc('list', 'tools/list'))
+    assert status == 200 and reply['id'] == 'list'
+    names = [tool['name'] for tool in reply['result']['tools']]
+    assert 'analyze_code_metrics' in names and 'check_project_blobs' in names
+
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request('GET', '/companion.py')
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.read().decode('utf-8') == companion_source()
+    finally:
+        connection.close()
+
+def test_metrics_endpoint_counts_requests(make_server):
+    server = make_server()
+    before = HTTP_REQUESTS.values()
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        for path in ('/tools', '/no-such-page'):
+            connection.request('GET', path)
+            connection.getresponse().read()
+        # Requests are recorded once their response has been written
+        deadline = time.monotonic() + 5
+        while HTTP_REQUESTS.values().get(('GET', 'other', '404'), 0) == before.get(('GET', 'other', '404'), 0):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        connection.request('GET', '/metrics')
+        response = connection.getresponse()
+        text = response.read().decode('utf-8')
+        assert response.status == 200 and response.getheader('Content-Type').startswith('text/plain')
+    finally:
+        connection.close()
+    assert '# TYPE documenter_http_requests_total counter' in text
+    assert 'documenter_http_requests_total{method="GET",path="/tools",status="200"}' in text
+    assert 'path="/no-such-page"' not in text
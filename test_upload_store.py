@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded upload store (upload_store.py)
+"""
+
+import time
+
+import pytest
+
+from upload_store import MissingBlobs, UploadStore, UploadTooLarge, content_digest
+
+def test_contents_are_deduplicated_across_uploads():
+    store = UploadStore(max_bytes=1024)
+    first = store.put({'a.py': 'shared', 'b.py': 'shared', 'c.py': 'own'})
+    second = store.put({'copy.py': 'shared'})
+    assert store.stats() == {'projects': 2, 'unique_files': 2, 'memory_bytes': 9, 'disk_bytes': 0}
+    assert store.get(first)['files'] == {'a.py': 'shared', 'b.py': 'shared', 'c.py': 'own'}
+    assert store.get(second)['files'] == {'copy.py': 'shared'}
+    assert store.get('unknown') is None
+
+def test_least_recently_used_projects_are_evicted():
+    store = UploadStore(max_bytes=1024, max_projects=2)
+    first = store.put({'a': '1'})
+    second = store.put({'b': '2'})
+    store.get(first)  # Now the most recently used
+    third = store.put({'c': '3'})
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
+
+def test_byte_budget_evicts_old_projects_and_frees_shared_blobs_last():
+    store = UploadStore(max_bytes=10)
+    old = store.put({'a': 'x' * 6})
+    new = store.put({'b': 'y' * 6})
+    assert store.get(old) is None and store.get(new)['files'] == {'b': 'y' * 6}
+    assert store.stats()['memory_bytes'] == 6
+
+    # A blob still referenced by a kept project stays
+    shared = store.put({'c': 'y' * 6})
+    assert store.stats()['memory_bytes'] == 6
+    assert store.get(shared)['files'] == {'c': 'y' * 6}
+
+def test_uploads_that_can_never_fit_are_rejected():
+    store = UploadStore(max_bytes=10)
+    kept = store.put({'a': 'small'})
+    with pytest.raises(UploadTooLarge):
+        store.put({'big': 'z' * 11})
+    assert store.get(kept) is not None
+
+def test_expired_projects_are_dropped():
+    store = UploadStore(ttl=0.05)
+    project_id = store.put({'a': '1'})
+    time.sleep(0.1)
+    assert store.get(project_id) is None
+    assert store.stats()['unique_files'] == 0
+
+def test_contents_spill_to_disk_before_eviction(tmp_path):
+    store = UploadStore(max_bytes=10, spill_dir=str(tmp_path / 'spill'), spill_max_bytes=100)
+    first = store.put({'a': 'x' * 8})
+    second = store.put({'b': 'y' * 8})
+    stats = store.stats()
+    assert stats['projects'] == 2 and stats['memory_bytes'] == 8 and stats['disk_bytes'] == 8
+    assert store.get(first)['files'] == {'a': 'x' * 8}  # Read back from disk
+    assert store.get(second)['files'] == {'b': 'y' * 8}
+
+    store.close()
+    assert len(store) == 0 and not any((tmp_path / 'spill').iterdir())
+
+def test_failed_spill_disables_spilling_without_dropping_the_disk_budget(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('', encoding='utf-8')
+    store = UploadStore(max_bytes=10, spill_dir=str(blocker / 'spill'), spill_max_bytes=100)
+    first = store.put({'a': 'x' * 8})
+    second = store.put({'b': 'y' * 8})  # Spilling fails, so the older project is evicted instead
+    assert store.get(first) is None and store.get(second) is not None
+    third = store.put({'c': 'z' * 8})
+    assert store.get(third) is not None and store.stats()['disk_bytes'] == 0
+
+    # Uploads larger than memory can no longer be held
+    with pytest.raises(UploadTooLarge):
+        store.put({'d': 'w' * 20})
+    assert store.stats()['memory_bytes'] <= 10
+
+def test_missing_reports_digests_the_project_does_not_hold():
+    store = UploadStore()
+    project_id = store.put({'a.py': 'alpha', 'b.py': 'beta'})
+    alpha, beta, gamma = (content_digest(text) for text in ('alpha', 'beta', 'gamma'))
+    assert store.missing(project_id, [gamma, alpha, gamma, beta]) == [gamma]
+    assert store.missing('unknown', [alpha, alpha]) == [alpha]
+
+def test_uploads_can_reference_contents_of_their_base_project():
+    store = UploadStore()
+    base = store.put({'a.py': 'alpha', 'b.py': 'beta'})
+    refs = {'a.py': content_digest('alpha'), 'moved/b.py': content_digest('beta')}
+    project_id = store.put({'c.py': 'gamma'}, refs, base=base)
+    assert store.get(project_id)['files'] == {'c.py': 'gamma', 'a.py': 'alpha', 'moved/b.py': 'beta'}
+    assert store.stats()['unique_files'] == 3
+
+
+def test_referenced_contents_outlive_the_base_project():
+    store = UploadStore(max_projects=2)
+    base = store.put({'a.py': 'alpha'})
+    project_id = store.put({}, {'a.py': content_digest('alpha')}, base=base)
+    store.put({'z.py': 'zeta'})  # Evicts the base
+    assert store.get(base) is None
+    assert store.get(project_id)['files'] == {'a.py': 'alpha'}
+
+def test_references_only_resolve_against_the_named_project():
+    store = UploadStore()
+    other = store.put({'secret.py': 'secret'})
+    mine = store.put({'a.py': 'alpha'})
+    digest = content_digest('secret')
+    with pytest.raises(MissingBlobs) as caught:
+        store.put({}, {'stolen.py': digest}, base=mine)
+    assert caught.value.digests == [digest]
+    with pytest.raises(MissingBlobs):
+        store.put({}, {'stolen.py': digest})
+    assert len(store) == 2 and store.get(other) is not None
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Documenter Upload Store
+Bounded storage for projects sent with upload_project_files.
+
+File contents are deduplicated by SHA-256 across uploads and counted against
+a byte budget. Projects are kept in least-recently-used order, so expiry and
+eviction pop from the front of an ordered map instead of sorting. When a spill
+directory is configured, contents that no longer fit in memory move to disk
+before any project is evicted. Standard library only.
+
+Clients can skip resending contents of their own earlier uploads: missing()
+reports which SHA-256 digests a given project does not hold, and put()
+accepts path -> digest references into that base project for the rest.
+Digests are only ever resolved against a project the caller names by ID, so
+one client cannot probe for or read another client's contents.
+
+Environment:
+    MCP_UPLOAD_MAX_BYTES        in-memory content budget (default 128 MB)
+    MCP_UPLOAD_MAX_PROJECTS     projects kept at once (default 10)
+    MCP_UPLOAD_TTL              seconds an unused project is kept (default 3600)
+    MCP_UPLOAD_SPILL_DIR        directory for contents that don't fit in memory,
+                                or "temp" for a private temporary directory
+                                (default: unset, evict instead)
+    MCP_UPLOAD_SPILL_MAX_BYTES  on-disk budget for spilled contents (default 1 GB)
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class UploadTooLarge(ValueError):
+    """An upload that could never fit in the store's budget"""
+
+class MissingBlobs(ValueError):
+    """An upload referenced contents the store does not hold"""
+
+    def __init__(self, digests):
+        self.digests = sorted(set(digests))
+        super().__init__(f"{len(self.digests)} referenced file contents could not be resolved")
+
+def content_digest(content: str) -> str:
+    """Blob key for a file's contents: SHA-256 of its UTF-8 encoding"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class _Blob:
+    __slots__ = ('content', 'size', 'refs')
+
+    def __init__(self, content: Optional[str], size: int):
+        self.content = content  # None once spilled to disk
+        self.size = size
+        self.refs = 0
+
+class UploadStore:
+    """Deduplicating, byte-budgeted LRU store of uploaded projects"""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, max_projects: int = 10, ttl: float = 3600,
+                 spill_dir: Optional[str] = None, spill_max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_projects = max_projects
+        self.ttl = ttl
+        self.spill_max_bytes = spill_max_bytes if spill_dir else 0
+        self._spill_setting = spill_dir
+        self._spill_disabled = not spill_dir  # Set after a failed spill; disk_bytes keeps its budget
+        self._spill_path: Optional[Path] = None
+        self._projects: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # Least recently used first
+        self._blobs: Dict[str, _Blob] = {}
+        self._resident: "OrderedDict[str, None]" = OrderedDict()  # In-memory blobs, least recently used first
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "UploadStore":
+        return cls(
+            max_bytes=int(os.environ.get("MCP_UPLOAD_MAX_BYTES", 128 * 1024 * 1024)),
+            max_projects=max(1, int(os.environ.get("MCP_UPLOAD_MAX_PROJECTS", 10))),
+            ttl=float(os.environ.get("MCP_UPLOAD_TTL", 3600)),
+            spill_dir=os.environ.get("MCP_UPLOAD_SPILL_DIR") or None,
+            spill_max_bytes=int(os.environ.get("MCP_UPLOAD_SPILL_MAX_BYTES", 1024 * 1024 * 1024)),
+        )
+
+    def __len__(self) -> int:
+        return len(self._projects)
+
+    def missing(self, project_id: str, digests: Iterable[str]) -> List[str]:
+        """
+        Digests (in request order, without repeats) whose contents are not
+        part of the given project; all of them if it is unknown or expired.
+        """
+        with self._lock:
+            self._expire(time.time())
+            known = self._project_digests(project_id)
+            return [digest for digest in dict.fromkeys(digests) if digest not in known]
+
+    def put(self, files: Dict[str, str], refs: Optional[Dict[str, str]] = None,
+            base: Optional[str] = None) -> str:
+        """
+        Store an upload and return its project ID. refs maps further paths to
+        digests of contents in the base project; MissingBlobs is raised if
+        any of them is not part of it, and UploadTooLarge if the upload
+        cannot fit even after every other project is evicted.
+        """
+        # Hash outside the lock; contents already on the server are not stored again
+        digests = {path: content_digest(content) for path, content in files.items()}
+        sizes = {}
+        for path, digest in digests.items():
+            if digest not in sizes:
+                sizes[digest] = len(files[path].encode('utf-8'))
+        upload_bytes = sum(sizes.values())
+        budget = self.max_bytes + (0 if self._spill_disabled else self.spill_max_bytes)
+        if upload_bytes > budget:
+            raise UploadTooLarge(f"{upload_bytes:,} bytes exceeds the upload budget of {budget:,} bytes")
+
+        project_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if refs:
+                known = self._project_digests(base)
+                unknown = [digest for digest in refs.values() if digest not in known]
+                if unknown:
+                    raise MissingBlobs(unknown)
+                for path, digest in refs.items():
+                    if path not in digests:
+                        digests[path] = digest
+                        if digest not in sizes:
+                            sizes[digest] = self._blobs[digest].size
+                upload_bytes = sum(sizes.values())
+            for path, digest in digests.items():
+                blob = self._blobs.get(digest)
+                if blob is None:
+                    blob = self._blobs[digest] = _Blob(files[path], sizes[digest])
+                    self._resident[digest] = None
+                    self.memory_bytes += blob.size
+                elif blob.content is not None:
+                    self._resident.move_to_end(digest)
+                blob.refs += 1
+            self._projects[project_id] = {
+                'files': digests,
+                'uploaded_at': now,
+                'last_access': now,
+                'status': 'uploaded',
+                'file_count': len(digests),
+                'bytes': upload_bytes
+            }
+            self._enforce_limits(keep=project_id)
+        return project_id
+
+    def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Project record with its file contents, or None if unknown or evicted"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            project = self._projects.get(project_id)
+            if project is None:
+                return None
+            self._projects.move_to_end(project_id)
+            project['last_access'] = now
+            files = {}
+            for path, digest in project['files'].items():
+                if self._blobs[digest].content is not None:
+                    self._resident.move_to_end(digest)
+                files[path] = self._read(digest)
+            return {**project, 'files': files}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'projects': len(self._projects),
+                'unique_files': len(self._blobs),
+                'memory_bytes': self.memory_bytes,
+                'disk_bytes': self.disk_bytes
+            }
+
+    def _project_digests(self, project_id: Optional[str]) -> set:
+        project = self._projects.get(project_id) if project_id else None
+        return set(project['files'].values()) if project else set()
+
+    def _read(self, digest: str) -> str:
+        blob = self._blobs[digest]
+        if blob.content is not None:
+            return blob.content
+        with open(self._spill_path / digest, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _expire(self, now: float):
+        while self._projects:
+            project_id, project = next(iter(self._projects.items()))
+            if now - project['last_access'] <= self.ttl:
+                break
+            self._evict(project_id)
+
+    def _enforce_limits(self, keep: str):
+        while len(self._projects) > self.max_projects:
+            self._evict(next(iter(self._projects)))
+        while self.memory_bytes > self.max_bytes and self._resident:
+            if not self._spill_disabled and self._spill(next(iter(self._resident))):
+                continue
+            if not self._evict_before(keep):
+                break
+        while self.disk_bytes > self.spill_max_bytes:
+            if not self._evict_before(keep):
+                break
+        if self.memory_bytes > self.max_bytes or self.disk_bytes > self.spill_max_bytes:
+            # Only the new upload is left and it still doesn't fit (e.g. spilling failed)
+            project = self._projects[keep]
+            self._evict(keep)
+            logger.warning(f"Upload store: dropped a {project['bytes']:,} byte upload that does not fit the budget")
+            raise UploadTooLarge(f"{project['bytes']:,} bytes does not fit in the upload store")
+
+    def _evict_before(self, keep: str) -> bool:
+        """Evict the least recently used project; False if only keep is left"""
+        oldest = next(iter(self._projects))
+        if oldest == keep:
+            return False
+        self._evict(oldest)
+        return True
+
+    def _spill(self, digest: str) -> bool:
+        """Move one blob to disk; False if spilling is unavailable"""
+        blob = self._blobs[digest]
+        try:
+            if self._spill_path is None:
+                if self._spill_setting == 'temp':
+                    self._spill_path = Path(tempfile.mkdtemp(prefix='documenter-uploads-'))
+                else:
+                    self._spill_path = Path(self._spill_setting)
+                    self._spill_path.mkdir(parents=True, exist_ok=True)
+            with open(self._spill_path / digest, 'w', encoding='utf-8') as f:
+                f.write(blob.content)
+        except OSError as e:
+            logger.warning(f"Upload spill disabled ({self._spill_setting}): {e}")
+            self._spill_disabled = True
+            return False
+        blob.content = None
+        del self._resident[digest]
+        self.memory_bytes -= blob.size
+        self.disk_bytes += blob.size
+        return True
+
+    def _evict(self, project_id: str):
+        project = self._projects.pop(project_id)
+        for digest in project['files'].values():
+            blob = self._blobs[digest]
+            blob.refs -= 1
+            if blob.refs:
+                continue
+            del self._blobs[digest]
+            if blob.content is not None:
+                del self._resident[digest]
+                self.memory_bytes -= blob.size
+            else:
+                self.disk_bytes -= blob.size
+                try:
+                    (self._spill_path / digest).unlink()
+                except OSError:
+                    pass
+
+    def close(self):
+        """Drop every project and remove a private temporary spill directory"""
+        with self._lock:
+            for project_id in list(self._projects):
+                self._evict(project_id)
+            if self._spill_path is not None and self._spill_setting == 'temp':
+                shutil.rmtree(self._spill_path, ignore_errors=True)
+                self._spill_path = None